@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Tuple, List, Iterable, Iterator, Container
+from zipfile import ZipFile
+
+DateTime = Tuple[int, int, int, int, int, int]
+default_date_time: DateTime = (1980, 1, 1, 0, 0, 0)
+"""Used for the entries that are not backed by a file, so the same content gives the same archive"""
+
+_deflated = 8
+_stored = 0
+_utf8_flag = 0x800
+_zip_limit = 0xFFFFFFFF
+
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+    """A zip entry with its data already compressed; it can be produced in parallel and
+    assembled later in any number of archives"""
+    arcname: str
+    data: bytes
+    crc: int
+    size: int
+    compress_type: int
+    date_time: DateTime = default_date_time
+
+
+def compress_entry(arcname: str, content: bytes, date_time: DateTime = default_date_time,
+                   compresslevel: int = 1) -> ArchiveEntry:
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(content) + compressor.flush()
+    if len(data) >= len(content):
+        return ArchiveEntry(arcname, content, zlib.crc32(content), len(content), _stored, date_time)
+    return ArchiveEntry(arcname, data, zlib.crc32(content), len(content), _deflated, date_time)
+
+
+class ArchiveWriter:
+    """Produces the bytes of a zip archive, one chunk per entry, followed by the central directory.
+    Zip64 is not supported."""
+
+    def __init__(self):
+        self._offset = 0
+        self._central: List[bytes] = []
+
+    def entry(self, entry: ArchiveEntry) -> bytes:
+        name = entry.arcname.encode('utf-8')
+        dos_time, dos_date = _dos_date_time(entry.date_time)
+        common = struct.pack('<HHHHHLLLH', 20, _utf8_flag, entry.compress_type, dos_time, dos_date,
+                             entry.crc, len(entry.data), entry.size, len(name))
+        if self._offset > _zip_limit or len(entry.data) > _zip_limit or len(self._central) >= 0xFFFF:
+            raise Exception(f'The archive is too big, zip64 is not supported. Entry: {entry.arcname}')
+        local = b'PK\x03\x04' + common + struct.pack('<H', 0) + name
+        external_attr = (0o100644 << 16)
+        self._central.append(b'PK\x01\x02' + struct.pack('<H', (3 << 8) | 20) + common +
+                             struct.pack('<HHHHLL', 0, 0, 0, 0, external_attr, self._offset) + name)
+        self._offset += len(local) + len(entry.data)
+        return local + entry.data
+
+    def close(self) -> bytes:
+        central = b''.join(self._central)
+        end = b'PK\x05\x06' + struct.pack('<HHHHLLH', 0, 0, len(self._central), len(self._central),
+                                          len(central), self._offset, 0)
+        return central + end
+
+
+def iter_zip(entries: Iterable[ArchiveEntry]) -> Iterator[bytes]:
+    writer = ArchiveWriter()
+    for entry in entries:
+        yield writer.entry(entry)
+    yield writer.close()
+
+
+def _dos_date_time(date_time: DateTime) -> Tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    year = max(year, 1980)
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def read_entries(content: bytes, arcnames: Container[str]) -> List[ArchiveEntry]:
+    """Reads the given entries from a zip archive, without decompressing them"""
+    result = []
+    with ZipFile(BytesIO(content)) as zf:
+        for info in zf.infolist():
+            if info.filename not in arcnames:
+                continue
+            offset = info.header_offset
+            name_len, extra_len = struct.unpack('<HH', content[offset + 26:offset + 30])
+            start = offset + 30 + name_len + extra_len
+            data = content[start:start + info.compress_size]
+            result.append(ArchiveEntry(info.filename, data, info.CRC, info.file_size, info.compress_type,
+                                       info.date_time))
+    return result
@@ -1,13 +1,30 @@
+import asyncio
 import json
 import textwrap
-from typing import List, Tuple
+from pathlib import Path
+from typing import List, Tuple, Sequence
+from urllib.parse import parse_qs
 
+from wwwpy.archive import iter_zip, read_entries
+from wwwpy.bundle import BundleCache, BundleLayer, layer_key, Bundle, BundleSource
 from wwwpy.common import files
-from wwwpy.http import HttpRoute, HttpResponse
-from wwwpy.resources import build_archive, ResourceIterable
+from wwwpy.http import HttpRoute, HttpResponse, HttpRequest, etag_matches
+from wwwpy.pyodide_assets import pyodide_route, preload_links
+from wwwpy.resources import ResourceIterable, Bytecode
 
 bootstrap_javascript_placeholder = '// #bootstrap-placeholder#'
 
+pyodide_version = '0.28.1'
+pyodide_python_version = (3, 13)
+"""The CPython version of the Pyodide distribution; the bytecode sent to the remote must match it"""
+pyodide_cdn_url = f'https://cdn.jsdelivr.net/pyodide/v{pyodide_version}/full/'
+pyodide_local_path = f'/wwwpy/pyodide/v{pyodide_version}'
+
+
+def pyodide_bytecode() -> Bytecode:
+    """The bytecode options for the Pyodide interpreter, see Bytecode"""
+    return Bytecode(pyodide_python_version)
+
 
 def bootstrap_routes(
         resources: List[ResourceIterable],
@@ -15,49 +32,285 @@ def bootstrap_routes(
         zip_route_path: str = '/wwwpy/bundle.zip',
         packages: list[str] | None = None,
         html: str = f'<!DOCTYPE html><h1>Loading...</h1><script>{bootstrap_javascript_placeholder}</script>',
-) -> Tuple[HttpRoute, HttpRoute]:
-    """Returns a tuple of two routes: (bootstrap_route, zip_route)"""
+        layers: Sequence[BundleLayer] = (),
+        bytecode: bool = False,
+        persistent: bool = False,
+        pyodide_dir: Path | None = None,
+        zip_import: bool = False,
+) -> Tuple[HttpRoute, ...]:
+    """Returns a tuple of routes: (bootstrap_route, *zip_routes, *manifest_routes[, pyodide_route]).
+    Each of the `layers` has its own zip route; the `resources`, if any, are served by the zip route at `zip_route_path`.
+    The bootstrap downloads the archives in order and unpacks them in the same directory.
+    With `bytecode` the archives contain also the .pyc files for the Pyodide interpreter,
+    if the running interpreter has the same version.
+    With `persistent` the browser keeps the unpacked files in IndexedDB; on the next visit it downloads
+    only the files that changed, comparing the layer manifest (served by the manifest routes)
+    with the one it persisted.
+    With `pyodide_dir`, a directory containing the Pyodide distribution (and the packages), Pyodide is served
+    by this server instead of the CDN.
+    With `zip_import` the archives are not unpacked: the modules are imported directly from them
+    (see wwwpy.remote.bundle_importer). It cannot be used together with `persistent`."""
+    if zip_import and persistent:
+        raise ValueError('zip_import cannot be used with persistent, the persistent bundle is unpacked')
+
+    all_layers = list(layers)
+    if resources:
+        all_layers.append(BundleLayer('bundle', resources, route_path=zip_route_path))
+
+    options = pyodide_bytecode() if bytecode else None
+    layer_caches = [(layer, layer.source or BundleCache(layer.resources, options, name=layer.name))
+                    for layer in all_layers]
+    zip_routes = [_zip_route(layer, cache) for layer, cache in layer_caches]
+    manifest_routes = [_manifest_route(layer, cache) for layer, cache in layer_caches] if persistent else []
+    index_url = pyodide_cdn_url
+    local_routes = []
+    if pyodide_dir is not None:
+        index_url = pyodide_local_path + '/'
+        local_routes = [pyodide_route(pyodide_dir, pyodide_local_path)]
+        html = _insert_before_bootstrap_script(html, preload_links(index_url))
+
+    async def bootstrap_callback(request: HttpRequest, resp):
+        bundles = await asyncio.gather(*(cache.get_async() for _, cache in layer_caches))
+        keys = [layer_key(layer, bundle) for (layer, _), bundle in zip(layer_caches, bundles)]
+        if persistent:
+            layer_infos = [(layer.name, key, f'{layer.path}?v={key}', f'{layer.manifest_path}?v={key}')
+                           for (layer, _), key in zip(layer_caches, keys)]
+            bootstrap_python = _bootstrap_python_persistent(layer_infos, python)
+            # the files to download depend on what the browser persisted, only the manifests can be prefetched
+            prefetch = [manifest_url for _, _, _, manifest_url in layer_infos]
+        else:
+            prefetch = [f'{layer.path}?v={key}' for (layer, _), key in zip(layer_caches, keys)]
+            bootstrap_python = _bootstrap_python(prefetch, python, zip_import)
+        javascript = get_javascript_for(bootstrap_python, packages=packages, index_url=index_url, prefetch=prefetch)
+        html_replaced = html.replace(bootstrap_javascript_placeholder, javascript)
+        res = resp(HttpResponse.text_html(html_replaced)._replace(headers={'Cache-Control': 'no-cache'}))
+        if res:
+            await res
+
+    bootstrap_route = HttpRoute('/', bootstrap_callback)
+    return bootstrap_route, *zip_routes, *manifest_routes, *local_routes
+
+
+def _insert_before_bootstrap_script(html: str, fragment: str) -> str:
+    placeholder = html.find(bootstrap_javascript_placeholder)
+    script = html.rfind('<script', 0, placeholder) if placeholder >= 0 else -1
+    if script < 0:
+        return html
+    return html[:script] + fragment + html[script:]
+
+
+def _zip_route(layer: BundleLayer, bundle_cache: BundleSource) -> HttpRoute:
+    async def zip_response(request: HttpRequest) -> HttpResponse:
+        if request.method == 'POST':
+            return await _delta_response(request, bundle_cache)
+        found = await bundle_cache.lookup_async()
+        key = parse_qs(request.query).get('v', [''])[0]
+        if isinstance(found, Bundle) and key == layer_key(layer, found):
+            # the url is content-hashed, so the content will never change for this url
+            cache_control = 'public, max-age=31536000, immutable'
+        else:
+            # no-cache: the browser can keep the bundle but it must revalidate it with If-None-Match.
+            # While the archive is being built its content hash is not known yet, so the key cannot be verified
+            cache_control = 'no-cache'
+        headers = {'ETag': found.etag, 'Cache-Control': cache_control}
+        if etag_matches(request.headers.get('if-none-match'), found.etag):
+            return HttpResponse.not_modified(headers)
+        if isinstance(found, Bundle):
+            return HttpResponse.application_zip(found.content, headers)
+        return HttpResponse.application_zip(found.iter_chunks(), headers)
 
-    def zip_response() -> HttpResponse:
-        from itertools import chain
-        zip_bytes = build_archive(chain.from_iterable(resources))
-        return HttpResponse.application_zip(zip_bytes)
+    async def zip_callback(request: HttpRequest, resp):
+        res = resp(await zip_response(request))
+        if res:
+            await res
+
+    # the archive entries are already deflated
+    return HttpRoute(layer.path, zip_callback, compress=False)
+
+
+async def _delta_response(request: HttpRequest, bundle_cache: BundleSource) -> HttpResponse:
+    """The request content is the json list of the arcnames needed by the browser; the response is an archive
+    with only those entries, copied from the bundle without compressing them again"""
+    arcnames = _requested_arcnames(request.content)
+    if arcnames is None:
+        return HttpResponse('Expected a json list of arcnames', 'text/plain', 400)
+    bundle = await bundle_cache.get_async()
+    content = b''.join(iter_zip(read_entries(bundle.content, arcnames)))
+    return HttpResponse.application_zip(content, {'Cache-Control': 'no-store'})
+
+
+def _requested_arcnames(content: str | bytes) -> set[str] | None:
+    try:
+        arcnames = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(arcnames, list) or not all(isinstance(arcname, str) for arcname in arcnames):
+        return None
+    return set(arcnames)
+
+
+def _manifest_route(layer: BundleLayer, bundle_cache: BundleSource) -> HttpRoute:
+    async def manifest_callback(request: HttpRequest, resp):
+        bundle = await bundle_cache.get_async()
+        headers = {'ETag': bundle.etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(request.headers.get('if-none-match'), bundle.etag):
+            response = HttpResponse.not_modified(headers)
+        else:
+            content = json.dumps({'key': layer_key(layer, bundle), 'files': bundle.files})
+            response = HttpResponse(content, 'application/json', headers=headers)
+        res = resp(response)
+        if res:
+            await res
+
+    return HttpRoute(layer.manifest_path, manifest_callback)
+
+
+_fetch_bytes_python = """
+import io
+import zipfile
+import js
+from pyodide.http import pyfetch
 
-    zip_route = HttpRoute(zip_route_path, lambda request, resp: resp(zip_response()))
+async def _wwwpy_fetch_bytes(url, **kwargs):
+    # the javascript starts the download of the urls to prefetch before loadPyodide, see _js_content
+    promise = js.wwwpyPrefetch.get(url) if not kwargs and hasattr(js, 'wwwpyPrefetch') else None
+    if promise is not None:
+        js.wwwpyPrefetch.delete(url)
+        try:
+            return (await promise).to_bytes()
+        except Exception as e:
+            js.console.debug(f'wwwpy: prefetch of {url} failed: {e}')
+    response = await pyfetch(url, **kwargs)
+    if not response.ok:
+        raise Exception(f'wwwpy: fetch of {url} failed, status={response.status}')
+    return await response.bytes()
+
+def _wwwpy_unpack(content, extract_dir):
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        zf.extractall(extract_dir)
+"""
+
+
+def _bootstrap_python(urls: List[str], python: str, zip_import: bool = False) -> str:
     extract_dir = files._bundle_path
-    bootstrap_python = f"""
+    if zip_import:
+        fetch = f"""
+import types
+_wwwpy_importer_module = types.ModuleType('wwwpy_bundle_importer')
+exec(r'''{_bundle_importer_source()}''', _wwwpy_importer_module.__dict__)
+_wwwpy_importer = _wwwpy_importer_module.BundleImporter('{extract_dir}')
+for url in {urls!r}:
+    _wwwpy_importer.add_archive(await _wwwpy_fetch_bytes(url))
+_wwwpy_importer.install()
+"""
+    else:
+        fetch = f"""
+for url in {urls!r}:
+    _wwwpy_unpack(await _wwwpy_fetch_bytes(url), '{extract_dir}')
+"""
+    return f"""
 import sys
-from pyodide.http import pyfetch
-response = await pyfetch('{zip_route.path}')
-await response.unpack_archive(extract_dir='{extract_dir}')
+{_fetch_bytes_python}
+{fetch}
 sys.path.insert(0, '{extract_dir}')
 
 {python}
     """
 
-    javascript = get_javascript_for(bootstrap_python, packages=packages)
-    html_replaced = html.replace(bootstrap_javascript_placeholder, javascript)
-    bootstrap_route = HttpRoute('/', lambda request, resp: resp(HttpResponse.text_html(html_replaced)))
-    return bootstrap_route, zip_route
+
+def _bundle_importer_source() -> str:
+    return (Path(__file__).parent / 'remote' / 'bundle_importer.py').read_text()
 
 
-def get_javascript_for(python_code: str, packages: list[str] = None) -> str:
+def _bootstrap_python_persistent(layer_infos: List[Tuple[str, str, str, str]], python: str) -> str:
+    """The layer_infos are (name, key, zip_url, manifest_url). The bundle directory is an IDBFS mount, for each
+    layer the browser stores the manifest of the files it has; when the key changes it downloads the whole layer
+    or, if it has some of the files, an archive of only the changed ones."""
+    extract_dir = files._bundle_path
+    return f"""
+import sys
+import json
+import asyncio
+from pathlib import Path
+from pyodide.ffi import create_proxy, to_js
+{_fetch_bytes_python}
+
+async def _wwwpy_syncfs(populate):
+    future = asyncio.get_running_loop().create_future()
+    js.pyodide.FS.syncfs(populate, create_proxy(lambda err: future.set_result(err)))
+    err = await future
+    if err:
+        js.console.debug(f'wwwpy: syncfs failed populate={{populate}} err={{err}}')
+
+async def _wwwpy_fetch_layers():
+    bundle = Path('{extract_dir}')
+    try:
+        js.pyodide.FS.mkdirTree(str(bundle))
+        js.pyodide.FS.mount(js.pyodide.FS.filesystems.IDBFS, to_js({{}}), str(bundle))
+        await _wwwpy_syncfs(True)
+    except Exception as e:
+        js.console.debug(f'wwwpy: persistent cache not available: {{e}}')
+    state_dir = bundle / '.wwwpy-layers'
+    state_dir.mkdir(exist_ok=True)
+    changed = False
+    for name, key, zip_url, manifest_url in {layer_infos!r}:
+        state_file = state_dir / f'{{name}}.json'
+        local = json.loads(state_file.read_text()) if state_file.exists() else {{'key': '', 'files': {{}}}}
+        if local['key'] == key:
+            continue
+        changed = True
+        remote = json.loads(await _wwwpy_fetch_bytes(manifest_url))
+        needed = [a for a, h in remote['files'].items() if local['files'].get(a) != h]
+        for arcname in local['files'].keys() - remote['files'].keys():
+            (bundle / arcname).unlink(missing_ok=True)
+        if len(needed) == len(remote['files']):
+            _wwwpy_unpack(await _wwwpy_fetch_bytes(zip_url), str(bundle))
+        elif needed:
+            _wwwpy_unpack(await _wwwpy_fetch_bytes(zip_url, method='POST', body=json.dumps(needed)), str(bundle))
+        js.console.debug(f'wwwpy: layer {{name}} downloaded {{len(needed)}} of {{len(remote["files"])}} files')
+        state_file.write_text(json.dumps(remote))
+    if changed:
+        await _wwwpy_syncfs(False)
+
+await _wwwpy_fetch_layers()
+sys.path.insert(0, '{extract_dir}')
+
+{python}
+    """
+
+
+def get_javascript_for(python_code: str, packages: list[str] = None, index_url: str = pyodide_cdn_url,
+                       prefetch: Sequence[str] = ()) -> str:
+    """The `prefetch` urls are downloaded while Pyodide loads, the bootstrap python gets them with
+    `_wwwpy_fetch_bytes`"""
     # see https://pyodide.org/en/stable/usage/api/js-api.html#globalThis.loadPyodide
     loadPyodide_options = {
         'convertNullToNone': True,
         'packages': packages or [],
+        'indexURL': index_url,
     }
     return (_js_content
             .replace('# python replace marker', python_code)
-            .replace('`# load option marker`', json.dumps(loadPyodide_options)))
+            .replace('`# load option marker`', json.dumps(loadPyodide_options))
+            .replace('`# pyodide index url marker`', index_url)
+            .replace('`# prefetch marker`', json.dumps(list(prefetch))))
 
 
 # language=javascript
 _js_content = """
+window.wwwpyPrefetch = new Map();
+for (const url of `# prefetch marker`) {
+    const promise = fetch(url).then(r => {
+        if (!r.ok) throw new Error('prefetch of ' + url + ' failed, status=' + r.status);
+        return r.arrayBuffer();
+    });
+    promise.catch(() => {});  // handled by the python side, that falls back to pyfetch
+    window.wwwpyPrefetch.set(url, promise);
+}
 if (typeof loadPyodide === 'undefined') {
     console.log('loading pyodide...');
     let script = document.createElement('script');
-    script.src = 'https://cdn.jsdelivr.net/pyodide/v0.28.1/full/pyodide.js';
+    script.src = '`# pyodide index url marker`pyodide.js';
     script.onload = async () => {
         let pyodide = await loadPyodide(`# load option marker`);
         window.pyodide = pyodide;
@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from functools import cached_property
+from io import BytesIO
+from itertools import chain
+from pathlib import PurePosixPath
+from typing import Iterable, List, Sequence, Tuple, Callable, AsyncIterator, Dict, Set, Protocol
+from zipfile import ZipFile
+
+from wwwpy import metrics
+from wwwpy.common import iterlib
+from wwwpy.archive import ArchiveEntry, iter_zip
+from wwwpy.common.filesystem.sync import Event
+from wwwpy.resources import Resource, PathResource, ResourceIterable, iter_archive, Bytecode, resource_entries, \
+    _archive_executor
+
+logger = logging.getLogger(__name__)
+
+ManifestEntry = Tuple[str, int, int]
+"""(arcname, size, mtime_ns); for resources that are not backed by a file the mtime_ns is the crc32 of the content"""
+
+Manifest = Tuple[ManifestEntry, ...]
+
+
+@dataclass(frozen=True)
+class Bundle:
+    etag: str
+    """Strong etag (quoted) computed from the manifest"""
+    content: bytes
+    manifest: Manifest
+    digest: str
+    """Hash of the content"""
+
+    @cached_property
+    def files(self) -> Dict[str, str]:
+        """Maps the arcnames to a hash of their content; the browser uses it to download only the changed files"""
+        with ZipFile(BytesIO(self.content)) as zf:
+            return {info.filename: f'{info.CRC:08x}-{info.file_size}' for info in zf.infolist()}
+
+
+class BundleSource(Protocol):
+    """Something that provides an up-to-date bundle, e.g., a BundleCache or a LiveBundle"""
+
+    def get(self) -> Bundle: ...
+
+    async def get_async(self) -> Bundle: ...
+
+    async def lookup_async(self) -> Bundle | BundleBuild: ...
+
+
+@dataclass(frozen=True)
+class BundleLayer:
+    """A named part of what is sent to the remote. Each layer is an archive on its own, so the browser
+    downloads again only the layers that changed."""
+    name: str
+    resources: Sequence[ResourceIterable]
+    version: str = ''
+    """When given, it is part of the layer key, e.g., the wwwpy version for the library layer"""
+    route_path: str = ''
+    """Defaults to /wwwpy/bundle/<name>.zip"""
+    source: BundleSource | None = None
+    """When given, it is used instead of a BundleCache of the resources, e.g., a LiveBundle"""
+
+    @property
+    def path(self) -> str:
+        return self.route_path or f'/wwwpy/bundle/{self.name}.zip'
+
+    @property
+    def manifest_path(self) -> str:
+        return str(PurePosixPath(self.path).with_suffix('.json'))
+
+
+def manifest_entry(resource: Resource) -> ManifestEntry:
+    if isinstance(resource, PathResource):
+        stat = resource.filepath.stat()
+        return resource.arcname, stat.st_size, stat.st_mtime_ns
+    content = resource._bytes()
+    return resource.arcname, len(content), zlib.crc32(content)
+
+
+def snapshot(resources: Iterable[Resource]) -> Tuple[List[Resource], Manifest]:
+    """Materializes the resources and computes their manifest. Only the file metadata is read."""
+    resource_list = []
+    entries = []
+    for resource in iterlib.iter_catching(iter(resources)):
+        try:
+            entries.append(manifest_entry(resource))
+        except OSError:
+            logger.warning(f'Cannot stat resource {resource.arcname}, it will not be bundled')
+            continue
+        resource_list.append(resource)
+    return resource_list, tuple(entries)
+
+
+def manifest_etag(manifest: Manifest) -> str:
+    digest = hashlib.sha1(repr(manifest).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def layer_key(layer: BundleLayer, bundle: Bundle) -> str:
+    """The content-hashed key that identifies a layer version, it is used in the layer url"""
+    return f'{layer.version}-{bundle.digest}' if layer.version else bundle.digest
+
+
+class BundleBuild:
+    """An archive being built by a worker thread. The chunks can be consumed while the build progresses,
+    from any thread or event loop."""
+
+    def __init__(self, manifest: Manifest):
+        self.manifest = manifest
+        self.etag = manifest_etag(manifest)
+        self.chunks: List[bytes] = []
+        self.bundle: Bundle | None = None
+        self.exception: BaseException | None = None
+        self._condition = threading.Condition()
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.bundle is not None or self.exception is not None
+
+    def run(self, resource_list: List[Resource], bytecode: Bytecode | None):
+        try:
+            for chunk in iter_archive(iter(resource_list), bytecode):
+                self._publish(lambda: self.chunks.append(chunk))
+            content = b''.join(self.chunks)
+            digest = hashlib.sha256(content).hexdigest()[:32]
+            bundle = Bundle(self.etag, content, self.manifest, digest)
+            logger.debug(f'bundle built etag={bundle.etag} entries={len(self.manifest)} len={len(content)}')
+            self._publish(lambda: setattr(self, 'bundle', bundle))
+        except BaseException as e:
+            logger.exception(f'bundle build failed etag={self.etag}')
+            self._publish(lambda: setattr(self, 'exception', e))
+
+    def _publish(self, update: Callable[[], None]):
+        with self._condition:
+            update()
+            listeners, self._listeners = self._listeners, []
+            self._condition.notify_all()
+        for listener in listeners:
+            listener()
+
+    def result(self) -> Bundle:
+        """Blocks until the build is finished"""
+        with self._condition:
+            self._condition.wait_for(lambda: self.finished)
+        if self.exception is not None:
+            raise self.exception
+        return self.bundle
+
+    async def result_async(self) -> Bundle:
+        async for _ in self.iter_chunks():
+            pass
+        return self.bundle
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """Yields the chunks of the archive as soon as they are produced"""
+        loop = asyncio.get_running_loop()
+        index = 0
+        while True:
+            event = asyncio.Event()
+            with self._condition:
+                available = self.chunks[index:]
+                finished = self.finished
+                if not available and not finished:
+                    self._listeners.append(lambda: loop.call_soon_threadsafe(event.set))
+            index += len(available)
+            for chunk in available:
+                yield chunk
+            if not available:
+                if finished:
+                    if self.exception is not None:
+                        raise self.exception
+                    return
+                await event.wait()
+
+
+class BundleCache:
+    """Keeps the last built archive and rebuilds it only when the manifest of the resources changes.
+
+    The archive is built by a worker thread, so the event loop is never blocked by a build.
+    Concurrent misses are single-flight: only one build is started, the other callers wait for it
+    or stream its chunks while it progresses."""
+
+    def __init__(self, resources: Sequence[ResourceIterable], bytecode: Bytecode | None = None, name: str = ''):
+        self._resources = resources
+        self._bytecode = bytecode
+        self.name = name
+        """The label of the bundle metrics, e.g., the layer name"""
+        self._lock = threading.Lock()
+        self._bundle: Bundle | None = None
+        self._build: BundleBuild | None = None
+        self.build_count = 0
+
+    def get(self) -> Bundle:
+        found = self._lookup(*self._snapshot())
+        return found if isinstance(found, Bundle) else found.result()
+
+    async def get_async(self) -> Bundle:
+        found = await self.lookup_async()
+        return found if isinstance(found, Bundle) else await found.result_async()
+
+    async def lookup_async(self) -> Bundle | BundleBuild:
+        """Returns the cached bundle if it is up-to-date, otherwise the build that is producing it"""
+        resource_list, manifest = await asyncio.get_running_loop().run_in_executor(None, self._snapshot)
+        return self._lookup(resource_list, manifest)
+
+    def _snapshot(self) -> Tuple[List[Resource], Manifest]:
+        return snapshot(chain.from_iterable(self._resources))
+
+    def _lookup(self, resource_list: List[Resource], manifest: Manifest) -> Bundle | BundleBuild:
+        with self._lock:
+            bundle = self._bundle
+            if bundle is not None and bundle.manifest == manifest:
+                return bundle
+            build = self._build
+            if build is not None and build.manifest == manifest:
+                return build
+            build = BundleBuild(manifest)
+            self._build = build
+            self.build_count += 1
+        threading.Thread(target=self._run, args=(build, resource_list), daemon=True, name='wwwpy-bundle').start()
+        return build
+
+    def _run(self, build: BundleBuild, resource_list: List[Resource]):
+        start = time.perf_counter()
+        build.run(resource_list, self._bytecode)
+        if build.bundle is not None:
+            _measure(self.name, start, build.bundle)
+        with self._lock:
+            if self._build is build:
+                self._build = None
+                if build.bundle is not None:
+                    self._bundle = build.bundle
+
+
+class LiveBundle:
+    """A bundle kept up-to-date by the file system events (see `apply_events`) instead of checking
+    all the resources on each request.
+
+    The compressed entries are kept per arcname: an event recompresses only the files it refers to,
+    and assembling the bundle only concatenates the compressed entries.
+    The events that cannot be mapped to a known file (e.g., created or moved files, directories)
+    trigger a rescan of the resources that still recompresses only the files whose metadata changed."""
+
+    def __init__(self, resources: Sequence[ResourceIterable], bytecode: Bytecode | None = None, name: str = ''):
+        self._resources = resources
+        self._bytecode = bytecode
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[ManifestEntry, Resource, List[ArchiveEntry]]] = {}
+        self._paths: Dict[str, str] = {}
+        """Maps the normalized file paths to the arcnames"""
+        self._bundle: Bundle | None = None
+        self._rescan_needed = True
+        self._dirty: Set[str] = set()
+        self.build_count = 0
+        self.compress_count = 0
+
+    def apply_events(self, events: Iterable[Event]):
+        with self._lock:
+            for event in events:
+                if event.is_directory and event.event_type == 'modified':
+                    continue  # the files in the directory have their own events
+                path = os.path.abspath(event.src_path)
+                if event.event_type in ('modified', 'closed', 'deleted') and path in self._paths:
+                    self._dirty.add(path)
+                else:
+                    self._rescan_needed = True
+
+    def get(self) -> Bundle:
+        with self._lock:
+            start = time.perf_counter()
+            if self._rescan_needed:
+                self._rescan()
+            elif self._dirty:
+                self._refresh()
+            if self._bundle is None:
+                self._bundle = self._assemble()
+                _measure(self.name, start, self._bundle)
+            return self._bundle
+
+    async def get_async(self) -> Bundle:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get)
+
+    async def lookup_async(self) -> Bundle:
+        return await self.get_async()
+
+    def _rescan(self):
+        resource_list, manifest = snapshot(chain.from_iterable(self._resources))
+        previous = self._entries
+        changed = [(entry, r) for entry, r in zip(manifest, resource_list)
+                   if entry[0] not in previous or previous[entry[0]][0] != entry]
+        compressed = dict(self._compress(changed))
+        entries = {}
+        for entry, resource in zip(manifest, resource_list):
+            arcname = entry[0]
+            entries[arcname] = compressed[arcname] if arcname in compressed else previous[arcname]
+        self._set_entries(entries)
+        self._rescan_needed = False
+        self._dirty.clear()
+
+    def _refresh(self):
+        changed = []
+        entries = dict(self._entries)
+        for path in self._dirty:
+            arcname = self._paths[path]
+            resource = entries[arcname][1]
+            try:
+                entry = manifest_entry(resource)
+            except OSError:
+                del entries[arcname]
+                continue
+            if entry != entries[arcname][0]:
+                changed.append((entry, resource))
+        entries.update(self._compress(changed))
+        self._set_entries(entries)
+        self._dirty.clear()
+
+    def _compress(self, changed: List[Tuple[ManifestEntry, Resource]]):
+        self.compress_count += len(changed)
+        archive_entries = _archive_executor().map(lambda c: resource_entries(c[1], self._bytecode), changed)
+        return [(entry[0], (entry, resource, ae)) for (entry, resource), ae in zip(changed, archive_entries)]
+
+    def _set_entries(self, entries: Dict[str, Tuple[ManifestEntry, Resource, List[ArchiveEntry]]]):
+        if entries == self._entries:
+            return
+        self._entries = entries
+        self._paths = {os.path.abspath(r.filepath): arcname for arcname, (_, r, _) in entries.items()
+                       if isinstance(r, PathResource)}
+        self._bundle = None
+
+    def _assemble(self) -> Bundle:
+        manifest = tuple(entry for entry, _, _ in self._entries.values())
+        content = b''.join(iter_zip(ae for _, _, entries in self._entries.values() for ae in entries))
+        self.build_count += 1
+        bundle = Bundle(manifest_etag(manifest), content, manifest, hashlib.sha256(content).hexdigest()[:32])
+        logger.debug(f'live bundle assembled etag={bundle.etag} entries={len(manifest)} len={len(content)}')
+        return bundle
+
+
+def _measure(name: str, start: float, bundle: Bundle):
+    metrics.bundle_build_duration.observe(time.perf_counter() - start, name)
+    metrics.bundle_size.set(len(bundle.content), name)
@@ -35,3 +35,10 @@ def unload_path(path: str, skip_wwwpy: bool = False):
         else:
             logger.debug(f'hot-reload: unload module `{name}`')
             del (sys.modules[name])
+
+    if names:
+        # the rpc functions and the classes of the unloaded modules must be resolved again
+        from wwwpy.common.rpc2.default_skeleton import dispatch_table
+        from wwwpy.common.rpc import serialization
+        dispatch_table.invalidate()
+        serialization.clear_plans()
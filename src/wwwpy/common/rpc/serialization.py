@@ -6,11 +6,13 @@ import importlib
 import json
 import re
 import sys
+import threading
 import types
 import typing
 from dataclasses import is_dataclass
 from datetime import datetime
-from typing import Any, Type, get_origin, get_args, TypeVar, List, Optional
+from functools import partial
+from typing import Any, Type, get_origin, get_args, TypeVar, List, Optional, Dict, Callable
 
 from wwwpy.common import result
 
@@ -39,6 +41,11 @@ def serialize(obj: T, cls: Type[T], path: Optional[List[str]] = None) -> Any:
     Raises:
         SerializationError: If serialization fails with detailed path information
     """
+    if path is None:
+        try:
+            return _encoders.plan(cls)(obj)
+        except Exception:
+            pass  # serialized again tracking the path, to report where it fails
     path = path or [f"{cls}"]
 
     try:
@@ -264,6 +271,11 @@ def deserialize(data: Any, cls: Type[T], path: Optional[List[str]] = None) -> T:
     Raises:
         DeserializationError: If deserialization fails with detailed path information
     """
+    if path is None:
+        try:
+            return _decoders.plan(cls)(data)
+        except Exception:
+            pass  # deserialized again tracking the path, to report where it fails
     path = path or [f"{cls}"]
 
     try:
@@ -610,6 +622,212 @@ def _is_union_type_3_9(origin):
 _is_union_type = _is_union_type_3_10 if sys.version_info >= (3, 10) else _is_union_type_3_9
 
 
+class _Plans:
+    """Caches the codec plans compiled from the types. A plan is a closure that converts a value without
+    inspecting its type again; on the values it does not expect (e.g., subclasses) it uses the fallback,
+    that is serialize or deserialize tracking the path.
+
+    The plans compiled together (e.g., a dataclass and its fields) are published when all of them are
+    complete, so the recursive dataclasses are never seen half-compiled by the other threads."""
+
+    def __init__(self, compile_plan, fallback):
+        self._compile_plan = compile_plan
+        self._fallback = fallback
+        self._plans: Dict[Any, Callable[[Any], Any]] = {}
+        self._pending: Dict[Any, Callable[[Any], Any]] = {}
+        self._depth = 0
+        self._lock = threading.RLock()
+
+    def plan(self, cls) -> Callable[[Any], Any]:
+        try:
+            return self._plans[cls]
+        except KeyError:
+            pass
+        except TypeError:  # unhashable type annotation
+            return partial(self._fallback, cls)
+        with self._lock:
+            plan = self._plans.get(cls, None) or self._pending.get(cls, None)
+            if plan is not None:
+                return plan
+            self._depth += 1
+            try:
+                try:
+                    plan = self._compile_plan(cls, partial(self._pending.__setitem__, cls))
+                except Exception:
+                    plan = partial(self._fallback, cls)
+                self._pending[cls] = plan
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._plans.update(self._pending)
+                    self._pending.clear()
+            return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans = {}
+
+
+def _serialize_tracked(cls, obj):
+    return serialize(obj, cls, [f"{cls}"])
+
+
+def _deserialize_tracked(cls, data):
+    return deserialize(data, cls, [f"{cls}"])
+
+
+def _compile_encoder(cls, register: Callable[[Callable], None]) -> Callable[[Any], Any]:
+    fallback = partial(_serialize_tracked, cls)
+    optional_type = _get_optional_type(cls)
+    if optional_type:
+        encode = _encoders.plan(optional_type)
+        return lambda obj: None if obj is None else encode(obj)
+
+    origin = get_origin(cls)
+    if _is_union_type(origin):
+        return _compile_union_encoder(cls, fallback)
+    if origin is not None:
+        args = get_args(cls)
+        if origin is list and len(args) == 1:
+            encode = _encoders.plan(args[0])
+            return lambda obj: [encode(item) for item in obj] if type(obj) is list else fallback(obj)
+        if origin is tuple and args:
+            encoders = [_encoders.plan(arg) for arg in args]
+            return lambda obj: [encode(item) for item, encode in zip(obj, encoders)] \
+                if type(obj) is tuple else fallback(obj)
+        if origin is dict and len(args) == 2:
+            encode_key, encode_value = _encoders.plan(args[0]), _encoders.plan(args[1])
+            return lambda obj: {encode_key(key): encode_value(value) for key, value in obj.items()} \
+                if type(obj) is dict else fallback(obj)
+        return fallback
+
+    if not isinstance(cls, type):
+        return fallback
+    if is_dataclass(cls):
+        field_types = typing.get_type_hints(cls)
+        fields = []
+
+        def encode_dataclass(obj):
+            if type(obj) is not cls:
+                return fallback(obj)
+            return {name: encode(getattr(obj, name)) for name, encode in fields}
+
+        register(encode_dataclass)  # the fields can refer to the dataclass itself
+        fields.extend((name, _encoders.plan(field_type)) for name, field_type in field_types.items())
+        return encode_dataclass
+    if cls in (int, float, str, bool) or cls is type(None):
+        return lambda obj: obj if type(obj) is cls else fallback(obj)
+    if cls is datetime:
+        return lambda obj: obj.isoformat() if type(obj) is datetime else fallback(obj)
+    if cls is bytes:
+        return lambda obj: base64.b64encode(obj).decode('utf-8') if type(obj) is bytes else fallback(obj)
+    if issubclass(cls, enum.Enum) and not issubclass(cls, (list, tuple, dict, datetime, bytes, int, float, str)):
+        def encode_enum(obj):
+            if type(obj) is not cls:
+                return fallback(obj)
+            value = obj.value
+            return _encoders.plan(type(value))(value)
+
+        return encode_enum
+    return fallback
+
+
+def _compile_union_encoder(cls, fallback) -> Callable[[Any], Any]:
+    names = {arg: str(arg) for arg in get_args(cls)}
+
+    def encode_union(obj):
+        obj_type = type(obj)
+        name = names.get(obj_type, None)
+        if name is None:
+            return fallback(obj)
+        return [name, _encoders.plan(obj_type)(obj)]
+
+    return encode_union
+
+
+def _compile_decoder(cls, register: Callable[[Callable], None]) -> Callable[[Any], Any]:
+    fallback = partial(_deserialize_tracked, cls)
+    optional_type = _get_optional_type(cls)
+    if optional_type:
+        decode = _decoders.plan(optional_type)
+        return lambda data: None if data is None else decode(data)
+
+    origin = get_origin(cls)
+    if _is_union_type(origin):
+        return _compile_union_decoder(cls, fallback)
+    if origin is not None:
+        args = get_args(cls)
+        if origin is list and len(args) == 1:
+            decode = _decoders.plan(args[0])
+            return lambda data: [decode(item) for item in data] if type(data) is list else fallback(data)
+        if origin is tuple and args:
+            decoders = [_decoders.plan(arg) for arg in args]
+            return lambda data: tuple(decode(item) for item, decode in zip(data, decoders)) \
+                if type(data) is list and len(data) == len(decoders) else fallback(data)
+        if origin is dict and len(args) == 2:
+            decode_key, decode_value = _decoders.plan(args[0]), _decoders.plan(args[1])
+            return lambda data: {decode_key(key): decode_value(value) for key, value in data.items()} \
+                if type(data) is dict else fallback(data)
+        return fallback
+
+    if not isinstance(cls, type):
+        return fallback
+    if is_dataclass(cls):
+        field_types = typing.get_type_hints(cls)
+        fields = []
+
+        def decode_dataclass(data):
+            if type(data) is not dict:
+                return fallback(data)
+            return cls(**{name: decode(data[name]) for name, decode in fields if name in data})
+
+        register(decode_dataclass)  # the fields can refer to the dataclass itself
+        fields.extend((name, _decoders.plan(field_type)) for name, field_type in field_types.items())
+        return decode_dataclass
+    if cls is float:
+        return lambda data: float(data) if type(data) is float or type(data) is int else fallback(data)
+    if cls in (int, str, bool) or cls is type(None):
+        return lambda data: data if type(data) is cls else fallback(data)
+    if cls is datetime:
+        return lambda data: datetime.fromisoformat(data) if type(data) is str else fallback(data)
+    if cls is bytes:
+        return lambda data: base64.b64decode(data.encode('utf-8')) if type(data) is str else fallback(data)
+    if issubclass(cls, enum.Enum) and cls not in (list, tuple, dict):
+        decode = _decoders.plan(type(next(iter(cls)).value))
+        return lambda data: cls(decode(data)) if type(data) is not list else fallback(data)
+    return fallback
+
+
+def _compile_union_decoder(cls, fallback) -> Callable[[Any], Any]:
+    # only the names that deserialize resolves to the same type, the others take the fallback
+    types_by_name = {}
+    for arg in get_args(cls):
+        try:
+            if _get_type_from_string(str(arg)) is arg:
+                types_by_name[str(arg)] = arg
+        except Exception:
+            pass
+
+    def decode_union(data):
+        if type(data) is list and len(data) == 2:
+            obj_type = types_by_name.get(data[0], None)
+            if obj_type is not None:
+                return _decoders.plan(obj_type)(data[1])
+        return fallback(data)
+
+    return decode_union
+
+
+_encoders = _Plans(_compile_encoder, _serialize_tracked)
+_decoders = _Plans(_compile_decoder, _deserialize_tracked)
+
+
+def clear_plans():
+    """Discards the compiled plans, e.g., when the hot reload replaces the classes"""
+    _encoders.clear()
+    _decoders.clear()
+
+
 def to_json(obj: Any, cls: Type[T]) -> str:
     """
     Serialize an object to a JSON string.
@@ -1,15 +1,16 @@
 from __future__ import annotations
 
+import importlib
 import traceback
 from contextlib import contextmanager
 from dataclasses import dataclass
 from types import FunctionType
+from typing import Callable, Awaitable, Dict, Tuple
 
 from wwwpy.common.rpc2.encoder_decoder import EncoderDecoder
 from wwwpy.common.rpc2.skeleton import Skeleton
 from wwwpy.common.rpc2.transport import Transport
 from wwwpy.common.rpc2.typed_function import get_typed_function, TypedFunction
-from wwwpy.unasync import unasync
 
 
 def _get_args_types(func): ...
@@ -18,33 +19,47 @@ def _get_args_types(func): ...
 def _get_return_type(func): ...
 
 
-class DefaultSkeleton(Skeleton):
-    def __init__(self, transport: Transport, encdec: EncoderDecoder, allowed_modules: set[str]):
-        self._transport = transport
-        self._encdec = encdec
-        self._allowed_modules = allowed_modules
+class DispatchTable:
+    """Maps (module, function) to the function and its TypedFunction, resolved on the first call.
+    The hot reload invalidates it (see reloader.unload_path), the functions are resolved again."""
 
-    def invoke_tobe_fixed(self):
-        recv_buffer = self._transport.recv_sync()
-        args, func, target_function = self._decode_request(recv_buffer)
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[FunctionType, TypedFunction]] = {}
 
-        if target_function.is_coroutine:
-            @unasync
-            async def func_async(*args):
-                with _catch() as r:
-                    r.value = await func(*args)
-                return r
+    def get(self, module_name: str, func_name: str) -> Tuple[FunctionType, TypedFunction]:
+        entry = self._entries.get((module_name, func_name), None)
+        if entry is None:
+            func = getattr(importlib.import_module(module_name), func_name)
+            entry = func, get_typed_function(func)
+            self._entries[(module_name, func_name)] = entry
+        return entry
 
-            r = func_async(*args)
-        else:
-            with _catch() as r:
-                r.value = func(*args)
+    def invalidate(self):
+        self._entries = {}
 
-        send_buffer = self._encode_result(target_function, r)
-        self._transport.send_sync(send_buffer)
+
+dispatch_table = DispatchTable()
+
+RunSync = Callable[[str, str, Callable, list], Awaitable]
+"""Runs a sync function, e.g., in a thread pool; it is called with module name, function name, function and args"""
+
+
+class Busy(Exception):
+    """Raised by run_sync when the call cannot be run now: the caller receives a busy response
+    (see wwwpy.exceptions.RemoteBusy) instead of the exception"""
+
+
+class DefaultSkeleton(Skeleton):
+    def __init__(self, transport: Transport, encdec: EncoderDecoder, allowed_modules: set[str],
+                 run_sync: RunSync | None = None):
+        self._transport = transport
+        self._encdec = encdec
+        self._allowed_modules = allowed_modules
+        self._run_sync = run_sync
+        self.invoked: tuple[str, str] | None = None
+        """The (module, function) being invoked, once the request is decoded"""
 
     def invoke_sync(self):
-        # raise Exception('Not implemented - see invoke_tobe_fixed')
         recv_buffer = self._transport.recv_sync()
         args, func, target_function = self._decode_request(recv_buffer)
 
@@ -54,16 +69,23 @@ class DefaultSkeleton(Skeleton):
         send_buffer = self._encode_result(target_function, r)
         self._transport.send_sync(send_buffer)
 
-    async def invoke_async(self):
-        # raise Exception('Not implemented - see invoke_tobe_fixed')
+    async def invoke_async(self) -> _Result:
+        """Invokes the target on the running event loop; the coroutine functions are awaited,
+        the sync ones are given to run_sync if any"""
         recv_buffer = await self._transport.recv_async()
         args, func, target_function = self._decode_request(recv_buffer)
 
         with _catch() as r:
-            r.value = await func(*args)
+            if target_function.is_coroutine:
+                r.value = await func(*args)
+            elif self._run_sync is not None:
+                r.value = await self._run_sync(*self.invoked, func, args)
+            else:
+                r.value = func(*args)
 
         send_buffer = self._encode_result(target_function, r)
         await self._transport.send_async(send_buffer)
+        return r
 
     def _decode_request(self, recv_buffer) -> tuple[list[any], FunctionType, TypedFunction]:
         decoder = self._encdec.decoder(recv_buffer)
@@ -71,18 +93,17 @@ class DefaultSkeleton(Skeleton):
         if module_name not in self._allowed_modules:
             raise Exception(f'Not allowed module: {module_name}')
         func_name = decoder.decode(str)
-        import importlib
-        module = importlib.import_module(module_name)
-        func = getattr(module, func_name)
-        target_function = get_typed_function(func)
-        args = []
-        for arg_type in target_function.args_types:
-            args.append(decoder.decode(arg_type))
+        func, target_function = dispatch_table.get(module_name, func_name)
+        self.invoked = (module_name, func_name)
+        args = [decoder.decode(arg_type) for arg_type in target_function.args_types]
         return args, func, target_function
 
     def _encode_result(self, target_function, result: _Result):
         encoder = self._encdec.encoder()
-        if result.exception_str:
+        if result.busy:
+            encoder.encode('busy', str)
+            encoder.encode(result.busy, str)
+        elif result.exception_str:
             encoder.encode('ex', str)
             encoder.encode(result.exception_str, str)
         else:
@@ -96,6 +117,8 @@ class DefaultSkeleton(Skeleton):
 class _Result:
     value: any = None
     exception_str: str | None = None
+    busy: str | None = None
+    """The message of the Busy exception, when the call was not run"""
 
 
 @contextmanager
@@ -103,5 +126,7 @@ def _catch(*args, **kwds):
     r = _Result()
     try:
         yield r
+    except Busy as e:
+        r.busy = str(e)
     except Exception as e:
         r.exception_str = traceback.format_exc()
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 import types
+from inspect import iscoroutinefunction
 from types import SimpleNamespace
 
 from wwwpy.common.rpc2.encoder_decoder import EncoderDecoder
 from wwwpy.common.rpc2.stub import Stub
 from wwwpy.common.rpc2.transport import Transport
 from wwwpy.common.rpc2.typed_function import TypedFunction, get_typed_function
-from wwwpy.exceptions import RemoteException, RemoteError
+from wwwpy.exceptions import RemoteException, RemoteError, RemoteBusy
 
 
 class DefaultStub(Stub):
@@ -17,6 +18,10 @@ class DefaultStub(Stub):
         self._module_name = module_name
         self._transport = transport
         self._encdec = encdec
+        self._signatures: dict[str, tuple[tuple[type, ...], type]] = {}
+
+    def setup_signatures(self, signatures: dict[str, tuple[tuple[type, ...], type]]) -> None:
+        self._signatures.update(signatures)
 
     def setup_functions(self, *functions: types.FunctionType) -> None:
         for f in functions:
@@ -26,7 +31,12 @@ class DefaultStub(Stub):
         ...
 
     def _add_function(self, f):
-        ft = get_typed_function(f)
+        signature = self._signatures.get(f.__name__, None)
+        if signature is None:
+            ft = get_typed_function(f)
+        else:
+            args_types, return_type = signature
+            ft = TypedFunction(f.__module__, f.__name__, list(args_types), return_type, iscoroutinefunction(f))
 
         def fun_sync(*args):
             return self.invoke_sync(ft, args)
@@ -61,6 +71,8 @@ class DefaultStub(Stub):
         if status == 'ex':
             exception = decoder.decode(str)
             raise RemoteException(exception)
+        elif status == 'busy':
+            raise RemoteBusy(decoder.decode(str))
         elif status == 'ok':
             decode = decoder.decode(target_function.return_type)
             return decode
@@ -30,6 +30,10 @@ class Stub:
     The namespace needs to take care of creating the correct sync or async function/method calls
     """
 
+    def setup_signatures(self, signatures: dict[str, tuple[tuple[type, ...], type]]) -> None:
+        """The (argument types, return type) of the functions, written by the generator; it is called before
+        setup_functions, that can use them instead of evaluating the type hints of the functions"""
+
     def setup_functions(self, *functions: types.FunctionType) -> None:
         """This must setup the namespace for the functions"""
 
@@ -66,11 +70,15 @@ Inclusion/Exclusion
     ]
     used_annotations: _annotations_type = set()
     function_names = []
+    signatures = []
     class_names = []
     for b in tree.body:
         if isinstance(b, (ast.FunctionDef, ast.AsyncFunctionDef)) and not b.name.startswith('_'):
+            signature = _signature_source(b)
             _add_function_or_method(lines, b, used_annotations)
             function_names.append(b.name)
+            if signature is not None:
+                signatures.append(f'{b.name!r}: {signature}')
         elif isinstance(b, (ast.ImportFrom, ast.Import)):
             lines.append(b)
         elif isinstance(b, ast.ClassDef) and not b.name.startswith('_'):
@@ -100,6 +108,9 @@ Inclusion/Exclusion
         elif isinstance(line, ast.ImportFrom):
             lines[idx] = ast.unparse(line) if _is_import_from_used(line, used_annotations) else ''
 
+    # setup_signatures call, so the caller side does not evaluate the type hints at import time
+    if signatures:
+        lines.append(f'{_stub_name}.setup_signatures({{{", ".join(signatures)}}})')
     # setup_functions call
     lines.append(f'{_stub_name}.setup_functions({", ".join(function_names)})')
     # setup_classes call
@@ -132,6 +143,32 @@ def _add_function_or_method(lines, b, used_annotations, class_name=''):
     lines.append('')  # empty line after each function
 
 
+def _signature_source(func: ast.FunctionDef | ast.AsyncFunctionDef) -> str | None:
+    """The source of the (argument types, return type) tuple of the function, None when it cannot be
+    written ahead of time (e.g., a missing annotation or a nested forward reference)"""
+    annotations = [ar.annotation for ar in func.args.args]
+    if any(annotation is None for annotation in annotations):
+        return None
+    sources = [_annotation_source(annotation) for annotation in annotations]
+    returns = _annotation_source(func.returns) if func.returns else 'type(None)'
+    if None in sources or returns is None:
+        return None
+    args = f'({sources[0]},)' if len(sources) == 1 else f'({", ".join(sources)})'
+    return f'({args}, {returns})'
+
+
+def _annotation_source(annotation: ast.expr) -> str | None:
+    if isinstance(annotation, ast.Constant) and isinstance(annotation.value, str):
+        try:
+            annotation = ast.parse(annotation.value, mode='eval').body
+        except SyntaxError:
+            return None
+    if any(isinstance(node, ast.Constant) and isinstance(node.value, str) for node in ast.walk(annotation)):
+        return None
+    source = ast.unparse(annotation)
+    return 'type(None)' if source == 'None' else source
+
+
 def _is_import_used(node: ast.Import, used_annotations: _annotations_type) -> bool:
     for alias in node.names:
         candidate = alias.asname if alias.asname is not None else alias.name
@@ -196,6 +233,7 @@ class Class2:
         return await _stub.namespace.Class1.sub(self, c)
     
             
+_stub.setup_signatures({'add': ((int, int), int), 'sub': ((int, int), SomeThing)})
 _stub.setup_functions(add, sub)
 _stub.setup_classes(Class1, Class2)
 """
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 from pathlib import Path
 import logging
 import configparser
@@ -21,6 +23,60 @@ class Settings:
     def open_url_code(self) -> str:
         return self._config.get('general', 'open_url_code', fallback='')
 
+    @property
+    def pyodide_dir(self) -> Path | None:
+        """A directory with the Pyodide distribution to serve instead of using the CDN"""
+        value = self._config.get('general', 'pyodide_dir', fallback='')
+        return Path(value) if value else None
+
+    @property
+    def persistent_bundle(self) -> bool:
+        """The browser keeps the bundle in IndexedDB and downloads only the changed files; ignored in dev mode"""
+        return self._config.getboolean('general', 'persistent_bundle', fallback=False)
+
+    @property
+    def bytecode(self) -> bool:
+        """Ships in the bundle the .pyc files compiled for Pyodide, when the server runs the same Python version"""
+        return self._config.getboolean('general', 'bytecode', fallback=False)
+
+    @property
+    def tree_shake(self) -> bool:
+        """Ships only the wwwpy modules that the remote imports; ignored in dev mode"""
+        return self._config.getboolean('general', 'tree_shake', fallback=False)
+
+    @property
+    def tree_shake_whitelist(self) -> list[str]:
+        """The modules the tree shaking always ships, e.g., `wwwpy.remote.shoelace, wwwpy.remote.databind.*`"""
+        value = self._config.get('general', 'tree_shake_whitelist', fallback='')
+        return [module.strip() for module in value.split(',') if module.strip()]
+
+    @property
+    def webserver(self) -> str:
+        """The webserver to use, e.g., tornado or uvicorn (see wwwpy.webservers.available_webservers)"""
+        return self._config.get('general', 'webserver', fallback='')
+
+    @property
+    def metrics(self) -> bool:
+        """Serves the server metrics at /wwwpy/metrics, in the Prometheus text format"""
+        return self._config.getboolean('general', 'metrics', fallback=False)
+
+    @property
+    def rpc_max_workers(self) -> int:
+        """The threads that run the sync rpc functions"""
+        return self._config.getint('rpc', 'max_workers', fallback=16)
+
+    @property
+    def rpc_max_queue(self) -> int:
+        """The sync rpc calls that can wait for a thread, the others fail as busy"""
+        return self._config.getint('rpc', 'max_queue', fallback=256)
+
+    @property
+    def rpc_module_limits(self) -> dict[str, int]:
+        """The modules with their own threads, e.g., `server.reports = 2` in the [rpc_module_limits] section"""
+        if not self._config.has_section('rpc_module_limits'):
+            return {}
+        return {module: int(value) for module, value in self._config.items('rpc_module_limits')}
+
     @property
     def log_level(self) -> dict[str, str]:
         if not self._config.has_section('log_level'):
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import logging
+import threading
+from collections import OrderedDict
+from typing import Tuple, Callable, List
+
+from wwwpy.common.asynclib import OptionalCoroutine
+from wwwpy.http import HttpRequest, HttpResponse, HttpRoute, accepted_encodings, accepts
+from wwwpy.static import FileContent
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+min_size = 1024
+"""The smaller responses are not compressed, the saving does not pay for the overhead"""
+
+max_file_size = 4 * 1024 * 1024
+"""The bigger files are streamed as they are; they should have a precompressed sibling (see StaticRoute)"""
+
+_compressible_prefixes = ('text/', 'application/json', 'application/javascript', 'application/wasm',
+                          'application/xml', 'image/svg+xml')
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """The encodings that can be produced, in order of preference"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding: str | None) -> str:
+    """Returns the best encoding accepted by the client, '' for the identity"""
+    accepted = accepted_encodings(accept_encoding)
+    candidates = [e for e in available_encodings() if accepts(accepted, e)]
+    if not candidates:
+        return ''
+    return max(candidates, key=lambda e: accepted.get(e, accepted.get('*', 0.0)))
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(content, quality=5)
+    return gzip.compress(content, compresslevel=6, mtime=0)
+
+
+class CompressedCache:
+    """Keeps the compressed bodies of the responses with a strong ETag: the same content is never compressed twice.
+    The entries are keyed by the resource too (e.g., the file path), because an ETag identifies the content
+    of one resource only. The least recently used bodies are evicted first."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Tuple[str, str, str], bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.compress_count = 0
+
+    def cached(self, resource: str, etag: str, encoding: str) -> bytes | None:
+        key = (resource, etag, encoding)
+        with self._lock:
+            compressed = self._entries.get(key, None)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+            return compressed
+
+    def get(self, resource: str, etag: str, encoding: str, content: Callable[[], bytes]) -> bytes:
+        compressed = self.cached(resource, etag, encoding)
+        if compressed is not None:
+            return compressed
+        key = (resource, etag, encoding)
+        compressed = compress(content(), encoding)
+        with self._lock:
+            self.compress_count += 1
+            if len(compressed) <= self.max_bytes and key not in self._entries:
+                self._entries[key] = compressed
+                self._size += len(compressed)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return compressed
+
+
+compressed_cache = CompressedCache()
+
+
+def compressing(request: HttpRequest, route: HttpRoute, resp: Callable[[HttpResponse], OptionalCoroutine],
+                pending: List[asyncio.Future] | None = None) -> Callable[[HttpResponse], OptionalCoroutine]:
+    """Wraps the response callback of a route, so the responses are compressed as negotiated with the client.
+    A body that is not in the cache is compressed in the default executor, by a task that is appended
+    to `pending`: the webservers await it, also when the route callback does not (see middleware.handle)."""
+    if not route.compress:
+        return resp
+
+    def compressed(response: HttpResponse) -> OptionalCoroutine:
+        prepared = _prepare(request, response, compressed_cache)
+        if isinstance(prepared, HttpResponse):
+            return resp(prepared)
+        task = asyncio.ensure_future(_compress_in_executor(prepared, resp))
+        if pending is not None:
+            pending.append(task)
+        return task
+
+    return compressed
+
+
+def compress_response(request: HttpRequest, response: HttpResponse, cache: CompressedCache = compressed_cache) \
+        -> HttpResponse:
+    """Returns the response compressed with the best encoding accepted by the request, when it is worth it.
+    The streaming responses are sent as they are, except the files (see FileContent) that are small enough."""
+    prepared = _prepare(request, response, cache)
+    return prepared if isinstance(prepared, HttpResponse) else prepared()
+
+
+async def _compress_in_executor(prepared: Callable[[], HttpResponse], resp: Callable[[HttpResponse], OptionalCoroutine]):
+    # compressing (and reading) a body up to max_file_size would stall all the connections of the event loop
+    response = await asyncio.get_running_loop().run_in_executor(None, prepared)
+    res = resp(response)
+    if res:
+        await res
+
+
+def _prepare(request: HttpRequest, response: HttpResponse, cache: CompressedCache) \
+        -> HttpResponse | Callable[[], HttpResponse]:
+    """Returns the response to send when it is ready without blocking (nothing to compress or a cache hit),
+    otherwise a function that reads and compresses the body"""
+    content = response.content
+    if response.status != 200 or not _compressible(response):
+        return response
+    if isinstance(content, FileContent):
+        if not min_size <= content.count <= max_file_size:
+            return response
+    elif isinstance(content, (bytes, str)):
+        if len(content) < min_size:
+            return response
+    else:
+        return response
+
+    headers = dict(response.headers)
+    vary = headers.get('Vary', '')
+    if 'accept-encoding' not in vary.lower():
+        headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+    encoding = negotiate(request.headers.get('accept-encoding', None))
+    if not encoding:
+        return response._replace(headers=headers)
+    headers = {name: value for name, value in headers.items() if name.lower() != 'content-length'}
+    headers['Content-Encoding'] = encoding
+
+    def body() -> bytes:
+        if isinstance(content, FileContent):
+            return b''.join(content)
+        return content.encode() if isinstance(content, str) else content
+
+    etag = headers.get('ETag', '')
+    if not etag.startswith('"'):
+        return lambda: response._replace(content=compress(body(), encoding), headers=headers)
+
+    # the compressed body is another representation, but it must still match the conditional requests
+    headers['ETag'] = 'W/' + etag
+    resource = str(content.path) if isinstance(content, FileContent) else f'{request.path}?{request.query}'
+    compressed = cache.cached(resource, etag, encoding)
+    if compressed is not None:
+        return response._replace(content=compressed, headers=headers)
+    return lambda: response._replace(content=cache.get(resource, etag, encoding, body), headers=headers)
+
+
+def _compressible(response: HttpResponse) -> bool:
+    if any(name.lower() == 'content-encoding' for name in response.headers):
+        return False
+    content_type = (response.content_type or '').lower()
+    return content_type.startswith(_compressible_prefixes) or '+json' in content_type or '+xml' in content_type
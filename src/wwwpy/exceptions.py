@@ -10,3 +10,8 @@ class RemoteException(WwwpyException):
 class RemoteError(WwwpyException):
     """When network/wwwpy infrastructure fails"""
     pass
+
+
+class RemoteBusy(RemoteError):
+    """When the server is too busy to run the call; it can be retried later"""
+    pass
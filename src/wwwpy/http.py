@@ -1,28 +1,137 @@
-from typing import NamedTuple, Callable, Union
+from __future__ import annotations
+
+import asyncio
+from types import MappingProxyType
+from typing import NamedTuple, Callable, Union, Mapping, AsyncIterable, Iterable, AsyncIterator, Tuple, Dict
 # todo rename this in httplib (otherwise it crash jetbrains debug mode)
 from wwwpy.common.asynclib import OptionalCoroutine
 
+_no_headers: Mapping[str, str] = MappingProxyType({})
+
 
 class HttpRequest(NamedTuple):
     method: str
-    content: Union[str, bytes]
+    content: Union[str, bytes, AsyncIterator[bytes]]
+    """The body; it is an async iterator of the body chunks when the route has `stream_body`"""
     content_type: str
+    headers: Mapping[str, str] = _no_headers
+    """The request headers; the names are lower case"""
+    query: str = ''
+    """The raw query string, without the leading '?'"""
+    path: str = ''
+    """The url path, without the query string"""
+    params: Mapping[str, str] = _no_headers
+    """The values of the path parameters of the route, e.g., {'name': 'x'} for /{name} (see wwwpy.router)"""
+
+
+Chunks = Union[Iterable[bytes], AsyncIterable[bytes]]
 
 
 class HttpResponse(NamedTuple):
-    content: Union[str, bytes]
+    content: Union[str, bytes, Chunks]
+    """When it is an iterable (sync or async) of chunks, the chunks are sent to the client as soon as
+    they are produced; the sync iterators are advanced in a worker thread, so they can block (e.g., reading a file)"""
     content_type: str
+    status: int = 200
+    headers: Mapping[str, str] = _no_headers
+
+    @staticmethod
+    def stream(chunks: Chunks, content_type: str, headers: Mapping[str, str] = _no_headers) -> 'HttpResponse':
+        return HttpResponse(chunks, content_type, headers=headers)
 
     @staticmethod
-    def application_zip(content: bytes) -> 'HttpResponse':
+    def application_zip(content: bytes | Chunks, headers: Mapping[str, str] = _no_headers) -> 'HttpResponse':
         content_type = 'application/zip, application/octet-stream, application/x-zip-compressed, multipart/x-zip'
-        return HttpResponse(content, content_type)
+        return HttpResponse(content, content_type, headers=headers)
 
     @staticmethod
     def text_html(content: str) -> 'HttpResponse':
         return HttpResponse(content, 'text/html')
 
+    @staticmethod
+    def not_modified(headers: Mapping[str, str] = _no_headers) -> 'HttpResponse':
+        return HttpResponse(b'', '', 304, headers)
+
 
 class HttpRoute(NamedTuple):
     path: str
     callback: Callable[[HttpRequest, Callable[[HttpResponse], OptionalCoroutine]], OptionalCoroutine]
+    stream_body: bool = False
+    """When True the callback receives the body as an async iterator of chunks, as they arrive"""
+    max_body_size: int | None = None
+    """The requests with a bigger body are rejected with 413; None is the webserver default"""
+    methods: Tuple[str, ...] = ()
+    """The accepted methods, e.g., ('GET',); empty accepts any method"""
+    compress: bool = True
+    """When False the responses are never compressed (see wwwpy.compression), e.g., for already compressed payloads"""
+    middlewares: Tuple[Callable, ...] = ()
+    """The middlewares of this route only, they run after the ones of the webserver (see wwwpy.middleware)"""
+
+
+class RequestBodyTooLarge(Exception):
+    pass
+
+
+def is_streaming(content) -> bool:
+    return not isinstance(content, (str, bytes, bytearray, memoryview)) and (
+            hasattr(content, '__aiter__') or hasattr(content, '__iter__'))
+
+
+async def aiter_chunks(chunks: Chunks) -> AsyncIterator[bytes]:
+    """Iterates the chunks of a streaming response; the str chunks are encoded in utf-8"""
+    if hasattr(chunks, '__aiter__'):
+        async for chunk in chunks:
+            yield chunk.encode() if isinstance(chunk, str) else chunk
+        return
+    loop = asyncio.get_running_loop()
+    iterator = iter(chunks)
+    end = object()
+    while True:
+        chunk = await loop.run_in_executor(None, next, iterator, end)
+        if chunk is end:
+            return
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def content_length(value: str | None) -> int:
+    """Parses the Content-Length request header, 0 when it is missing; raises ValueError when it is malformed"""
+    if not value:
+        return 0
+    value = value.strip()
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(f'Malformed Content-Length: {value!r}')
+    return int(value)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Evaluates the If-None-Match request header against the given (strong) etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [c.strip() for c in if_none_match.split(',')]
+    return any(c.removeprefix('W/') == etag for c in candidates)
+
+
+def accepted_encodings(accept_encoding: str | None) -> Dict[str, float]:
+    """Parses the Accept-Encoding request header, e.g., {'gzip': 1.0, 'br': 0.5}"""
+    result = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        result[name] = quality
+    return result
+
+
+def accepts(accepted: Dict[str, float], encoding: str) -> bool:
+    return accepted.get(encoding, accepted.get('*', 0.0)) > 0
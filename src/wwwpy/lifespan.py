@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Iterator
+
+from wwwpy.common.asynclib import OptionalCoroutine
+
+logger = logging.getLogger(__name__)
+
+Hook = Callable[[], OptionalCoroutine]
+
+
+class Lifespan:
+    """The startup and shutdown hooks of a webserver.
+
+    The startup hooks run, in order, before the webserver accepts requests (for the ASGI servers, before
+    `lifespan.startup.complete`): they warm up what the first request would otherwise pay for.
+    A hook can register other hooks, they run in the same startup.
+    The shutdown drains the requests in flight, then runs the shutdown hooks in reverse order."""
+
+    def __init__(self, drain_timeout: float = 10.0):
+        self.on_startup: List[Hook] = []
+        self.on_shutdown: List[Hook] = []
+        self.drain_timeout = drain_timeout
+        self.started = False
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def request(self) -> Iterator[None]:
+        """Tracks a request in flight, so the shutdown waits for it"""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    async def startup(self):
+        # the hooks can append other hooks while iterating
+        index = 0
+        while index < len(self.on_startup):
+            start = time.perf_counter()
+            hook = self.on_startup[index]
+            await _call(hook)
+            logger.debug(f'startup hook {_name(hook)} took {time.perf_counter() - start:.3f}s')
+            index += 1
+        self.started = True
+
+    async def shutdown(self):
+        await self.drain()
+        for hook in reversed(self.on_shutdown):
+            try:
+                await _call(hook)
+            except Exception:
+                logger.exception(f'shutdown hook {_name(hook)} failed')
+        self.started = False
+
+    async def drain(self) -> bool:
+        """Waits until there are no requests in flight, or the drain timeout expires; returns True if drained"""
+        deadline = time.monotonic() + self.drain_timeout
+        while self._in_flight > 0:
+            if time.monotonic() >= deadline:
+                logger.warning(f'shutdown with {self._in_flight} requests in flight')
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+
+async def _call(hook: Hook):
+    res = hook()
+    if res:
+        await res
+
+
+def _name(hook: Hook) -> str:
+    return getattr(hook, '__qualname__', repr(hook))
@@ -0,0 +1,201 @@
+"""The server metrics, exposed in the Prometheus text format by `metrics_route` (e.g., at /wwwpy/metrics).
+
+The collection is always on: updating a metric costs a lock and a few dict operations.
+Each process has its own metrics, so with `wwwpy serve --workers` every worker exposes its own."""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Dict, Tuple, Sequence, List, Iterable
+
+from wwwpy.http import HttpRoute, HttpRequest, HttpResponse
+
+Labels = Tuple[str, ...]
+
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterable[Tuple[str, Labels, float]]:
+        """Yields (suffix, label values, value) for each sample"""
+        return ()
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {_escape_help(self.documentation)}', f'# TYPE {self.name} {self.type}']
+        for suffix, values, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_labels(self.labels, values)} {_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return (('', labels, value) for labels, value in values)
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return (('', labels, value) for labels, value in values)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = default_buckets):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Labels, List[float]] = {}
+        """Maps the label values to the counts of each bucket (not cumulative), then the +Inf count and the sum"""
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels, None)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def count(self, *labels: str) -> int:
+        counts = self._values.get(labels, None)
+        return 0 if counts is None else sum(counts[:-1])
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                yield '_bucket', (*labels, _value(bound)), cumulative
+            yield '_sum', labels, counts[-1]
+            yield '_count', labels, cumulative
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {_escape_help(self.documentation)}', f'# TYPE {self.name} {self.type}']
+        for suffix, values, value in self.samples():
+            names = (*self.labels, 'le') if suffix == '_bucket' else self.labels
+            lines.append(f'{self.name}{suffix}{_labels(names, values)} {_value(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """A metric with the same name of a previous one replaces it"""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = default_buckets) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return ''.join(line + '\n' for metric in metrics for line in metric.render())
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    'wwwpy_http_request_duration_seconds', 'Time until the response of the http requests, per route',
+    ('route', 'method', 'status'))
+rpc_duration = registry.histogram(
+    'wwwpy_rpc_duration_seconds', 'Duration of the rpc calls', ('module', 'function'))
+rpc_errors = registry.counter(
+    'wwwpy_rpc_errors_total', 'The rpc calls that raised an exception', ('module', 'function'))
+rpc_queue_wait = registry.histogram(
+    'wwwpy_rpc_queue_wait_seconds', 'Time the sync rpc calls wait for a thread', ('module', 'function'))
+rpc_run = registry.histogram(
+    'wwwpy_rpc_run_seconds', 'Run time of the sync rpc calls in the thread pool', ('module', 'function'))
+rpc_queue_depth = registry.gauge(
+    'wwwpy_rpc_queue_depth', 'The sync rpc calls waiting for a thread')
+rpc_rejected = registry.counter(
+    'wwwpy_rpc_rejected_total', 'The sync rpc calls rejected because the queue was full', ('module', 'function'))
+websocket_bytes = registry.counter(
+    'wwwpy_websocket_bytes_total', 'The bytes of the websocket messages', ('direction',))
+websocket_clients = registry.gauge(
+    'wwwpy_websocket_clients', 'The websocket clients connected, per route', ('route',))
+bundle_build_duration = registry.histogram(
+    'wwwpy_bundle_build_duration_seconds', 'Duration of the bundle builds', ('bundle',),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+bundle_size = registry.gauge(
+    'wwwpy_bundle_size_bytes', 'Size of the last bundle built', ('bundle',))
+
+
+def metrics_route(path: str = '/wwwpy/metrics', metrics: Registry = registry) -> HttpRoute:
+    def callback(request: HttpRequest, resp):
+        return resp(HttpResponse(metrics.render(), 'text/plain; version=0.0.4; charset=utf-8',
+                                 headers={'Cache-Control': 'no-store'}))
+
+    return HttpRoute(path, callback, methods=('GET',))
+
+
+def _labels(names: Sequence[str], values: Labels) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escape_help(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
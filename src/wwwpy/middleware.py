@@ -0,0 +1,184 @@
+"""The middlewares sit between the webservers and the routes, e.g., to time the requests, to limit their size
+or to answer from a cache.
+
+An http middleware is called with the request, the response callback and the next handler of the chain
+(the next middleware or the route callback), all with the signature of HttpRoute.callback.
+It can call the next handler, maybe with another request or response callback, or answer by itself.
+As for the route callbacks, it can be sync or async: it returns the OptionalCoroutine of the next handler
+or of the response callback.
+
+A websocket middleware is called when a client connects, with the handshake request, the endpoint and
+the next connect handler; not calling it rejects the connection.
+
+The webserver middlewares (see Webserver.add_middleware) run before the ones of the route."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Callable, Sequence, Tuple, AsyncIterator
+
+from wwwpy import metrics
+from wwwpy.common.asynclib import OptionalCoroutine
+from wwwpy.compression import compressing
+from wwwpy.http import HttpRequest, HttpResponse, HttpRoute, is_streaming, RequestBodyTooLarge
+from wwwpy.websocket import WebsocketEndpoint, WebsocketRoute
+
+logger = logging.getLogger(__name__)
+
+Resp = Callable[[HttpResponse], OptionalCoroutine]
+Handler = Callable[[HttpRequest, Resp], OptionalCoroutine]
+Middleware = Callable[[HttpRequest, Resp, Handler], OptionalCoroutine]
+ConnectHandler = Callable[[HttpRequest, WebsocketEndpoint], None]
+WebsocketMiddleware = Callable[[HttpRequest, WebsocketEndpoint, ConnectHandler], None]
+
+
+def chain(middlewares: Sequence[Middleware], handler: Handler) -> Handler:
+    """Returns a handler that runs the middlewares, in order, and finally the given handler"""
+    for middleware in reversed(middlewares):
+        handler = partial(_step, middleware, handler)
+    return handler
+
+
+def _step(middleware, call_next, request, resp_or_endpoint):
+    return middleware(request, resp_or_endpoint, call_next)
+
+
+def handle(route: HttpRoute, request: HttpRequest, resp: Resp, middlewares: Sequence[Middleware] = ()) \
+        -> OptionalCoroutine:
+    """Serves the request with the route; this is what the webservers call for each http request.
+    The returned coroutine completes when the response is sent, also when the route callback
+    did not return the OptionalCoroutine of the response callback."""
+    pending: list[asyncio.Future] = []
+    handler = chain((*middlewares, *route.middlewares), route.callback)
+    res = handler(request, _measuring(route, request, compressing(request, route, resp, pending)))
+    if not res and not pending:
+        return None
+    return _completing(res, pending)
+
+
+async def _completing(res: OptionalCoroutine, pending: list[asyncio.Future]):
+    if res:
+        await res
+    for task in pending:
+        await task
+
+
+def _measuring(route: HttpRoute, request: HttpRequest, resp: Resp) -> Resp:
+    start = time.perf_counter()
+
+    def measured(response: HttpResponse) -> OptionalCoroutine:
+        metrics.http_request_duration.observe(time.perf_counter() - start, route.path, request.method,
+                                              str(response.status))
+        return resp(response)
+
+    return measured
+
+
+def connect(route: WebsocketRoute, request: HttpRequest, endpoint: WebsocketEndpoint,
+            middlewares: Sequence[WebsocketMiddleware] = ()) -> bool:
+    """Connects the endpoint to the route; this is what the webservers call for each websocket connection.
+    Returns False when a middleware rejected the connection, the webserver closes it."""
+    connected = False
+
+    def on_connect(_: HttpRequest, accepted: WebsocketEndpoint):
+        nonlocal connected
+        connected = True
+        route.on_connect(accepted)
+
+    chain((*middlewares, *route.middlewares), on_connect)(request, endpoint)
+    return connected
+
+
+class Timing:
+    """Adds the Server-Timing header with the time spent until the response, and logs the slow requests"""
+
+    def __init__(self, slow_ms: float = 1000):
+        self.slow_ms = slow_ms
+
+    def __call__(self, request: HttpRequest, resp: Resp, call_next: Handler) -> OptionalCoroutine:
+        start = time.perf_counter()
+
+        def timed(response: HttpResponse) -> OptionalCoroutine:
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= self.slow_ms:
+                logger.warning(f'slow request {request.method} {request.path} took {duration:.0f}ms')
+            headers = {**response.headers, 'Server-Timing': f'app;dur={duration:.1f}'}
+            return resp(response._replace(headers=headers))
+
+        return call_next(request, timed)
+
+
+class RequestSizeLimit:
+    """Answers 413 to the requests with a body bigger than max_bytes; the streamed bodies are checked
+    while they are read (see HttpRoute.stream_body)"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+    def __call__(self, request: HttpRequest, resp: Resp, call_next: Handler) -> OptionalCoroutine:
+        content_length = request.headers.get('content-length', '')
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            return resp(HttpResponse('Request body too large', 'text/plain', 413))
+        content = request.content
+        if isinstance(content, (bytes, str)):
+            if len(content) > self.max_bytes:
+                return resp(HttpResponse('Request body too large', 'text/plain', 413))
+            return call_next(request, resp)
+        return call_next(request._replace(content=self._limited(content)), resp)
+
+    async def _limited(self, content: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        size = 0
+        async for chunk in content:
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise RequestBodyTooLarge(f'The request body exceeds {self.max_bytes} bytes')
+            yield chunk
+
+
+class ResponseCache:
+    """Answers the GET requests with the responses already produced for the same path and query,
+    for `ttl` seconds. Only the complete 200 responses are kept (not the streaming ones), unless they
+    have Cache-Control no-store or private. It is meant for the routes whose response does not depend
+    on who is asking, e.g., HttpRoute('/news', news, middlewares=(ResponseCache(ttl=5),))"""
+
+    def __init__(self, ttl: float = 60, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Tuple[str, str], Tuple[float, HttpResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, request: HttpRequest, resp: Resp, call_next: Handler) -> OptionalCoroutine:
+        if request.method not in ('GET', 'HEAD') or 'no-cache' in request.headers.get('cache-control', ''):
+            return call_next(request, resp)
+        key = (request.path, request.query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return resp(entry[1])
+            self.misses += 1
+
+        def store(response: HttpResponse) -> OptionalCoroutine:
+            if self._cacheable(response):
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + self.ttl, response)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return resp(response)
+
+        return call_next(request, store)
+
+    def _cacheable(self, response: HttpResponse) -> bool:
+        if response.status != 200 or is_streaming(response.content):
+            return False
+        cache_control = response.headers.get('Cache-Control', '')
+        return 'no-store' not in cache_control and 'private' not in cache_control
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from wwwpy.http import HttpRoute
+from wwwpy.static import StaticRoute
+
+preload_files = {'pyodide.asm.wasm': 'fetch', 'python_stdlib.zip': 'fetch', 'pyodide.asm.js': 'script'}
+"""The files that Pyodide always downloads during loadPyodide, with their preload `as` attribute"""
+
+
+def pyodide_route(directory: Path, route_prefix: str) -> HttpRoute:
+    """Serves the Pyodide distribution in `directory` (including the packages) at `route_prefix`, with the
+    precompressed siblings (e.g., pyodide.asm.wasm.br) when the client accepts them (see StaticRoute).
+    The route prefix must contain the Pyodide version, because the files are served as immutable."""
+    return StaticRoute(route_prefix, directory, cache_control='public, max-age=31536000, immutable').as_http_route()
+
+
+def preload_links(index_url: str) -> str:
+    """The <link rel=preload> hints for the files that loadPyodide downloads first"""
+    # the fetches of Pyodide are cors-mode requests, its scripts are not
+    return ''.join(f'<link rel="preload" href="{index_url}{name}" as="{as_}"{" crossorigin" if as_ == "fetch" else ""}>'
+                   for name, as_ in preload_files.items())
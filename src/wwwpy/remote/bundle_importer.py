@@ -0,0 +1,154 @@
+"""Imports the python modules directly from the downloaded bundle archives, without unpacking them.
+
+The non-python files are extracted eagerly in the overlay directory (so they can be opened by path), the modules
+are decompressed and executed only when imported. The overlay directory has precedence on the archives:
+the hot reload writes there. A path that was materialized in the overlay (see BundleImporter.materialize) is never
+looked up in the archives again, so deleting it from the overlay deletes it from the bundle.
+
+This source is inlined in the bootstrap python (see wwwpy.bootstrap), because it is needed before the bundle
+can be imported; for this reason it must use only the standard library and it cannot contain backslashes,
+backticks or triple single quotes.
+"""
+import importlib.machinery
+import importlib.util
+import io
+import marshal
+import os
+import sys
+import zipfile
+
+_python_suffixes = ('.py', '.pyc')
+
+
+class BundleImporter:
+    _wwwpy_bundle_importer = True
+
+    def __init__(self, overlay_dir: str):
+        self.overlay_dir = overlay_dir
+        os.makedirs(overlay_dir, exist_ok=True)
+        self._entries = {}
+        """Maps the arcnames of the python files to the ZipFile containing them"""
+        self._directories = set()
+        self._materialized = set()
+
+    def add_archive(self, content: bytes):
+        """The archives added later have precedence on the ones added before"""
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        for name in archive.namelist():
+            if name.endswith('/'):
+                continue
+            if name.endswith(_python_suffixes):
+                self._entries[name] = archive
+                parts = name.split('/')[:-1]
+                self._directories.update('/'.join(parts[:i + 1]) for i in range(len(parts)))
+            else:
+                archive.extract(name, self.overlay_dir)
+
+    def install(self):
+        """Inserts the importer in sys.meta_path before the PathFinder"""
+        finders = sys.meta_path
+        path_finder = importlib.machinery.PathFinder
+        finders.insert(finders.index(path_finder) if path_finder in finders else len(finders), self)
+
+    def materialize(self, path: str):
+        """Extracts in the overlay the archived files at the path (a file or a directory relative to the overlay).
+        From then on only the overlay is used for those files."""
+        path = path.strip('/')
+        for arcname, archive in self._entries.items():
+            if arcname != path and not arcname.startswith(path + '/'):
+                continue
+            if arcname in self._materialized:
+                continue
+            self._materialized.add(arcname)
+            if not os.path.exists(self._overlay(arcname)):
+                archive.extract(arcname, self.overlay_dir)
+
+    def find_spec(self, fullname, path=None, target=None):
+        relative = fullname.replace('.', '/')
+        for candidate, is_package in ((relative + '/__init__.py', True), (relative + '/__init__.pyc', True),
+                                      (relative + '.py', False), (relative + '.pyc', False)):
+            overlay = self._overlay(candidate)
+            if os.path.isfile(overlay):
+                return self._overlay_spec(fullname, overlay, is_package)
+            if candidate in self._entries and candidate not in self._materialized:
+                loader = _ArchiveLoader(self, candidate, overlay)
+                spec = importlib.machinery.ModuleSpec(fullname, loader, origin=overlay, is_package=is_package)
+                if is_package:
+                    spec.submodule_search_locations = [self._overlay(relative)]
+                spec.has_location = True
+                return spec
+        if relative in self._directories:
+            spec = importlib.machinery.ModuleSpec(fullname, None, is_package=True)
+            spec.submodule_search_locations = [self._overlay(relative)]
+            return spec
+        return None
+
+    def invalidate_caches(self):
+        pass
+
+    def _overlay_spec(self, fullname: str, overlay: str, is_package: bool):
+        if overlay.endswith('.pyc'):
+            loader = importlib.machinery.SourcelessFileLoader(fullname, overlay)
+        else:
+            loader = importlib.machinery.SourceFileLoader(fullname, overlay)
+        locations = [os.path.dirname(overlay)] if is_package else None
+        return importlib.util.spec_from_file_location(fullname, overlay, loader=loader,
+                                                      submodule_search_locations=locations)
+
+    def _overlay(self, arcname: str) -> str:
+        return self.overlay_dir + '/' + arcname
+
+    def _read(self, arcname: str) -> bytes | None:
+        archive = self._entries.get(arcname, None)
+        if archive is None or arcname in self._materialized:
+            return None
+        return archive.read(arcname)
+
+
+class _ArchiveLoader:
+    def __init__(self, importer: BundleImporter, arcname: str, origin: str):
+        self._importer = importer
+        self._arcname = arcname
+        self._origin = origin
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        exec(self.get_code(module.__name__), module.__dict__)
+
+    def get_code(self, fullname):
+        if self._arcname.endswith('.pyc'):
+            return _code_of(self._importer._read(self._arcname))
+        head, _, tail = self._arcname.rpartition('/')
+        cache_tag = sys.implementation.cache_tag
+        pyc_arcname = (head + '/' if head else '') + '__pycache__/' + tail[:-3] + '.' + cache_tag + '.pyc'
+        pyc = self._importer._read(pyc_arcname)
+        if pyc is not None and pyc[:4] == importlib.util.MAGIC_NUMBER:
+            return _code_of(pyc)
+        return compile(self.get_source(fullname), self._origin, 'exec', dont_inherit=True)
+
+    def get_source(self, fullname):
+        if self._arcname.endswith('.pyc'):
+            return None
+        return importlib.util.decode_source(self._importer._read(self._arcname))
+
+    def get_filename(self, fullname):
+        return self._origin
+
+    def is_package(self, fullname):
+        return self._arcname.rpartition('/')[2] in ('__init__.py', '__init__.pyc')
+
+
+def _code_of(pyc: bytes):
+    if pyc[:4] != importlib.util.MAGIC_NUMBER:
+        raise ImportError('The bytecode was compiled for another python version')
+    return marshal.loads(pyc[16:])
+
+
+def installed() -> BundleImporter | None:
+    """Returns the bundle importer installed by the bootstrap, if any"""
+    for finder in sys.meta_path:
+        if getattr(finder, '_wwwpy_bundle_importer', False):
+            return finder
+    return None
@@ -11,6 +11,7 @@ class DesignerRpc:
 
         from wwwpy.common.filesystem.sync import Sync, sync_delta2
         sync_impl: Sync = sync_delta2
+        _materialize_bundle(events)
         sync_impl.sync_target(directory, events)
         if do_reload:
             self.hotreload_do()
@@ -18,3 +19,18 @@ class DesignerRpc:
     def hotreload_do(self):
         from wwwpy.remote.browser_main import _reload
         _reload()
+
+
+def _materialize_bundle(events: List[Any]):
+    """When the modules are imported from the bundle archives, the changed paths must be extracted to the
+    overlay directory before applying the events"""
+    from wwwpy.remote import bundle_importer
+    importer = bundle_importer.installed()
+    if importer is None:
+        return
+    from wwwpy.common.rpc import serialization
+    from wwwpy.common.filesystem.sync import Event
+    for event in serialization.deserialize(events, List[Event]):
+        importer.materialize(event.src_path)
+        if event.dest_path:
+            importer.materialize(event.dest_path)
@@ -1,17 +1,25 @@
 from __future__ import annotations
 
+import importlib.util
 import inspect
-import zipfile
+import logging
+import marshal
+import os
+import sys
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from io import BytesIO
-from pathlib import Path
-from typing import Iterator, Callable, Optional, TypeVar, Iterable, Protocol, Tuple
-from zipfile import ZipFile
+from pathlib import Path, PurePosixPath
+from types import CodeType
+from typing import Iterator, Callable, Optional, TypeVar, Iterable, Protocol, Tuple, List
 
+from wwwpy.archive import ArchiveEntry, ArchiveWriter, compress_entry, default_date_time, DateTime
 from wwwpy.common import iterlib, modlib, files
 from wwwpy.common.iterlib import CallableToIterable
 
+logger = logging.getLogger(__name__)
+
 parent = Path(__file__).resolve().parent
 
 
@@ -114,22 +122,131 @@ def from_directory_lazy(
     return CallableToIterable(bundle)
 
 
-def build_archive(resource_iterator: Iterator[Resource]) -> bytes:
-    """builds a zip archive from the given resources and returns the bytes"""
+@dataclass(frozen=True)
+class Bytecode:
+    """Options to ship precompiled bytecode in the archive.
+
+    The bytecode is specific to the interpreter version, so it is emitted only when the running interpreter
+    matches `python_version`; otherwise the archive contains only the sources."""
+    python_version: Tuple[int, int]
+    keep_sources: bool = True
+    """When True the .pyc files go in __pycache__ as checked-hash pyc (PEP 552) next to the sources, so
+    tracebacks show the source lines and a modified source (e.g., hot reload) is recompiled.
+    When False the .pyc replaces the .py file."""
+
+    def is_supported(self) -> bool:
+        return sys.version_info[:2] == tuple(self.python_version)
+
 
-    stream = BytesIO()
-    zip_file = ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1)
-    for resource in iterlib.iter_catching(resource_iterator):
+def build_archive(resource_iterator: Iterator[Resource], bytecode: Bytecode | None = None) -> bytes:
+    """builds a zip archive from the given resources and returns the bytes"""
+    return b''.join(iter_archive(resource_iterator, bytecode))
+
+
+def iter_archive(resource_iterator: Iterator[Resource], bytecode: Bytecode | None = None,
+                 chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yields the bytes of a zip archive built from the given resources.
+    The resources are read and compressed in parallel by a thread pool; the chunks are yielded, in the order
+    of the resources, as soon as the entries are ready."""
+    if bytecode is not None and not bytecode.is_supported():
+        logger.warning(f'Bytecode for python {bytecode.python_version} cannot be generated by '
+                       f'python {sys.version_info[:2]}, the archive will contain only the sources')
+        bytecode = None
+
+    writer = ArchiveWriter()
+    resources = iterlib.iter_catching(resource_iterator)
+    buffer = []
+    buffer_len = 0
+    for entries in _archive_executor().map(lambda r: resource_entries(r, bytecode), resources):
+        for entry in entries:
+            chunk = writer.entry(entry)
+            buffer.append(chunk)
+            buffer_len += len(chunk)
+        if buffer_len >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            buffer_len = 0
+    buffer.append(writer.close())
+    yield b''.join(buffer)
+
+
+def resource_entries(resource: Resource, bytecode: Bytecode | None = None) -> List[ArchiveEntry]:
+    """Reads and compresses the resource; with bytecode there could be more than one entry"""
+    try:
         if isinstance(resource, PathResource):
-            zip_file.write(resource.filepath, resource.arcname)
+            content = resource.filepath.read_bytes()
+            date_time = time.localtime(resource.filepath.stat().st_mtime)[:6]
         elif isinstance(resource, Resource):
-            zip_file.writestr(resource.arcname, resource._bytes())
+            content = resource._bytes()
+            date_time = default_date_time
         else:
             raise Exception(f'Unhandled class \n  type={type(resource).__name__} \n  data={resource}')
-    zip_file.close()
+    except OSError:
+        logger.warning(f'Cannot read resource {resource.arcname}, it will not be archived')
+        return []
+
+    if bytecode is not None and resource.arcname.endswith('.py'):
+        return _bytecode_entries(resource.arcname, content, date_time, bytecode)
+    return [compress_entry(resource.arcname, content, date_time)]
+
+
+def resource_bytes(resource: Resource) -> bytes:
+    """The content of the resource, as it is sent to the remote"""
+    if isinstance(resource, PathResource):
+        return resource.filepath.read_bytes()
+    return resource._bytes()
+
+
+def _bytecode_entries(arcname: str, source: bytes, date_time: DateTime, bytecode: Bytecode) -> List[ArchiveEntry]:
+    try:
+        code = compile(source, f'{files._bundle_path}/{arcname}', 'exec', dont_inherit=True)
+    except SyntaxError:
+        logger.warning(f'Cannot compile {arcname}, only the source will be sent')
+        return [compress_entry(arcname, source, date_time)]
+
+    path = PurePosixPath(arcname)
+    if bytecode.keep_sources:
+        pyc_arcname = str(path.parent / '__pycache__' / f'{path.stem}.{sys.implementation.cache_tag}.pyc')
+        pyc = pyc_hash_based(code, source, check_source=True)
+        return [compress_entry(arcname, source, date_time), compress_entry(pyc_arcname, pyc, date_time)]
+    pyc = pyc_hash_based(code, source, check_source=False)
+    return [compress_entry(str(path.with_suffix('.pyc')), pyc, date_time)]
+
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _archive_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(thread_name_prefix='wwwpy-archive')
+    return _executor
+
+
+def shutdown_archive_executor():
+    """Stops and joins the threads that compress the archive entries, e.g., before forking;
+    the next build starts them again"""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _reset_archive_executor():
+    # the threads of the executor do not survive a fork, a forked worker process needs its own
+    global _executor
+    _executor = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_archive_executor)
+
 
-    stream.seek(0)
-    return stream.getbuffer().tobytes()
+def pyc_hash_based(code: CodeType, source: bytes, check_source: bool) -> bytes:
+    """Returns the content of a hash-based pyc file, see PEP 552"""
+    flags = 0b11 if check_source else 0b01
+    return (importlib.util.MAGIC_NUMBER + flags.to_bytes(4, 'little') +
+            importlib.util.source_hash(source) + marshal.dumps(code))
 
 
 def stacktrace_pathfinder(stack_backtrack: int = 1) -> Optional[Path]:
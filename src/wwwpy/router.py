@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from types import MappingProxyType
+from typing import NamedTuple, Dict, Tuple, Mapping, List
+
+from wwwpy.http import HttpRoute
+from wwwpy.static import StaticRoute
+from wwwpy.websocket import WebsocketRoute
+
+_no_params: Mapping[str, str] = MappingProxyType({})
+_any_method = '*'
+
+
+class RouteMatch(NamedTuple):
+    route: HttpRoute | WebsocketRoute | None
+    """None when the path is known but no route accepts the method, see `allowed`"""
+    params: Mapping[str, str] = _no_params
+    """The values of the path parameters"""
+    allowed: Tuple[str, ...] = ()
+    """The methods accepted at the path, when `route` is None"""
+
+
+class _Node:
+    __slots__ = ('children', 'param', 'catch_all', 'http', 'websocket')
+
+    def __init__(self):
+        self.children: Dict[str, _Node] = {}
+        self.param: Tuple[str, _Node] | None = None
+        self.catch_all: Tuple[str, _Node] | None = None
+        self.http: Dict[str, HttpRoute] = {}
+        """Maps the methods to the routes; '*' is for the routes that accept any method"""
+        self.websocket: WebsocketRoute | None = None
+
+
+class Router:
+    """The route table shared by the webservers. It is a trie of the path segments, so a lookup
+    costs O(path length) whatever the number of routes.
+
+    A route path is literal, except for the segments:
+     - `{name}`: matches any non-empty segment, e.g., /api/{module}/{function}
+     - `{name:path}`: only as last segment, matches the rest of the path, e.g., /assets/{file:path}
+
+    The literal segments have precedence on `{name}`, that has precedence on `{name:path}`.
+    The HttpRoute with `methods` are dispatched by request method; HEAD falls back to GET.
+    A StaticRoute is mounted at `prefix/{path:path}`."""
+
+    def __init__(self, *routes: HttpRoute | WebsocketRoute | StaticRoute):
+        self._root = _Node()
+        for route in routes:
+            self.add(route)
+
+    def add(self, route: HttpRoute | WebsocketRoute | StaticRoute):
+        """A route with the same path (and method) of a previous one replaces it"""
+        if isinstance(route, StaticRoute):
+            route = route.as_http_route()
+        if isinstance(route, HttpRoute):
+            node = self._node(route.path)
+            for method in route.methods or (_any_method,):
+                node.http[method.upper()] = route
+        elif isinstance(route, WebsocketRoute):
+            self._node(route.path).websocket = route
+        else:
+            raise Exception(f'Unknown route type: {type(route)}')
+
+    def match(self, path: str, method: str = 'GET') -> RouteMatch | None:
+        """Returns None when no HttpRoute is found at the path"""
+        found = self._find(path)
+        if found is None or not found[0].http:
+            return None
+        node, params = found
+        routes = node.http
+        route = routes.get(method) or (routes.get('GET') if method == 'HEAD' else None) or routes.get(_any_method)
+        if route is None:
+            return RouteMatch(None, params, tuple(sorted(routes)))
+        return RouteMatch(route, params)
+
+    def match_websocket(self, path: str) -> RouteMatch | None:
+        found = self._find(path)
+        if found is None or found[0].websocket is None:
+            return None
+        node, params = found
+        return RouteMatch(node.websocket, params)
+
+    def _node(self, path: str) -> _Node:
+        node = self._root
+        segments = _segments(path)
+        for index, segment in enumerate(segments):
+            if not (segment.startswith('{') and segment.endswith('}')):
+                node = node.children.setdefault(segment, _Node())
+                continue
+            name, _, kind = segment[1:-1].partition(':')
+            if kind not in ('', 'path') or not name.isidentifier():
+                raise ValueError(f'Invalid path parameter `{segment}` in route `{path}`')
+            if kind == 'path' and index != len(segments) - 1:
+                raise ValueError(f'The path parameter `{segment}` must be the last segment in route `{path}`')
+            attribute = 'catch_all' if kind == 'path' else 'param'
+            current = getattr(node, attribute)
+            if current is None:
+                current = (name, _Node())
+                setattr(node, attribute, current)
+            elif current[0] != name:
+                raise ValueError(f'The path parameter `{segment}` in route `{path}` conflicts with `{current[0]}`')
+            node = current[1]
+        return node
+
+    def _find(self, path: str) -> Tuple[_Node, Mapping[str, str]] | None:
+        return _find(self._root, _segments(path), 0, _no_params)
+
+
+def _segments(path: str) -> List[str]:
+    return path.split('/')[1:] if path.startswith('/') else path.split('/')
+
+
+def _find(node: _Node, segments: List[str], index: int, params: Mapping[str, str]) \
+        -> Tuple[_Node, Mapping[str, str]] | None:
+    if index == len(segments):
+        if node.http or node.websocket is not None:
+            return node, params
+    else:
+        segment = segments[index]
+        child = node.children.get(segment, None)
+        if child is not None:
+            found = _find(child, segments, index + 1, params)
+            if found is not None:
+                return found
+        if node.param is not None and segment:
+            name, child = node.param
+            found = _find(child, segments, index + 1, {**params, name: segment})
+            if found is not None:
+                return found
+        if node.catch_all is not None:
+            name, child = node.catch_all
+            return child, {**params, name: '/'.join(segments[index:])}
+    return None
@@ -1,27 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 import importlib
 import logging
+import os
 import tempfile
-import traceback
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from inspect import getmembers, isfunction, signature, iscoroutinefunction, Signature
 from pathlib import Path
 from types import ModuleType, FunctionType
-from typing import NamedTuple, List, Tuple, Optional, Callable
+from typing import NamedTuple, List, Tuple, Optional, Callable, Dict
 
+from wwwpy import metrics
 from wwwpy.common import modlib
 from wwwpy.common.asynclib import OptionalCoroutine
 from wwwpy.common.http_transport import ServerHttpTransport, RemoteHttpTransport
 from wwwpy.common.rpc.hibrid_dispatcher import HybridDispatcher
-from wwwpy.common.rpc.serializer import RpcRequest, RpcResponse
 from wwwpy.common.rpc.v2.caller_proxy import caller_proxy_generate
-from wwwpy.common.rpc2.default_skeleton import DefaultSkeleton
+from wwwpy.common.rpc2.default_skeleton import DefaultSkeleton, Busy
 from wwwpy.common.rpc2.default_stub import DefaultStub
 from wwwpy.common.rpc2.encoder_decoder import JsonEncoderDecoder
 from wwwpy.common.rpc2.stub import generate_stub
 from wwwpy.http import HttpRoute, HttpResponse, HttpRequest
 from wwwpy.resources import ResourceIterable, from_directory
-from wwwpy.unasync import unasync
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +35,6 @@ class Function(NamedTuple):
     signature: str
     is_coroutine_function: bool
     sign: Signature
-    blocking: FunctionType
 
 
 def _std_function_to_function(fun_tuple: Tuple[str, FunctionType]) -> Function:
@@ -40,8 +42,7 @@ def _std_function_to_function(fun_tuple: Tuple[str, FunctionType]) -> Function:
     func = fun_tuple[1]
     sign = signature(func)
     is_coroutine_function = iscoroutinefunction(func)
-    blocking = unasync(func)
-    return Function(name, func, str(sign), is_coroutine_function, signature(func), blocking)
+    return Function(name, func, str(sign), is_coroutine_function, signature(func))
 
 
 class SourceModule:
@@ -69,33 +70,140 @@ def function_list(module: ModuleType) -> List[Function]:
     return list(map(_std_function_to_function, getmembers(module, isfunction)))
 
 
+retry_after = 1
+"""The seconds the clients should wait before retrying a call rejected as busy"""
+
+
+class RpcBusy(Busy):
+    """The sync rpc functions are all busy and too many calls are waiting.
+    The client receives a 503 response, with Retry-After, that the stub raises as RemoteBusy"""
+
+
+class _Pool:
+    def __init__(self, name: str, workers: int):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix=f'wwwpy-rpc-{name}')
+        self.pending = 0
+        """The calls submitted and not finished, running or waiting for a thread"""
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.pending - self.workers)
+
+
+class RpcExecutor:
+    """Runs the sync rpc functions in a bounded thread pool, so a slow call does not block the event loop.
+
+    The modules in `module_limits` have their own pool with that many threads, so they cannot starve the others.
+    When `max_queue` calls of a pool are already waiting for a thread, a call fails immediately with RpcBusy."""
+
+    def __init__(self, max_workers: int = 16, max_queue: int = 256, module_limits: Dict[str, int] | None = None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.module_limits = dict(module_limits or {})
+        self._pools: Dict[str, _Pool] = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    async def run(self, module_name: str, func_name: str, func: Callable, args: list):
+        submitted = time.perf_counter()
+        pool = self._acquire(module_name, func_name)
+
+        def call():
+            started = time.perf_counter()
+            metrics.rpc_queue_wait.observe(started - submitted, module_name, func_name)
+            try:
+                return func(*args)
+            finally:
+                metrics.rpc_run.observe(time.perf_counter() - started, module_name, func_name)
+
+        future = pool.executor.submit(call)
+        # the callback runs also when the call is cancelled before starting
+        future.add_done_callback(lambda _: self._release(pool))
+        return await asyncio.wrap_future(future)
+
+    def _acquire(self, module_name: str, func_name: str) -> _Pool:
+        with self._lock:
+            pool = self._pool(module_name)
+            if pool.pending >= pool.workers + self.max_queue:
+                metrics.rpc_rejected.inc(module_name, func_name)
+                raise RpcBusy(f'The server is busy, {pool.queued} calls are waiting to run {module_name}')
+            pool.pending += 1
+            self._update_queue_depth()
+            return pool
+
+    def _release(self, pool: _Pool):
+        with self._lock:
+            pool.pending -= 1
+            self._update_queue_depth()
+
+    def _pool(self, module_name: str) -> _Pool:
+        if self._pid != os.getpid():
+            # the threads do not survive a fork, a forked worker process needs its own pools
+            self._pools = {}
+            self._pid = os.getpid()
+        key = module_name if module_name in self.module_limits else ''
+        pool = self._pools.get(key, None)
+        if pool is None:
+            workers = self.module_limits[key] if key else self.max_workers
+            pool = self._pools[key] = _Pool(key or 'default', workers)
+        return pool
+
+    def _update_queue_depth(self):
+        metrics.rpc_queue_depth.set(sum(pool.queued for pool in self._pools.values()))
+
+    def shutdown(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.executor.shutdown(wait=False, cancel_futures=True)
+
+
 class RpcRoute:
-    def __init__(self, route_path: str):
+    def __init__(self, route_path: str, executor: RpcExecutor | None = None):
         self._allowed_modules: set[str] = set()
         self.route = HttpRoute(route_path, self._route_callback)
         self.tmp_bundle_folder = Path(tempfile.mkdtemp())
+        self.executor = RpcExecutor() if executor is None else executor
+        self._encdec = JsonEncoderDecoder()
+        """Runs the sync functions, the coroutine functions run on the webserver event loop"""
 
-    def _route_callback(self, request: HttpRequest,
-                        resp_callback: Callable[[HttpResponse], OptionalCoroutine]) -> OptionalCoroutine:
-
+    async def _route_callback(self, request: HttpRequest,
+                              resp_callback: Callable[[HttpResponse], OptionalCoroutine]):
         request_content = request.content.decode('utf-8')
         transport = ServerHttpTransport(request_content)
-        encdec = JsonEncoderDecoder()
-        skeleton = DefaultSkeleton(transport, encdec, self._allowed_modules)
+        skeleton = DefaultSkeleton(transport, self._encdec, self._allowed_modules, self.executor.run)
 
-        skeleton.invoke_tobe_fixed()
+        start = time.perf_counter()
+        try:
+            result = await skeleton.invoke_async()
+        finally:
+            if skeleton.invoked is not None:
+                metrics.rpc_duration.observe(time.perf_counter() - start, *skeleton.invoked)
+        if result.exception_str:
+            metrics.rpc_errors.inc(*skeleton.invoked)
 
         if transport.response is None:
             raise Exception('No response was provided')
 
-        response = HttpResponse(transport.response, 'text/plain')
-        return resp_callback(response)
+        if result.busy:
+            response = HttpResponse(transport.response, 'text/plain', 503, {'Retry-After': str(retry_after)})
+        else:
+            response = HttpResponse(transport.response, 'text/plain')
+        res = resp_callback(response)
+        if res:
+            await res
 
     def allow(self, module_name: str):
         if not isinstance(module_name, str):
             raise TypeError('module_name must be a string')
         self._allowed_modules.add(module_name)
 
+    def import_modules(self):
+        """Imports the allowed modules, so the first call does not pay for it"""
+        for module_name in sorted(self._allowed_modules):
+            self.find_module(module_name)
+
     def find_module(self, module_name: str) -> Optional[Module]:
         if module_name not in self._allowed_modules:
             return None
@@ -123,23 +231,6 @@ class RpcRoute:
             logger.exception(f'Cannot import module {module_name} even though find_module_path found it')
             return None
 
-    # todo could be called invoke or call_site_invoke or server_dispatch (but server is charged maybe brainstorm a name)
-    #  in the rpc realm how is it called the caller and the called?
-    def callee_dispatch(self, request: str) -> str:
-        rpc_request = RpcRequest.from_json(request)
-
-        module = self.find_module(rpc_request.module)
-        function = module[rpc_request.func]
-        exception = ''
-        result = None
-        try:
-            result = function.blocking(*rpc_request.args)
-        except Exception:
-            exception = traceback.format_exc()
-
-        response = RpcResponse(result, exception)
-        return response.to_json()
-
     def remote_stub_resources(self) -> ResourceIterable:
         return from_directory(self.tmp_bundle_folder)
 
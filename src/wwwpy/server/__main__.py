@@ -3,11 +3,13 @@ from __future__ import annotations
 import argparse
 import logging
 import os
+import sys
 from pathlib import Path
 from typing import Optional, Sequence, NamedTuple
 
 from wwwpy.server.convention import start_default
 from wwwpy.server.tcp_port import find_port
+from wwwpy.server.workers import tornado_ids
 
 logger = logging.getLogger(__name__)
 
@@ -16,22 +18,50 @@ class Arguments(NamedTuple):
     directory: Path
     port: int
     dev: bool
+    workers: int = 1
+    webserver: str = ''
+
+
+def _workers_count(value: str) -> int:
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid number: {value!r}')
+    if count < 0:
+        raise argparse.ArgumentTypeError(f'must be 0 or more, got {count}')
+    return count
 
 
 def parse_arguments(args: Optional[Sequence[str]] = None) -> Arguments:
     parser = argparse.ArgumentParser(prog='wwwpy')
-    parser.add_argument('dev', nargs='?', const=True, default=False,
-                        help="Run in development mode")
+    parser.add_argument('command', nargs='?', choices=['dev', 'serve'], default=None,
+                        help="dev: run in development mode; serve: run in production mode (default)")
     parser.add_argument('--directory', '-d', default=os.getcwd(),
                         help='set the root path for the project (default: current directory)')
     parser.add_argument('--port', type=int, default=8000,
                         help='bind to this port (default: 8000)')
+    parser.add_argument('--workers', type=_workers_count, default=1,
+                        help='number of worker processes sharing the port, 0 is one per cpu (default: 1)')
+
+    parser.add_argument('--webserver', default='',
+                        help='the webserver to use, e.g., tornado, uvicorn, hypercorn, granian or daphne '
+                             '(default: the webserver in the settings, otherwise tornado)')
 
     parsed_args = parser.parse_args(args)
+    dev = parsed_args.command == 'dev'
+    if parsed_args.workers != 1:
+        if dev:
+            parser.error('--workers cannot be used in development mode')
+        if sys.platform == 'win32':
+            parser.error('--workers is not available on Windows')
+        if parsed_args.webserver and parsed_args.webserver.lower() not in tornado_ids:
+            parser.error('--workers is available only with the tornado webserver')
     return Arguments(
         directory=Path(parsed_args.directory).absolute(),
         port=parsed_args.port,
-        dev=bool(parsed_args.dev)
+        dev=dev,
+        workers=parsed_args.workers,
+        webserver=parsed_args.webserver,
     )
 
 
@@ -50,13 +80,17 @@ def main():
     args = parse_arguments()
     if args.port == 0:
         args = args._replace(port=find_port())
-    project = start_default(args.directory, args.port, dev_mode=args.dev)
+    if args.workers != 1:
+        from wwwpy.server.workers import serve_workers
+        serve_workers(args.directory, args.port, args.workers)
+        return
+    project = start_default(args.directory, args.port, dev_mode=args.dev, webserver_id=args.webserver)
     _open_browser(args, project.settings)
     try:
         from wwwpy.webserver import wait_forever
         wait_forever()
     except KeyboardInterrupt:
-        pass
+        project.webserver.shutdown()
 
 
 if __name__ == '__main__':
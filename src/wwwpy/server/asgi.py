@@ -1,25 +1,35 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from typing import AsyncIterator, List
+
 from wwwpy.common.asynclib import OptionalCoroutine
-from wwwpy.common.rpc.serializer import RpcRequest
-from wwwpy.http import HttpRoute, HttpRequest, HttpResponse
+from wwwpy.http import HttpRoute, HttpRequest, HttpResponse, is_streaming, aiter_chunks, RequestBodyTooLarge, \
+    content_length
+from wwwpy.lifespan import Lifespan
+from wwwpy.middleware import handle, connect, Middleware, WebsocketMiddleware
+from wwwpy.router import Router
+from wwwpy.static import FileContent
 from wwwpy.webserver import Route
-from wwwpy.websocket import WebsocketRoute, WebsocketEndpoint, ListenerProtocol
+from wwwpy.websocket import WebsocketEndpointIO
 
+logger = logging.getLogger(__name__)
 
 # Route = Union[HttpRoute, WebsocketRoute]
 
 def routes_to_asgi_application(*routes: Route):
-    return AsgiApplication(routes)
+    return AsgiApplication(*routes)
 
 
 class AsgiApplication:
-    def __init__(self, *routes: Route):
-        def _g(type_):
-            return _groupby_to_dict(filter(lambda r: isinstance(r, type_), routes), lambda i: i.path)
-
-        self.http_route: dict[str, HttpRoute] = _g(HttpRoute)
-        self.websocket_route: dict[str, WebsocketRoute] = _g(WebsocketRoute)
+    def __init__(self, *routes: Route, router: Router | None = None, lifespan: Lifespan | None = None):
+        self.router = Router() if router is None else router
+        self.lifespan = Lifespan() if lifespan is None else lifespan
+        self.middlewares: List[Middleware] = []
+        self.websocket_middlewares: List[WebsocketMiddleware] = []
+        for route in routes:
+            self.router.add(route)
 
         self._scopes = {
             'http': self._scope_http,
@@ -34,95 +44,167 @@ class AsgiApplication:
         await func(scope, receive, send)  # noqa
 
     async def _scope_lifespan(self, scope, receive, send):
-        pass
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.lifespan.startup()
+                except Exception as e:
+                    logger.exception('lifespan startup failed')
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.lifespan.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
 
     async def _scope_http(self, scope, receive, send):
-        route = self.http_route.get(scope['path'], None)
-        if route is None:
-            return
+        with self.lifespan.request():
+            await self._serve_http(scope, receive, send)
+
+    async def _serve_http(self, scope, receive, send):
         method = scope['method']
-        headers = dict(scope['headers'])
+        found = self.router.match(scope['path'], method)
+        if found is None:
+            await _send_status(send, 404)
+            return
+        if found.route is None:
+            await _send_status(send, 405, [[b'allow', ', '.join(found.allowed).encode('latin-1')]])
+            return
+        route = found.route
+        headers = _headers(scope)
         content_type = headers.get('content-type', None)
-        body = await _all_body(receive)
+        max_size = route.max_body_size
+        try:
+            length = content_length(headers.get('content-length', None))
+        except ValueError:
+            await _send_status(send, 400)
+            return
+        if max_size is not None and length > max_size:
+            await _send_status(send, 413)
+            return
+        started = False
+        if route.stream_body:
+            body = _iter_body(receive, max_size)
+        else:
+            try:
+                body = await _all_body(receive, max_size)
+            except RequestBodyTooLarge:
+                await _send_status(send, 413)
+                return
         # todo (?) intercept content type to correctly transform body bytes to str if needed
-        http_request = HttpRequest(method, body, content_type)
+        http_request = HttpRequest(method, body, content_type, headers, _query(scope), scope['path'], found.params)
+        zero_copy = 'http.response.zerocopysend' in (scope.get('extensions', None) or {})
 
         def resp_callback(resp: HttpResponse) -> OptionalCoroutine:
             async def future():
-                await send({'type': 'http.response.start', 'status': 200,
-                            'headers': [[b'content-type', resp.content_type.encode()], ], })
-                await send({'type': 'http.response.body', 'body': resp.content.encode(), })
-
-            return future()
-
-        res = route.callback(http_request, resp_callback)
-        if res:
-            await res
+                nonlocal started
+                started = True
+                resp_headers = [[b'content-type', resp.content_type.encode()]] if resp.content_type else []
+                resp_headers += [[name.encode('latin-1'), value.encode('latin-1')] for name, value in
+                                 resp.headers.items()]
+                await send({'type': 'http.response.start', 'status': resp.status, 'headers': resp_headers, })
+                if zero_copy and isinstance(resp.content, FileContent):
+                    with open(resp.content.path, 'rb') as file:
+                        await send({'type': 'http.response.zerocopysend', 'file': file,
+                                    'offset': resp.content.offset, 'count': resp.content.count})
+                elif is_streaming(resp.content):
+                    async for chunk in aiter_chunks(resp.content):
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                    await send({'type': 'http.response.body', 'body': b''})
+                else:
+                    content = resp.content.encode() if isinstance(resp.content, str) else resp.content
+                    await send({'type': 'http.response.body', 'body': content, })
+
+            # the sync callbacks do not await the response, so it is awaited after the callback returns
+            task = asyncio.ensure_future(future())
+            responses.append(task)
+            return task
+
+        responses: list[asyncio.Future] = []
+        try:
+            res = handle(route, http_request, resp_callback, self.middlewares)
+            if res:
+                await res
+            for task in responses:
+                await task
+        except RequestBodyTooLarge:
+            if started:
+                raise
+            await _send_status(send, 413)
 
     async def _scope_websocket(self, scope, receive, send):
-        route = self.websocket_route.get(scope['path'], None)
-        if route is None:
+        found = self.router.match_websocket(scope['path'])
+        if found is None:
+            await send({'type': 'websocket.close'})
             return
+        route = found.route
+        await send({'type': 'websocket.accept'})
 
-        # send_text = lambda t: send({'type': 'websocket.send', 'text': t})
-        async def send_text(t):
-            await send({'type': 'websocket.send', 'text': t})
+        # the endpoint can be used from any thread (e.g., the hot reload), the messages are sent in order by the writer
+        loop = asyncio.get_running_loop()
+        outgoing: asyncio.Queue[str | bytes | None] = asyncio.Queue()
+        endpoint = WebsocketEndpointIO(lambda m: loop.call_soon_threadsafe(outgoing.put_nowait, m))
+        writer = asyncio.create_task(_websocket_writer(outgoing, send))
+        request = HttpRequest('GET', b'', '', _headers(scope), _query(scope), scope['path'], found.params)
+        if not connect(route, request, endpoint, self.websocket_middlewares):
+            endpoint.send(None)
+
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'websocket.receive':
+                    text = message.get('text', None)
+                    res = endpoint.on_message(message.get('bytes', None) if text is None else text)
+                    if res:
+                        await res
+                elif message['type'] == 'websocket.disconnect':
+                    break
+        finally:
+            writer.cancel()
+            res = endpoint.on_message(None)
+            if res:
+                await res
+
+
+def _headers(scope) -> dict[str, str]:
+    return {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+
+def _query(scope) -> str:
+    return scope.get('query_string', b'').decode('latin-1')
+
+
+async def _websocket_writer(outgoing: asyncio.Queue, send):
+    while True:
+        message = await outgoing.get()
+        if message is None:
+            await send({'type': 'websocket.close'})
+            return
+        key = 'text' if isinstance(message, str) else 'bytes'
+        await send({'type': 'websocket.send', key: message})
 
-        await send({'type': 'websocket.accept'})
 
-        endpoint = _AsgiWebsocketEndpoint(lambda m: send_text(m))
-        route.on_connect(endpoint)
+async def _all_body(receive, max_size: int | None = None) -> bytes:
+    chunks = [chunk async for chunk in _iter_body(receive, max_size)]
+    return b''.join(chunks)
 
-        while True:
-            message = await receive()
-            if message['type'] == 'websocket.receive':
-                await endpoint.on_message(message.get('text'))
-            elif message['type'] == 'websocket.disconnect':
-                break
-
-
-def _groupby_to_dict(iterable, key) -> dict:
-    result = dict()
-    for item in iterable:
-        k = key(item)
-        array = result.get(k, None)
-        if array is None:
-            array = []
-            result[k] = array
-        array.append(item)
-    return result
-
-
-async def _all_body(receive):
-    body = b""
-    more_body = True
 
+async def _iter_body(receive, max_size: int | None = None) -> AsyncIterator[bytes]:
+    size = 0
+    more_body = True
     while more_body:
         message = await receive()
-        body += message.get("body", b"")
-        more_body = message.get("more_body", False)
-    return body
-
-
-class _AsgiWebsocketEndpoint(WebsocketEndpoint):
-    def __init__(self, send: ListenerProtocol):
-        self._send = send
-        self._listener: ListenerProtocol | None = None
-
-    def add_listener(self, listener: ListenerProtocol) -> None:
-        if self._listener is not None:
-            raise Exception('Only one listener is allowed')
-        self._listener = listener
-
-    # part to be called by user code to send a outgoing message
-    def send(self, message: str | bytes | None) -> OptionalCoroutine:
-        return self._send(message)
-
-    # parte to be used by IO implementation to be called to notify incoming messages
-    def on_message(self, message: str | bytes | None) -> OptionalCoroutine:
-        if self._listener is not None:
-            return self._listener(message)
-
-    def dispatch(self, module: str, func_name: str, *args) -> OptionalCoroutine:
-        j = RpcRequest.to_json(module, func_name, *args)
-        return self.send(j)
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise RequestBodyTooLarge(f'The request body exceeds {max_size} bytes')
+        if chunk:
+            yield chunk
+        more_body = message.get('more_body', False)
+
+
+async def _send_status(send, status: int, headers: list | None = None):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers or []})
+    await send({'type': 'http.response.body', 'body': b''})
@@ -3,18 +3,22 @@ from __future__ import annotations
 import logging
 import sys
 import time
-from dataclasses import dataclass
+import asyncio
+from dataclasses import dataclass, replace, field
 from pathlib import Path
 from typing import Collection, Sequence
 
-from wwwpy.bootstrap import bootstrap_routes
+from wwwpy.bootstrap import bootstrap_routes, pyodide_bytecode
+from wwwpy.bundle import BundleLayer, LiveBundle, BundleCache, BundleSource
 from wwwpy.common import loglib
 from wwwpy.common.rpc.custom_loader import CustomFinder
 from wwwpy.common.settingslib import Settings
 from wwwpy.resources import library_resources, from_directory
-from wwwpy.rpc import RpcRoute
+from wwwpy.rpc import RpcRoute, RpcExecutor
 from wwwpy.server.custom_str import CustomStr
-from wwwpy.webserver import Route
+from wwwpy.treeshake import TreeShaker
+from wwwpy.lifespan import Lifespan
+from wwwpy.webserver import Route, Webserver
 from wwwpy.websocket import WebsocketPool
 
 logger = logging.getLogger(__name__)
@@ -44,6 +48,12 @@ class Project:
     settings: Settings
     websocket_pool: WebsocketPool
     routes: Sequence[Route]
+    bundle_sources: Sequence[BundleSource] = ()
+    """The sources of the bundle layers; building them in advance avoids the cold start of the first request"""
+    lifespan: Lifespan = field(default_factory=Lifespan)
+    """The startup hooks warm up the server (bundle, rpc modules); the application can add its own,
+    e.g., default_project().lifespan.on_startup.append(my_coroutine_function)"""
+    webserver: Webserver | None = None
 
 
 def setup(config: Config, settings: Settings = None) -> Project:
@@ -63,21 +73,53 @@ def setup(config: Config, settings: Settings = None) -> Project:
 
     websocket_pool = WebsocketPool('/wwwpy/ws')
 
-    services = _configure_server_rpc_services('/wwwpy/rpc', list(config.server_rpc_packages))
+    executor = RpcExecutor(settings.rpc_max_workers, settings.rpc_max_queue, settings.rpc_module_limits)
+    services = _configure_server_rpc_services('/wwwpy/rpc', list(config.server_rpc_packages), executor)
     services.generate_remote_stubs()
 
-    resources = [library_resources(), services.remote_stub_resources(), ] + \
-                [from_directory(directory / f, relative_to=directory) for f in config.remote_folders]
+    import wwwpy
+    stub_resources = [services.remote_stub_resources()]
+    app_resources = [from_directory(directory / f, relative_to=directory) for f in config.remote_folders]
+    wwwpy_resources = library_resources()
+    if settings.tree_shake and not config.dev_mode:
+        # the designer is not needed: ship only the library modules that the remote can import
+        whitelist = [*config.remote_rpc_packages, *settings.tree_shake_whitelist]
+        wwwpy_resources = TreeShaker(wwwpy_resources, entry_modules=['remote', 'wwwpy.remote.browser_main'],
+                                     whitelist=whitelist, context=stub_resources + app_resources)
+    layers = [
+        BundleLayer('wwwpy', [wwwpy_resources], version=wwwpy.__version__),
+        BundleLayer('stubs', stub_resources),
+        BundleLayer('app', app_resources),
+    ]
+    bytecode = pyodide_bytecode() if settings.bytecode else None
+    if bytecode is not None and not bytecode.is_supported():
+        logger.warning(f'The bytecode is not shipped, the server runs Python {sys.version_info[:2]} '
+                       f'and Pyodide runs Python {bytecode.python_version}')
+    live_bundles = []
+    if config.dev_mode:
+        # the hot reload events keep the bundles up-to-date, only the changed files are compressed again
+        live_bundles = [LiveBundle(layer.resources, bytecode, name=layer.name) for layer in layers]
+        layers = [replace(layer, source=live) for layer, live in zip(layers, live_bundles)]
+    else:
+        layers = [replace(layer, source=BundleCache(layer.resources, bytecode, name=layer.name)) for layer in layers]
 
     routes: list[Route] = [
         services.route,
         websocket_pool.http_route,
         *bootstrap_routes(
-            resources=resources,
+            resources=[],
+            layers=layers,
+            # in dev mode the hot reload changes the files in the bundle directory, so they cannot be persisted
+            persistent=settings.persistent_bundle and not config.dev_mode,
+            pyodide_dir=settings.pyodide_dir,
             python=f'from wwwpy.remote.browser_main import entry_point; await entry_point(dev_mode={config.dev_mode})'
         )
     ]
 
+    if settings.metrics:
+        from wwwpy.metrics import metrics_route
+        routes.append(metrics_route())
+
     if config.dev_mode:
         import wwwpy.server.designer.dev_mode as dev_modelib
         dev_modelib._warning_on_multiple_clients(websocket_pool)
@@ -86,6 +128,7 @@ def setup(config: Config, settings: Settings = None) -> Project:
             directory, websocket_pool, services,
             server_folders=set(config.server_folders),
             remote_folders=set(config.remote_folders),
+            live_bundles=live_bundles,
         )
         if settings.hotreload_self:
             logger.info('devself detected')
@@ -95,14 +138,27 @@ def setup(config: Config, settings: Settings = None) -> Project:
             dev_modelib.start_hotreload(
                 wwwpy_package_dir, websocket_pool, services,
                 server_folders={'wwwpy/common', 'wwwpy/server'},
-                remote_folders={'wwwpy/common', 'wwwpy/remote'}
+                remote_folders={'wwwpy/common', 'wwwpy/remote'},
+                live_bundles=live_bundles,
             )
 
-    return Project(config, settings, websocket_pool, tuple(routes))
+    bundle_sources = tuple(layer.source for layer in layers)
+    lifespan = Lifespan()
+
+    async def warm_up():
+        await asyncio.get_running_loop().run_in_executor(None, services.import_modules)
+        await asyncio.gather(*(source.get_async() for source in bundle_sources))
+
+    lifespan.on_startup.append(warm_up)
+    lifespan.on_shutdown.append(services.executor.shutdown)
+    lifespan.on_shutdown.append(websocket_pool.close_all)
+
+    return Project(config, settings, websocket_pool, tuple(routes), bundle_sources, lifespan)
 
 
-def _configure_server_rpc_services(route_path: str, modules: list[str]) -> RpcRoute:
-    services = RpcRoute(route_path)
+def _configure_server_rpc_services(route_path: str, modules: list[str], executor: RpcExecutor | None = None) \
+        -> RpcRoute:
+    services = RpcRoute(route_path, executor)
     for module_name in modules:
         services.allow(module_name)
     return services
@@ -23,15 +23,18 @@ def add_project(project: Project):
     _projects.append(project)
 
 
-def start_default(directory: Path, port: int, dev_mode=False) -> Project:
+def start_default(directory: Path, port: int, dev_mode=False, webserver_id: str = '') -> Project:
+    """The webserver_id, or the webserver of the settings, selects the webserver; by default the first available"""
     quickstart.warn_if_unlikely_project(directory)
 
     config = default_config(directory, dev_mode)
-    project = setup(config, user_settings())
+    settings = user_settings()
+    project = setup(config, settings)
     add_project(project)
 
-    webserver = available_webservers().new_instance()
-    webserver.set_routes(*project.routes)
+    webserver = available_webservers().new_instance(webserver_id or settings.webserver)
+    webserver.set_routes(*project.routes).set_lifespan(project.lifespan)
+    project.webserver = webserver
 
     while tcp_port.is_port_busy(port):
         logger.warning(f'port {port} is busy, retrying...')
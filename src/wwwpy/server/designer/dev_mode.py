@@ -1,8 +1,9 @@
 import logging
 from datetime import timedelta
 from pathlib import Path
-from typing import List, Callable, Set
+from typing import List, Callable, Set, Sequence
 
+from wwwpy.bundle import LiveBundle
 from wwwpy.common.files import extension_blacklist, directory_blacklist
 from wwwpy.common.filesystem import sync
 from wwwpy.common.filesystem.sync import sync_delta2, Sync, event_rebase
@@ -35,12 +36,15 @@ def _warning_on_multiple_clients(websocket_pool: WebsocketPool):
 
 
 def start_hotreload(directory: Path, websocket_pool: WebsocketPool, rpc_route: RpcRoute,
-                    server_folders: Set[str], remote_folders: Set[str]):
+                    server_folders: Set[str], remote_folders: Set[str],
+                    live_bundles: Sequence[LiveBundle] = ()):
     remote_set = {directory / d for d in remote_folders}
     server_set = {directory / d for d in server_folders}
     rpc_set = {directory / (d.replace('.', '/') + '.py') for d in rpc_route._allowed_modules}
 
     def process_events(events: List[sync.Event]):
+        for live_bundle in live_bundles:
+            live_bundle.apply_events(events)
         remote_events = event_rebase.filter_by_directory(events, remote_set)
         server_events = event_rebase.filter_by_directory(events, server_set)
 
@@ -56,6 +60,8 @@ def start_hotreload(directory: Path, websocket_pool: WebsocketPool, rpc_route: R
                       [sync.Event('deleted', False, str(f)) for f in rem_stub]
 
                 _print_events('server-rpc', evs, rpc_route.tmp_bundle_folder)
+                for live_bundle in live_bundles:
+                    live_bundle.apply_events(evs)
                 process_remote_events(rpc_route.tmp_bundle_folder, websocket_pool, evs, len(remote_events) == 0)
 
         if len(remote_events) > 0:
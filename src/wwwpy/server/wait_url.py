@@ -1,10 +1,11 @@
 import urllib.error
 import urllib.request
-from time import sleep
+from time import sleep, monotonic
 
 
-def wait_url(url: str) -> None:
-    for _ in range(300):
+def wait_url(url: str, timeout: float = 3) -> None:
+    deadline = monotonic() + timeout
+    while monotonic() < deadline:
         try:
             urllib.request.urlopen(url)
             return
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+tornado_ids = ('tornado', 'wstornado')
+"""The webserver ids that can be used with the workers"""
+
+
+def serve_workers(directory: Path, port: int, workers: int, host: str = '0.0.0.0') -> None:
+    """Runs the production server in `workers` processes (0 is one per cpu) sharing the listening socket.
+
+    The project is set up and the bundle is built once, in the parent, before forking: the workers inherit them.
+    The parent supervises the workers, restarts the ones that crash and, on SIGTERM, terminates them;
+    it never returns. Available only on Unix, with the tornado webserver."""
+    from tornado.netutil import bind_sockets
+    from wwwpy.resources import shutdown_archive_executor
+    from wwwpy.server.convention import default_config, add_project
+    from wwwpy.server.configure import setup
+    from wwwpy.server.settingslib import user_settings
+    from wwwpy.webservers.tornado import WsTornado
+
+    settings = user_settings()
+    if settings.webserver and settings.webserver.lower() not in tornado_ids:
+        raise ValueError(f'The workers are available only with the tornado webserver, '
+                         f'the settings select `{settings.webserver}`')
+    project = setup(default_config(directory, dev_mode=False), settings)
+    add_project(project)
+    # the workers run the startup hooks again, but they find the bundle built and the modules imported
+    asyncio.run(project.lifespan.startup())
+    # no event loop and no thread must be running when forking, the children would inherit their locks
+    shutdown_archive_executor()
+    _join_threads(timeout=10)
+    sockets = bind_sockets(port, host)
+    print(f'Available at http://127.0.0.1:{port} with {workers or "one per cpu"} workers')
+
+    task_id = _fork_workers(workers or os.cpu_count() or 1)
+
+    webserver = WsTornado().set_host(host).set_port(port)
+    webserver.set_sockets(sockets).set_routes(*project.routes).set_lifespan(project.lifespan)
+    project.webserver = webserver
+
+    def terminate(signum, frame):
+        # the parent forwards the SIGTERM it receives, the worker could get it twice (e.g., from a process group kill)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        webserver.shutdown()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    webserver._start_listen()
+    logger.info(f'worker {task_id} started')
+    webserver.thread.join()
+    # the webserver thread ends only on failure, the parent starts the worker again
+    logger.error(f'worker {task_id} stopped')
+    sys.exit(1)
+
+
+def _join_threads(timeout: float):
+    deadline = time.monotonic() + timeout
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join(max(0.0, deadline - time.monotonic()))
+    alive = [thread.name for thread in threading.enumerate() if thread is not threading.current_thread()]
+    if alive:
+        logger.warning(f'forking the workers with threads still running: {alive}')
+
+
+def _fork_workers(count: int, max_restarts: int = 100) -> int:
+    """Forks `count` workers and returns the worker id in each of them. The parent never returns: it restarts
+    the workers that crash and, on SIGTERM or SIGINT, terminates the workers and exits."""
+    children: Dict[int, int] = {}
+    """Maps the pids to the worker ids"""
+
+    def start(task_id: int) -> bool:
+        pid = os.fork()
+        if pid == 0:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            random.seed()
+            return True
+        children[pid] = task_id
+        return False
+
+    def terminate(signum, frame):
+        for signum_ in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum_, signal.SIG_IGN)
+        logger.info(f'terminating {len(children)} workers')
+        for pid in children:
+            _kill(pid, signal.SIGTERM)
+        for pid in list(children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sys.exit(0)
+
+    for task_id in range(count):
+        if start(task_id):
+            return task_id
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+
+    restarts = 0
+    while children:
+        pid, status = os.wait()
+        task_id = children.pop(pid, None)
+        if task_id is None:
+            continue
+        if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+            logger.info(f'worker {task_id} (pid {pid}) exited')
+            continue
+        logger.warning(f'worker {task_id} (pid {pid}) exited with status {status}, restarting')
+        restarts += 1
+        if restarts > max_restarts:
+            raise RuntimeError('Too many worker restarts, giving up')
+        if start(task_id):
+            return task_id
+    sys.exit(0)
+
+
+def _kill(pid: int, signum: int):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
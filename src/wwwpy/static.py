@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import mimetypes
+import os
+import re
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import NamedTuple, Iterator, Tuple
+
+from wwwpy.http import HttpRequest, HttpResponse, HttpRoute, etag_matches, accepted_encodings, accepts
+
+_encodings = (('br', '.br'), ('gzip', '.gz'))
+_content_types = {'.wasm': 'application/wasm', '.js': 'text/javascript', '.mjs': 'text/javascript'}
+
+
+@dataclass(frozen=True)
+class FileContent:
+    """A response body that is a region of a file. It is an iterable of chunks read one at a time,
+    so the file is never loaded in memory; the webservers supporting it can use sendfile instead.
+    The chunks are read and not mmap-ed because a file truncated while it is mapped kills the process (SIGBUS)."""
+    path: Path
+    offset: int
+    count: int
+    chunk_size: int = 256 * 1024
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.count == 0:
+            return
+        with open(self.path, 'rb') as f:
+            end = self.offset + self.count
+            for start in range(self.offset, end, self.chunk_size):
+                size = min(self.chunk_size, end - start)
+                f.seek(start)
+                truncated = os.fstat(f.fileno()).st_size < start + size
+                chunk = b'' if truncated else f.read(size)
+                if len(chunk) < size:
+                    raise OSError(f'The file {self.path} was truncated while serving it')
+                yield chunk
+
+
+class StaticRoute(NamedTuple):
+    """Serves the files in `directory` at the urls starting with `prefix`, e.g., /assets/img/logo.png
+    is the file directory/img/logo.png.
+
+    It supports conditional requests (strong ETag and Last-Modified), single range requests and the
+    precompressed siblings (file.br, file.gz) that are chosen according to Accept-Encoding."""
+    prefix: str
+    directory: Path
+    cache_control: str = 'no-cache'
+
+    async def callback(self, request: HttpRequest, resp):
+        # resolving and stat-ing the file can block on slow (e.g., network) filesystems, keep it off the event loop
+        response = await asyncio.get_running_loop().run_in_executor(None, static_response, self, request)
+        res = resp(response)
+        if res:
+            await res
+
+    def as_http_route(self) -> HttpRoute:
+        return HttpRoute(self.prefix.rstrip('/') + '/{path:path}', self.callback, methods=('GET',))
+
+
+def static_response(route: StaticRoute, request: HttpRequest) -> HttpResponse:
+    file = _resolve(route, request.path)
+    if file is None:
+        return HttpResponse('Not Found', 'text/plain', 404)
+
+    content_type = _content_types.get(file.suffix) or mimetypes.guess_type(file.name)[0] or 'application/octet-stream'
+    headers = {'Cache-Control': route.cache_control, 'Vary': 'Accept-Encoding', 'Accept-Ranges': 'bytes'}
+    file, encoding = _select_encoding(file, request.headers.get('accept-encoding', ''))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+
+    stat = file.stat()
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}{"-" + encoding if encoding else ""}"'
+    headers['ETag'] = etag
+    headers['Last-Modified'] = formatdate(stat.st_mtime, usegmt=True)
+    if _not_modified(request, etag, stat.st_mtime):
+        return HttpResponse.not_modified(headers)
+
+    size = stat.st_size
+    byte_range = _requested_range(request, etag, size)
+    if byte_range == 'unsatisfiable':
+        return HttpResponse(b'', '', 416, {**headers, 'Content-Range': f'bytes */{size}'})
+    if byte_range is None:
+        headers['Content-Length'] = str(size)
+        return HttpResponse(FileContent(file, 0, size), content_type, headers=headers)
+    start, end = byte_range
+    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+    return HttpResponse(FileContent(file, start, end - start + 1), content_type, 206, headers)
+
+
+def _resolve(route: StaticRoute, path: str) -> Path | None:
+    prefix = route.prefix.rstrip('/') + '/'
+    if not path.startswith(prefix):
+        return None
+    relative = path[len(prefix):]
+    if not relative:
+        return None
+    root = route.directory.resolve()
+    file = (root / relative).resolve()
+    if root not in file.parents or not file.is_file():
+        return None
+    return file
+
+
+def _select_encoding(file: Path, accept_encoding: str) -> Tuple[Path, str]:
+    accepted = accepted_encodings(accept_encoding)
+    for encoding, suffix in _encodings:
+        if accepts(accepted, encoding):
+            sibling = file.with_name(file.name + suffix)
+            if sibling.is_file():
+                return sibling, encoding
+    return file, ''
+
+
+def _not_modified(request: HttpRequest, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+_range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _requested_range(request: HttpRequest, etag: str, size: int) -> Tuple[int, int] | str | None:
+    """Returns the (start, end) inclusive range, 'unsatisfiable' or None to send the whole file.
+    Multiple ranges are not supported, the whole file is sent."""
+    header = request.headers.get('range')
+    if not header:
+        return None
+    if_range = request.headers.get('if-range')
+    if if_range and if_range != etag:
+        return None
+    match = _range_re.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import ast
+import logging
+from dataclasses import dataclass, field
+from itertools import chain
+from pathlib import PurePosixPath
+from typing import Iterable, Iterator, Sequence, Dict, Set, List, Tuple
+
+from wwwpy.bundle import manifest_entry, ManifestEntry
+from wwwpy.common import iterlib
+from wwwpy.resources import Resource, ResourceIterable, resource_bytes
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TreeShakeReport:
+    kept: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+    kept_bytes: int = 0
+    dropped_bytes: int = 0
+
+    def summary(self) -> str:
+        total = self.kept_bytes + self.dropped_bytes
+        return (f'tree shaking dropped {len(self.dropped)} of {len(self.kept) + len(self.dropped)} files, '
+                f'{self.dropped_bytes} of {total} bytes')
+
+
+class TreeShaker:
+    """A ResourceIterable that yields only the resources reachable from the entry modules.
+
+    The reachability is computed statically, walking the import statements (also the ones inside functions)
+    and the `importlib.import_module`/`__import__` calls with a literal argument.
+    The modules that are imported dynamically must be whitelisted; a whitelist entry `pkg.*` keeps
+    all the modules of the package `pkg`.
+    The `context` resources take part in the import graph (e.g., the user `remote` package that imports the library)
+    but they are not yielded.
+    Non-python files are kept when the package of their directory is reachable.
+    """
+
+    def __init__(self, resources: ResourceIterable, entry_modules: Iterable[str],
+                 whitelist: Iterable[str] = (), context: Sequence[ResourceIterable] = ()):
+        self._resources = resources
+        self._entry_modules = set(entry_modules)
+        self._whitelist = set(whitelist)
+        self._context = context
+        self._imports_cache: Dict[str, Tuple[ManifestEntry, Set[str]]] = {}
+        self.report = TreeShakeReport()
+
+    def __iter__(self) -> Iterator[Resource]:
+        resources = list(iterlib.iter_catching(iter(self._resources)))
+        context = list(iterlib.iter_catching(iter(chain.from_iterable(self._context))))
+        modules = {module_name(r.arcname): r for r in chain(context, resources) if r.arcname.endswith('.py')}
+        reachable = self._reachable(modules)
+
+        report = TreeShakeReport()
+        kept = []
+        for resource in resources:
+            size = _size(resource)
+            if _is_reachable(resource, reachable):
+                kept.append(resource)
+                report.kept.append(resource.arcname)
+                report.kept_bytes += size
+            else:
+                report.dropped.append(resource.arcname)
+                report.dropped_bytes += size
+        if report.dropped != self.report.dropped:
+            logger.info(report.summary())
+            logger.debug(f'tree shaking dropped: {report.dropped}')
+        self.report = report
+        return iter(kept)
+
+    def _reachable(self, modules: Dict[str, Resource]) -> Set[str]:
+        roots = set(self._entry_modules)
+        for entry in self._whitelist:
+            if entry.endswith('.*'):
+                package = entry[:-2]
+                roots.update(m for m in modules if m == package or m.startswith(package + '.'))
+            else:
+                roots.add(entry)
+
+        reachable: Set[str] = set()
+        pending = [m for m in roots if m in modules]
+        while pending:
+            name = pending.pop()
+            if name in reachable:
+                continue
+            reachable.add(name)
+            candidates = set(_parents(name))
+            candidates.update(self._imports_of(name, modules[name]))
+            pending.extend(c for c in candidates if c in modules and c not in reachable)
+        return reachable
+
+    def _imports_of(self, name: str, resource: Resource) -> Set[str]:
+        try:
+            entry = manifest_entry(resource)
+        except OSError:
+            return set()
+        cached = self._imports_cache.get(resource.arcname, None)
+        if cached is not None and cached[0] == entry:
+            return cached[1]
+        imports = imported_modules(name, resource_bytes(resource), is_package(resource.arcname))
+        self._imports_cache[resource.arcname] = (entry, imports)
+        return imports
+
+
+def module_name(arcname: str) -> str:
+    path = PurePosixPath(arcname)
+    if path.name == '__init__.py':
+        return '.'.join(path.parent.parts)
+    return '.'.join(path.with_suffix('').parts)
+
+
+def is_package(arcname: str) -> bool:
+    return PurePosixPath(arcname).name == '__init__.py'
+
+
+def imported_modules(name: str, source: bytes, package: bool) -> Set[str]:
+    """Returns the candidate module names imported by the given source; the candidates may not exist"""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        logger.warning(f'Cannot parse module {name}, its imports are ignored')
+        return set()
+
+    current_package = name if package else name.rpartition('.')[0]
+    result: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                result.update(_parents(alias.name))
+        elif isinstance(node, ast.ImportFrom):
+            base = _resolve_relative(current_package, node.module, node.level)
+            if base is None:
+                continue
+            result.update(_parents(base))
+            result.update(f'{base}.{alias.name}' for alias in node.names if alias.name != '*')
+        elif isinstance(node, ast.Call) and _is_dynamic_import(node.func):
+            if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+                result.update(_parents(node.args[0].value))
+    return result
+
+
+def _is_dynamic_import(func: ast.AST) -> bool:
+    if isinstance(func, ast.Name):
+        return func.id in ('__import__', 'import_module')
+    if isinstance(func, ast.Attribute):
+        return func.attr == 'import_module'
+    return False
+
+
+def _resolve_relative(current_package: str, module: str | None, level: int) -> str | None:
+    if level == 0:
+        return module
+    parts = current_package.split('.') if current_package else []
+    if level - 1 > len(parts):
+        return None
+    base_parts = parts[:len(parts) - (level - 1)]
+    if module:
+        base_parts.append(module)
+    return '.'.join(base_parts) if base_parts else None
+
+
+def _parents(name: str) -> List[str]:
+    parts = name.split('.')
+    return ['.'.join(parts[:i + 1]) for i in range(len(parts))]
+
+
+def _is_reachable(resource: Resource, reachable: Set[str]) -> bool:
+    if resource.arcname.endswith('.py'):
+        return module_name(resource.arcname) in reachable
+    package = '.'.join(PurePosixPath(resource.arcname).parent.parts)
+    return package in reachable
+
+
+def _size(resource: Resource) -> int:
+    try:
+        return manifest_entry(resource)[1]
+    except OSError:
+        return 0
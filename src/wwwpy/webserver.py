@@ -1,20 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
 from time import sleep
-from typing import Union
+from typing import Union, List
 
 from wwwpy.http import HttpRoute
+from wwwpy.lifespan import Lifespan
+from wwwpy.middleware import Middleware, WebsocketMiddleware
+from wwwpy.router import Router
 from wwwpy.server.wait_url import wait_url
+from wwwpy.static import StaticRoute
 from wwwpy.websocket import WebsocketRoute
 
-Route = Union[HttpRoute, WebsocketRoute]
+Route = Union[HttpRoute, WebsocketRoute, StaticRoute]
 
 
 class Webserver(ABC):
     def __init__(self) -> None:
         self.host: str = '0.0.0.0'
         self.port: int = 7777
+        self.router = Router()
+        """The route table, it is shared by all the routes types"""
+        self.lifespan = Lifespan()
+        self.middlewares: List[Middleware] = []
+        self.websocket_middlewares: List[WebsocketMiddleware] = []
 
     def set_host(self, host: str) -> 'Webserver':
         self.host = host
@@ -35,23 +45,38 @@ class Webserver(ABC):
         self.wait_ready()
         return self
 
+    def set_lifespan(self, lifespan: Lifespan) -> 'Webserver':
+        """The startup hooks run before the webserver accepts requests; it must be called before start_listen"""
+        self.lifespan = lifespan
+        return self
+
+    def add_middleware(self, *middlewares: Middleware) -> 'Webserver':
+        """The middlewares run, in order, for all the http routes (see wwwpy.middleware)"""
+        self.middlewares.extend(middlewares)
+        return self
+
+    def add_websocket_middleware(self, *middlewares: WebsocketMiddleware) -> 'Webserver':
+        self.websocket_middlewares.extend(middlewares)
+        return self
+
     def set_routes(self, *routes: Route) -> 'Webserver':
         for route in routes:
-            self._setup_route(route)
+            self.router.add(route)
         return self
 
-    @abstractmethod
-    def _setup_route(self, route: Route) -> None:
-        pass
-
     @abstractmethod
     def _start_listen(self) -> None:
         pass
 
     def wait_ready(self) -> 'Webserver':
-        wait_url(self.localhost_url() + '/check_if_webserver_is_accepting_requests')
+        # the webserver accepts requests only after the startup hooks, that can take a while
+        wait_url(self.localhost_url() + '/check_if_webserver_is_accepting_requests', timeout=60)
         return self
 
+    def shutdown(self) -> None:
+        """Drains the requests in flight and runs the shutdown hooks"""
+        asyncio.run(self.lifespan.shutdown())
+
     def localhost_url(self) -> str:
         return f'http://127.0.0.1:{self.port}'
 
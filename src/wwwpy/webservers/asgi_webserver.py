@@ -1,25 +1,42 @@
-from typing import Callable, Awaitable
+from __future__ import annotations
 
-from wwwpy.common.asynclib import OptionalCoroutine
-from wwwpy.http import HttpRoute
-from wwwpy.server.asgi import routes_to_asgi_application, AsgiApplication
-from wwwpy.webserver import Webserver, Route
-from wwwpy.websocket import WebsocketRoute
+from abc import abstractmethod
+from threading import Thread
+from typing import Optional
+
+from wwwpy.server.asgi import AsgiApplication
+from wwwpy.webserver import Webserver
 
 
 class AsgiWebserver(Webserver):
-    def __init__(self, start):
+    """Serves the AsgiApplication of the routes with an ASGI server, running in a daemon thread"""
+
+    def __init__(self):
         super().__init__()
-        self._start = start
-        self.app = AsgiApplication()
-
-    def _setup_route(self, route: Route):
-        if isinstance(route, HttpRoute):
-            self.app.http_route[route.path] = route
-        elif isinstance(route, WebsocketRoute):
-            self.app.websocket_route[route.path] = route
-        else:
-            raise Exception(f'Unknown route type: {type(route)}')
-
-    async def _start_listen(self) -> None:
-        await self._start(self)
+        self.app = AsgiApplication(router=self.router)
+        self.app.middlewares = self.middlewares
+        self.app.websocket_middlewares = self.websocket_middlewares
+        self.thread: Optional[Thread] = None
+
+    def _start_listen(self) -> None:
+        # the ASGI server runs the startup hooks with the lifespan protocol, before accepting requests
+        self.app.lifespan = self.lifespan
+        self.thread = Thread(target=self._run, daemon=True, name=type(self).__name__)
+        self.thread.start()
+
+    def shutdown(self) -> None:
+        """Stops the ASGI server: it stops accepting connections and, on its event loop, it drains the requests
+        in flight and runs the shutdown hooks with the lifespan protocol"""
+        if self.thread is None:
+            return super().shutdown()
+        self._stop()
+        self.thread.join()
+
+    @abstractmethod
+    def _stop(self) -> None:
+        """Asks the ASGI server to stop; it is called from another thread than the webserver one"""
+
+    @abstractmethod
+    def _run(self) -> None:
+        """Runs the ASGI server on host and port; it is called in the webserver thread, so the server
+        must not install signal handlers"""
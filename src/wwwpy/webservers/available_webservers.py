@@ -12,8 +12,15 @@ class AvailableWebservers:
     def ids(self) -> Iterator[str]:
         return map(lambda w: w.__name__, self._classes)
 
-    def new_instance(self) -> Webserver:
-        return self._classes[0]()
+    def new_instance(self, webserver_id: str = '') -> Webserver:
+        """Returns an instance of the given webserver (e.g., WsUvicorn or uvicorn), by default the first available"""
+        if not webserver_id:
+            return self._classes[0]()
+        name = webserver_id.lower()
+        for webserver_class in self._classes:
+            if name in (webserver_class.__name__.lower(), webserver_class.__name__.lower().removeprefix('ws')):
+                return webserver_class()
+        raise ValueError(f'Webserver `{webserver_id}` is not available, the available ones are: {list(self.ids)}')
 
     def instances(self) -> Iterator[Webserver]:
         for webserver_class in self._classes:
@@ -28,6 +35,30 @@ def _webservers_classes() -> List[type[Webserver]]:
     except:
         pass
 
+    try:
+        from .uvicorn import WsUvicorn
+        result.append(WsUvicorn)
+    except ImportError:
+        pass
+
+    try:
+        from .hypercorn import WsHypercorn
+        result.append(WsHypercorn)
+    except ImportError:
+        pass
+
+    try:
+        from .granian import WsGranian
+        result.append(WsGranian)
+    except ImportError:
+        pass
+
+    try:
+        from .daphne import WsDaphne
+        result.append(WsDaphne)
+    except ImportError:
+        pass
+
     return result
 
 
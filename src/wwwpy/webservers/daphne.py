@@ -0,0 +1,67 @@
+import asyncio
+import threading
+from typing import List
+
+import daphne
+
+from .asgi_webserver import AsgiWebserver
+from ..webserver import Webserver
+
+# the Twisted reactor is a process singleton: the first daphne server runs it, the others are added to it
+_reactor_lock = threading.Lock()
+_reactor_started = False
+
+
+class WsDaphne(AsgiWebserver):
+    _loop: asyncio.AbstractEventLoop = None
+
+    def __init__(self):
+        super().__init__()
+        self._ports: List = []
+
+    def _run(self) -> None:
+        global _reactor_started
+        # daphne.server installs the asyncio reactor of Twisted when imported, so it is imported only when used
+        from daphne.endpoints import build_endpoint_description_strings
+        from daphne.server import Server
+        from twisted.internet import reactor
+        endpoints = build_endpoint_description_strings(host=self.host, port=self.port)
+        server = Server(self.app, endpoints=endpoints, signal_handlers=False, verbosity=0)
+        listen_success = server.listen_success
+
+        def listening(port):
+            # the listening ports are kept to stop them on shutdown, without stopping the shared reactor
+            self._ports.append(port)
+            listen_success(port)
+
+        server.listen_success = listening
+        # daphne does not support the lifespan protocol: the hooks run on the event loop of the reactor,
+        # that serves the requests, and the startup ones before listening
+        self._loop = reactor._asyncioEventloop
+        with _reactor_lock:
+            first = not _reactor_started
+            _reactor_started = True
+        if first:
+            self._loop.run_until_complete(self.lifespan.startup())
+            server.run()
+            return
+        asyncio.run_coroutine_threadsafe(self.lifespan.startup(), self._loop).result()
+        # with abort_start, run() sets up the endpoints without running the reactor again
+        server.abort_start = True
+        reactor.callFromThread(server.run)
+
+    def shutdown(self) -> None:
+        if self._loop is None or not self._loop.is_running():
+            return Webserver.shutdown(self)
+        # the reactor keeps running, it may serve other daphne servers
+        self._stop()
+        asyncio.run_coroutine_threadsafe(self.lifespan.shutdown(), self._loop).result()
+
+    def _stop(self) -> None:
+        from twisted.internet import defer, reactor
+        from twisted.internet.threads import blockingCallFromThread
+
+        def stop_listening():
+            return defer.gatherResults([port.stopListening() for port in self._ports])
+
+        blockingCallFromThread(reactor, stop_listening)
@@ -0,0 +1,25 @@
+import asyncio
+
+from granian.constants import Interfaces
+from granian.server.embed import Server
+
+from .asgi_webserver import AsgiWebserver
+
+
+class WsGranian(AsgiWebserver):
+    _loop: asyncio.AbstractEventLoop = None
+    _server: Server = None
+
+    def _run(self) -> None:
+        self._server = Server(self.app, address=self.host, port=self.port, interface=Interfaces.ASGI,
+                              log_access=False)
+
+        async def serve():
+            self._loop = asyncio.get_running_loop()
+            await self._server.serve()
+
+        asyncio.run(serve())
+
+    def _stop(self) -> None:
+        # Server.stop sets an asyncio.Event, so it must run on the event loop of the server
+        self._loop.call_soon_threadsafe(self._server.stop)
@@ -0,0 +1,26 @@
+import asyncio
+
+import hypercorn.asyncio
+import hypercorn.config
+
+from .asgi_webserver import AsgiWebserver
+
+
+class WsHypercorn(AsgiWebserver):
+    _loop: asyncio.AbstractEventLoop = None
+    _stopping: asyncio.Event = None
+
+    def _run(self) -> None:
+        config = hypercorn.config.Config()
+        config.bind = [f'{self.host}:{self.port}']
+
+        async def serve():
+            self._loop = asyncio.get_running_loop()
+            self._stopping = asyncio.Event()
+            # with a shutdown trigger hypercorn does not install the signal handlers
+            await hypercorn.asyncio.serve(self.app, config, shutdown_trigger=self._stopping.wait)
+
+        asyncio.run(serve())
+
+    def _stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._stopping.set)
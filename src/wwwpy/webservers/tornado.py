@@ -1,15 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import socket
 from threading import Thread
-from typing import Awaitable, Union
+from types import MappingProxyType
+from typing import Awaitable, Union, List, AsyncIterator, Mapping, Tuple, Sequence
 from typing import Optional
+from urllib.parse import unquote
 
 import tornado
+import tornado.routing
 import tornado.web
 from tornado import websocket
+from tornado.httpserver import HTTPServer
+from tornado.httputil import HTTPServerRequest
 from tornado.ioloop import IOLoop
+from tornado.routing import AnyMatches
 
-from wwwpy.http import HttpRoute, HttpRequest
+from wwwpy.http import HttpRoute, HttpRequest, HttpResponse, is_streaming, aiter_chunks, Chunks, content_length
+from wwwpy.lifespan import Lifespan
+from wwwpy.middleware import handle, connect, Middleware
 from ..webserver import Webserver, Route
 from ..websocket import WebsocketRoute, WebsocketEndpointIO
 
@@ -19,19 +29,27 @@ class WsTornado(Webserver):
 
     def __init__(self):
         super().__init__()
-        self.app = tornado.web.Application()
+        self.app = tornado.web.Application([(AnyMatches(), _TornadoRouter(self))])
         self.thread: Optional[Thread] = None
+        self.sockets: Optional[List[socket.socket]] = None
+        self.http_server: Optional[HTTPServer] = None
 
-    def _setup_route(self, route: Route):
-        if isinstance(route, WebsocketRoute):
-            self.app.add_handlers(r".*", [(route.path, _WebsocketHandler, dict(route=route, server=self))])
-        else:
-            self.app.add_handlers(r".*", [(route.path, TornadoHandler, dict(route=route))])
+    def set_sockets(self, sockets: List[socket.socket]) -> 'WsTornado':
+        """Serves on sockets that are already listening (e.g., inherited from the parent process)
+        instead of binding the port"""
+        self.sockets = sockets
+        return self
 
     def _start_listen(self):
         def run():
-            self.app.listen(self.port, self.host)
             self.ioloop = IOLoop.current()
+            # the startup hooks run before accepting requests
+            self.ioloop.run_sync(self.lifespan.startup)
+            if self.sockets is None:
+                self.http_server = self.app.listen(self.port, self.host)
+            else:
+                self.http_server = HTTPServer(self.app)
+                self.http_server.add_sockets(self.sockets)
             # asyncio.set_event_loop(self.ioloop.asyncio_loop)
             self.ioloop.start()
 
@@ -39,49 +57,177 @@ class WsTornado(Webserver):
         self.thread.start()
 
 
-class TornadoHandler(tornado.web.RequestHandler):
+    def shutdown(self) -> None:
+        """Stops accepting connections, drains the requests in flight and runs the shutdown hooks"""
+        if self.ioloop is None:
+            return
 
-    def __init__(self, *args, **kwargs):
-        self.route: Route = None
-        self._serve = None
-        super().__init__(*args, **kwargs)
+        async def stop():
+            self.http_server.stop()
+            await self.lifespan.shutdown()
+
+        asyncio.run_coroutine_threadsafe(stop(), self.ioloop.asyncio_loop).result()
+        self.ioloop.add_callback(self.ioloop.stop)
 
-    def initialize(self, route: HttpRoute) -> None:
-        self.route = route
-        if not isinstance(route, HttpRoute):
-            raise Exception(f'Unknown route type: {type(route)}')
 
+class _TornadoRouter(tornado.routing.Router):
+    """Dispatches the requests with the route table of the webserver, instead of the regex rules of Tornado"""
+
+    def __init__(self, server: WsTornado):
+        self.server = server
+
+    def find_handler(self, request: HTTPServerRequest, **kwargs):
+        path = unquote(request.path)
+        if request.headers.get('Upgrade', '').lower() == 'websocket':
+            found = self.server.router.match_websocket(path)
+            if found is not None:
+                kwargs = dict(route=found.route, server=self.server, params=found.params)
+                return self.server.app.get_handler_delegate(request, _WebsocketHandler, kwargs)
+        found = self.server.router.match(path, request.method)
+        if found is None:
+            return None
+        if found.route is None:
+            return self.server.app.get_handler_delegate(request, _MethodNotAllowedHandler, dict(allowed=found.allowed))
+        kwargs = dict(route=found.route, params=found.params, lifespan=self.server.lifespan,
+                      middlewares=self.server.middlewares)
+        return self.server.app.get_handler_delegate(request, TornadoHandler, kwargs)
+
+
+class _CorsHandler(tornado.web.RequestHandler):
     def set_default_headers(self):
         self.set_header('Access-Control-Allow-Origin', '*')
         self.set_header('Access-Control-Allow-Headers', '*')
         self.set_header('Access-Control-Allow-Methods', '*')
 
-    def options(self):
+    def options(self, *args):
         """/OPTIONS handler for preflight CORS checks."""
         self.set_status(204)
         self.finish()
 
+
+class _MethodNotAllowedHandler(_CorsHandler):
+    def initialize(self, allowed: Tuple[str, ...]) -> None:
+        self.allowed = allowed
+
+    def prepare(self):
+        if self.request.method != 'OPTIONS':
+            self.set_header('Allow', ', '.join(self.allowed))
+            raise tornado.web.HTTPError(405)
+
+
+@tornado.web.stream_request_body
+class TornadoHandler(_CorsHandler):
+
+    def __init__(self, *args, **kwargs):
+        self.route: Route = None
+        self._serve = None
+        self._chunks: List[bytes] = []
+        self._body_queue: asyncio.Queue | None = None
+        self._streaming: asyncio.Future | None = None
+        super().__init__(*args, **kwargs)
+
+    def initialize(self, route: HttpRoute, params: Mapping[str, str] = MappingProxyType({}),
+                   lifespan: Lifespan | None = None, middlewares: Sequence[Middleware] = ()) -> None:
+        self.route = route
+        self.params = params
+        self.middlewares = middlewares
+        self.lifespan = Lifespan() if lifespan is None else lifespan
+        if not isinstance(route, HttpRoute):
+            raise Exception(f'Unknown route type: {type(route)}')
+
+    def prepare(self):
+        try:
+            length = content_length(self.request.headers.get('Content-Length', None))
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+        max_size = self.route.max_body_size
+        if max_size is not None:
+            if length > max_size:
+                raise tornado.web.HTTPError(413)
+            self.request.connection.set_max_body_size(max_size)
+        if self.route.stream_body and self.request.method not in ('HEAD', 'OPTIONS'):
+            # the callback starts as soon as the headers are received, and it consumes the body while it arrives
+            self._body_queue = asyncio.Queue(maxsize=4)
+            self._streaming = asyncio.ensure_future(self._serve_std(self.request.method, self._iter_body()))
+
+    async def data_received(self, chunk: bytes) -> None:
+        if self._body_queue is None:
+            self._chunks.append(chunk)
+        else:
+            await self._put_body(chunk)
+
+    async def _put_body(self, chunk: bytes | None):
+        # the queue is bounded, so a slow consumer slows down the reading from the socket;
+        # if the callback is finished without reading the whole body, the rest is discarded
+        put = asyncio.ensure_future(self._body_queue.put(chunk))
+        await asyncio.wait([put, self._streaming], return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+
+    async def _iter_body(self) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await self._body_queue.get()
+            if chunk is None:
+                return
+            yield chunk
+
     async def get(self) -> None:
-        await self._serve_std('GET')
+        await self._serve_verb('GET')
 
     async def post(self) -> None:
-        await self._serve_std('POST')
+        await self._serve_verb('POST')
+
+    async def put(self) -> None:
+        await self._serve_verb('PUT')
+
+    async def patch(self) -> None:
+        await self._serve_verb('PATCH')
+
+    async def delete(self) -> None:
+        await self._serve_verb('DELETE')
+
+    async def head(self) -> None:
+        # the router dispatches HEAD to the GET route; tornado sends only the headers of the response
+        await self._serve_verb('HEAD')
 
-    async def _serve_std(self, verb: str):
-        body = self.request.body
-        request = HttpRequest(verb, body, self.request.headers.get('Content-Type', ''))
+    async def _serve_verb(self, verb: str):
+        if self._streaming is None:
+            await self._serve_std(verb, b''.join(self._chunks))
+        else:
+            await self._put_body(None)
+            await self._streaming
+
+    async def _serve_std(self, verb: str, body: bytes | AsyncIterator[bytes]):
+        with self.lifespan.request():
+            await self._serve_request(verb, body)
+
+    async def _serve_request(self, verb: str, body: bytes | AsyncIterator[bytes]):
+        request = HttpRequest(verb, body, self.request.headers.get('Content-Type', ''), _headers(self.request),
+                              self.request.query, unquote(self.request.path), self.params)
 
-        def response_fun(response):
+        def response_fun(response: HttpResponse):
             self.set_default_headers()
-            self.set_header("Content-Type", response.content_type)
-            return self.write(response.content)
+            self.set_status(response.status)
+            if response.content_type:
+                self.set_header("Content-Type", response.content_type)
+            for name, value in response.headers.items():
+                self.set_header(name, value)
+            if is_streaming(response.content):
+                if self.request.method == 'HEAD':
+                    return None
+                return self._write_stream(response.content)
+            if response.content:
+                self.write(response.content)
 
-        res = self.route.callback(request, response_fun)
+        res = handle(self.route, request, response_fun, self.middlewares)
         if res:
             await res
 
-    def data_received(self, chunk: bytes) -> Optional[Awaitable[None]]:
-        raise_exception(self)
+    async def _write_stream(self, chunks: Chunks):
+        async for chunk in aiter_chunks(chunks):
+            self.write(chunk)
+            # waits until the chunk is handed to the socket, so only one chunk at a time is kept in memory
+            await self.flush()
 
 
 class _WebsocketHandler(websocket.WebSocketHandler):
@@ -89,16 +235,25 @@ class _WebsocketHandler(websocket.WebSocketHandler):
     server: WsTornado = None
     endpoint: WebsocketEndpointIO = None
 
-    def initialize(self, route: WebsocketRoute, server: WsTornado) -> None:
+    def initialize(self, route: WebsocketRoute, server: WsTornado,
+                   params: Mapping[str, str] = MappingProxyType({})) -> None:
         self.route = route
         self.server = server
+        self.params = params
+
+    def get_compression_options(self):
+        # permessage-deflate, when the client supports it (e.g., the hot reload payloads)
+        return {}
 
     # def check_origin(self, origin):
     #     return True
 
     def open(self):
         self.endpoint = WebsocketEndpointIO(self._on_send)
-        self.route.on_connect(self.endpoint)
+        request = HttpRequest('GET', b'', '', _headers(self.request), self.request.query,
+                              unquote(self.request.path), self.params)
+        if not connect(self.route, request, self.endpoint, self.server.websocket_middlewares):
+            self.close()
 
     def on_message(self, message: Union[str, bytes]) -> Optional[Awaitable[None]]:
         self.endpoint.on_message(message)
@@ -113,7 +268,5 @@ class _WebsocketHandler(websocket.WebSocketHandler):
         self.endpoint.on_message(None)
 
 
-def raise_exception(self: TornadoHandler):
-    print("=" * 60)
-    print(f'exc! {self.route}')
-    raise Exception(self)
+def _headers(request: HTTPServerRequest) -> dict[str, str]:
+    return {name.lower(): value for name, value in request.headers.items()}
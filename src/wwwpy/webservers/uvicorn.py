@@ -0,0 +1,17 @@
+import uvicorn
+
+from .asgi_webserver import AsgiWebserver
+
+
+class WsUvicorn(AsgiWebserver):
+    _server: uvicorn.Server = None
+
+    def _run(self) -> None:
+        # outside the main thread uvicorn does not install the signal handlers
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level='warning')
+        self._server = uvicorn.Server(config)
+        self._server.run()
+
+    def _stop(self) -> None:
+        # the main loop of uvicorn checks the flag periodically
+        self._server.should_exit = True
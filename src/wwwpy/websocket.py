@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from enum import Enum
-from typing import NamedTuple, Protocol, List, Iterator
+from typing import NamedTuple, Protocol, List, Iterator, Tuple
 
+from wwwpy import metrics
 from wwwpy.common.asynclib import OptionalCoroutine
 from wwwpy.common.rpc.serializer import RpcRequest
 
@@ -13,6 +16,8 @@ logger = logging.getLogger(__name__)
 class WebsocketRoute(NamedTuple):
     path: str
     on_connect: Callable[[WebsocketEndpoint], None]
+    middlewares: Tuple[Callable, ...] = ()
+    """The middlewares of this route only, they run after the ones of the webserver (see wwwpy.middleware)"""
 
 
 class Change(Enum):
@@ -60,12 +65,22 @@ class WebsocketPool:
                 remove = PoolEvent(Change.remove, endpoint, self)
                 self._notify_change(remove, self.on_before_change)
                 self.clients.remove(endpoint)
+                metrics.websocket_clients.set(len(self.clients), self.http_route.path)
                 self._notify_change(remove, self.on_after_change)
 
         endpoint.add_listener(handle_remove)
         self.clients.append(endpoint)
+        metrics.websocket_clients.set(len(self.clients), self.http_route.path)
         self._notify_change(add, self.on_after_change)
 
+    async def close_all(self, timeout: float = 2.0):
+        """Closes the connections of all the clients and waits until they are removed from the pool"""
+        for client in list(self.clients):
+            client.send(None)
+        deadline = time.monotonic() + timeout
+        while self.clients and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+
     def all_clients_rpc(self, rpc_class: Callable[..., T]) -> Iterator[T]:
         for client in self.clients:
             try:
@@ -119,13 +134,22 @@ class WebsocketEndpointIO(WebsocketEndpoint):
 
     # part to be called by user code to send a outgoing message
     def send(self, message: str | bytes | None) -> OptionalCoroutine:
+        if message is not None:
+            metrics.websocket_bytes.inc('sent', amount=_size(message))
         return self._send(message)
 
     # parte to be used by IO implementation to be called to notify incoming messages
     def on_message(self, message: str | bytes | None) -> OptionalCoroutine:
+        if message is not None:
+            metrics.websocket_bytes.inc('received', amount=_size(message))
         if self._listener is not None:
             return self._listener(message)
 
     def dispatch(self, module: str, func_name: str, *args) -> OptionalCoroutine:
         j = RpcRequest.to_json(module, func_name, *args)
         return self.send(j)
+
+
+def _size(message: str | bytes) -> int:
+    # the ascii text (e.g., the json of the rpc) has as many bytes as characters
+    return len(message) if isinstance(message, bytes) or message.isascii() else len(message.encode())
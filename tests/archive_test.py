@@ -0,0 +1,47 @@
+from io import BytesIO
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED
+
+from wwwpy.archive import compress_entry, iter_zip, read_entries
+
+
+def _zip(*entries) -> ZipFile:
+    return ZipFile(BytesIO(b''.join(iter_zip(entries))))
+
+
+def test_should_be_readable_by_zipfile():
+    with _zip(compress_entry('a.py', b'a = 1\n' * 100), compress_entry('pkg/b.py', b'')) as zf:
+        assert zf.testzip() is None
+        assert zf.read('a.py') == b'a = 1\n' * 100
+        assert zf.read('pkg/b.py') == b''
+
+
+def test_incompressible__should_be_stored():
+    import os
+    with _zip(compress_entry('random.bin', os.urandom(1000)), compress_entry('text', b'x' * 1000)) as zf:
+        assert zf.getinfo('random.bin').compress_type == ZIP_STORED
+        assert zf.getinfo('text').compress_type == ZIP_DEFLATED
+
+
+def test_date_time():
+    with _zip(compress_entry('a.py', b'', (2024, 5, 17, 13, 45, 30))) as zf:
+        assert zf.getinfo('a.py').date_time == (2024, 5, 17, 13, 45, 30)
+
+
+def test_non_ascii_names():
+    with _zip(compress_entry('città.txt', b'x')) as zf:
+        assert zf.namelist() == ['città.txt']
+
+
+def test_empty():
+    with _zip() as zf:
+        assert zf.namelist() == []
+
+
+def test_read_entries__should_copy_the_compressed_entries():
+    content = b''.join(iter_zip([compress_entry('a.py', b'a' * 1000), compress_entry('b.py', b'b = 1')]))
+
+    entries = read_entries(content, {'a.py'})
+
+    assert [e.arcname for e in entries] == ['a.py']
+    with _zip(*entries) as zf:
+        assert zf.read('a.py') == b'a' * 1000
@@ -1,5 +1,7 @@
 from collections.abc import Iterator
 
+import pytest
+
 from wwwpy.webservers.available_webservers import available_webservers
 
 
@@ -21,3 +23,15 @@ def test_new_instance():
 def test_instances():
     instances = available_webservers().instances()
     assert isinstance(instances, Iterator)
+
+
+def test_new_instance_by_id():
+    for ws_id in available_webservers().ids:
+        assert type(available_webservers().new_instance(ws_id)).__name__ == ws_id
+        short_name = ws_id.lower().removeprefix('ws')
+        assert type(available_webservers().new_instance(short_name)).__name__ == ws_id
+
+
+def test_new_instance_unknown():
+    with pytest.raises(ValueError):
+        available_webservers().new_instance('unknown')
@@ -0,0 +1,93 @@
+import importlib
+import sys
+
+import pytest
+
+from tests.common import restore_sys_path
+from wwwpy.bootstrap import _bundle_importer_source
+from wwwpy.common import reloader
+from wwwpy.remote.bundle_importer import BundleImporter, installed
+from wwwpy.resources import build_archive, StringResource, Bytecode
+
+_resources = [
+    StringResource('zimp/__init__.py', 'value = "init"'),
+    StringResource('zimp/mod.py', 'from . import sub\nvalue = "mod"'),
+    StringResource('zimp/sub/__init__.py', ''),
+    StringResource('zimp/page.html', '<h1>hi</h1>'),
+    StringResource('zimp_ns/leaf.py', 'value = "leaf"'),
+]
+
+
+@pytest.fixture
+def importer(tmp_path, restore_sys_path):
+    target = BundleImporter(str(tmp_path))
+    target.add_archive(build_archive(iter(_resources)))
+    target.install()
+    sys.path.insert(0, str(tmp_path))
+    try:
+        yield target
+    finally:
+        reloader.unload_path(str(tmp_path))
+
+
+def test_should_import_without_unpacking(importer, tmp_path):
+    import zimp.mod
+
+    assert zimp.mod.value == 'mod'
+    assert zimp.mod.__file__ == str(tmp_path / 'zimp/mod.py')
+    assert not (tmp_path / 'zimp/mod.py').exists()
+
+
+def test_non_python_files__should_be_extracted(importer, tmp_path):
+    assert (tmp_path / 'zimp/page.html').read_text() == '<h1>hi</h1>'
+
+
+def test_namespace_package(importer):
+    import zimp_ns.leaf
+    assert zimp_ns.leaf.value == 'leaf'
+
+
+def test_overlay__should_have_precedence(importer, tmp_path):
+    (tmp_path / 'zimp/mod.py').write_text('value = "overlay"')
+    import zimp.mod
+    assert zimp.mod.value == 'overlay'
+
+
+def test_materialize_and_delete__should_not_be_importable(importer, tmp_path):
+    importer.materialize('zimp/mod.py')
+    assert (tmp_path / 'zimp/mod.py').read_text() == 'from . import sub\nvalue = "mod"'
+
+    (tmp_path / 'zimp/mod.py').unlink()
+    with pytest.raises(ModuleNotFoundError):
+        importlib.import_module('zimp.mod')
+
+
+def test_materialize_directory(importer, tmp_path):
+    importer.materialize('/zimp/sub')
+    assert (tmp_path / 'zimp/sub/__init__.py').exists()
+    assert not (tmp_path / 'zimp/mod.py').exists()
+
+
+def test_installed(importer):
+    assert installed() is importer
+
+
+def test_bytecode__should_be_used(tmp_path, restore_sys_path):
+    resources = [StringResource('zimp_bc.py', 'value = 1')]
+    target = BundleImporter(str(tmp_path))
+    target.add_archive(build_archive(iter(resources), Bytecode(sys.version_info[:2], keep_sources=False)))
+    target.install()
+    try:
+        import zimp_bc
+        assert zimp_bc.value == 1
+    finally:
+        reloader.unload_path(str(tmp_path))
+
+
+def test_source_should_be_inlinable():
+    source = _bundle_importer_source()
+    for forbidden in ('\\', '`', "'''", '${'):
+        assert forbidden not in source
+    namespace = {}
+    exec(compile(source, 'bundle_importer', 'exec'), namespace)
+    assert 'BundleImporter' in namespace
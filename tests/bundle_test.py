@@ -0,0 +1,199 @@
+import asyncio
+import os
+import threading
+from io import BytesIO
+from pathlib import Path
+from zipfile import ZipFile
+
+from wwwpy.bundle import BundleCache, snapshot, manifest_etag, BundleBuild, LiveBundle
+from wwwpy.common.filesystem.sync import Event
+from wwwpy.resources import from_directory, StringResource
+
+
+def _names(content: bytes) -> set[str]:
+    with ZipFile(BytesIO(content)) as zf:
+        return set(zf.namelist())
+
+
+def _touch_later(file: Path):
+    stat = file.stat()
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_get__should_build_once(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    target = BundleCache([from_directory(tmp_path)])
+
+    first = target.get()
+    second = target.get()
+
+    assert first is second
+    assert target.build_count == 1
+    assert _names(first.content) == {'a.py'}
+
+
+def test_get__file_changed__should_rebuild(tmp_path):
+    file = tmp_path / 'a.py'
+    file.write_text('a = 1')
+    target = BundleCache([from_directory(tmp_path)])
+    first = target.get()
+
+    file.write_text('a = 22')
+    _touch_later(file)
+    second = target.get()
+
+    assert target.build_count == 2
+    assert first.etag != second.etag
+
+
+def test_get__file_added__should_rebuild(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    target = BundleCache([from_directory(tmp_path)])
+    first = target.get()
+
+    (tmp_path / 'b.py').write_text('b = 1')
+    second = target.get()
+
+    assert first.etag != second.etag
+    assert _names(second.content) == {'a.py', 'b.py'}
+
+
+def test_get__string_resource_changed__should_rebuild():
+    content = ['x = 1']
+    target = BundleCache([_Dynamic(lambda: [StringResource('x.py', content[0])])])
+    first = target.get()
+
+    content[0] = 'x = 2'
+    second = target.get()
+
+    assert first.etag != second.etag
+
+
+def test_etag__same_manifest__should_be_equal(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    _, manifest1 = snapshot(from_directory(tmp_path))
+    _, manifest2 = snapshot(from_directory(tmp_path))
+
+    assert manifest_etag(manifest1) == manifest_etag(manifest2)
+    assert manifest_etag(manifest1).startswith('"')
+
+
+def test_get__concurrent_misses__should_build_once(tmp_path):
+    for i in range(50):
+        (tmp_path / f'm{i}.py').write_text(f'm = {i}\n' * 100)
+    target = BundleCache([from_directory(tmp_path)])
+    barrier = threading.Barrier(8)
+    etags = []
+
+    def run():
+        barrier.wait()
+        etags.append(target.get().etag)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+
+    assert target.build_count == 1
+    assert len(set(etags)) == 1
+
+
+class _Dynamic:
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __iter__(self):
+        return iter(self._factory())
+
+
+async def test_get_async__concurrent_misses__should_build_once(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    target = BundleCache([from_directory(tmp_path)])
+
+    bundles = await asyncio.gather(*(target.get_async() for _ in range(5)))
+
+    assert target.build_count == 1
+    assert all(b is bundles[0] for b in bundles)
+    assert _names(bundles[0].content) == {'a.py'}
+
+
+async def test_lookup_async__miss__should_stream_the_archive(tmp_path):
+    for i in range(20):
+        (tmp_path / f'm{i}.py').write_bytes(os.urandom(20_000))
+    target = BundleCache([from_directory(tmp_path)])
+
+    found = await target.lookup_async()
+    assert isinstance(found, BundleBuild)
+    streamed = b''.join([chunk async for chunk in found.iter_chunks()])
+
+    bundle = await target.get_async()
+    assert streamed == bundle.content
+    assert found.etag == bundle.etag
+    assert len(_names(streamed)) == 20
+
+
+def test_live_bundle__modified_event__should_recompress_only_the_changed_file(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    (tmp_path / 'b.py').write_text('b = 1')
+    target = LiveBundle([from_directory(tmp_path)])
+    first = target.get()
+    assert target.compress_count == 2
+
+    (tmp_path / 'a.py').write_text('a = 22')
+    _touch_later(tmp_path / 'a.py')
+    target.apply_events([Event('modified', False, str(tmp_path / 'a.py'))])
+    second = target.get()
+
+    assert target.compress_count == 3
+    assert second.etag != first.etag
+    with ZipFile(BytesIO(second.content)) as zf:
+        assert zf.read('a.py') == b'a = 22'
+        assert zf.read('b.py') == b'b = 1'
+
+
+def test_live_bundle__no_events__should_not_look_at_the_files(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    target = LiveBundle([from_directory(tmp_path)])
+    first = target.get()
+
+    (tmp_path / 'b.py').write_text('b = 1')
+
+    assert target.get() is first
+    assert target.build_count == 1
+
+
+def test_live_bundle__deleted_event(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    (tmp_path / 'b.py').write_text('b = 1')
+    target = LiveBundle([from_directory(tmp_path)])
+    target.get()
+
+    (tmp_path / 'b.py').unlink()
+    target.apply_events([Event('deleted', False, str(tmp_path / 'b.py'))])
+
+    assert _names(target.get().content) == {'a.py'}
+    assert target.compress_count == 2
+
+
+def test_live_bundle__created_event__should_rescan(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    target = LiveBundle([from_directory(tmp_path)])
+    target.get()
+
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub/c.py').write_text('c = 1')
+    target.apply_events([Event('created', True, str(tmp_path / 'sub')),
+                         Event('created', False, str(tmp_path / 'sub/c.py'))])
+
+    assert _names(target.get().content) == {'a.py', 'sub/c.py'}
+    assert target.compress_count == 2
+
+
+def test_live_bundle__should_match_the_bundle_cache(tmp_path):
+    (tmp_path / 'a.py').write_text('a = 1')
+    (tmp_path / 'b.txt').write_text('b')
+
+    live = LiveBundle([from_directory(tmp_path)]).get()
+    cached = BundleCache([from_directory(tmp_path)]).get()
+
+    assert live.etag == cached.etag
+    assert live.content == cached.content
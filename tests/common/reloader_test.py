@@ -130,3 +130,19 @@ def test_from_x_import_y__namespace(dyn_sys_path: DynSysPath):
     from server import rpc  # noqa
     assert rpc.b == 42
     assert not hasattr(rpc, 'a')
+
+
+def test_unload_path_invalidates_the_rpc_dispatch_table(dyn_sys_path: DynSysPath):
+    from wwwpy.common.rpc2.default_skeleton import dispatch_table
+    # GIVEN
+    dyn_sys_path.write_module2('p1.py', 'def f(a: int) -> int: return a')
+    func, typed_function = dispatch_table.get('p1', 'f')
+    assert typed_function.args_types == [int]
+    assert dispatch_table.get('p1', 'f')[0] is func
+
+    # WHEN
+    unload_path(str(dyn_sys_path.path))
+
+    # THEN
+    dyn_sys_path.write_module2('p1.py', 'def f(a: str) -> str: return a')
+    assert dispatch_table.get('p1', 'f')[1].args_types == [str]
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import json
 import sys
 from dataclasses import dataclass, field
 from datetime import datetime
+from enum import Enum
 from typing import List, Tuple, Optional, Dict, Union
 
 import pytest
@@ -312,3 +314,77 @@ class TestResult:
         serialized = serialization.to_json(result, Result[Person, str])
         deserialized = serialization.from_json(serialized, Result[Person, str])
         assert deserialized == result
+
+
+class Shade(Enum):
+    light = 1
+    dark = 2
+
+
+@dataclass
+class Row:
+    id: int
+    weight: float
+    label: Optional[str]
+    tags: List[str]
+    shade: Shade
+    raw: bytes
+    when: datetime
+    extra: Union[int, str, None] = None
+    pair: Tuple[int, str] = (0, '')
+    scores: Dict[str, float] = field(default_factory=dict)
+
+
+def _rows(count: int) -> List[Row]:
+    return [Row(i, i / 2, None if i % 3 else f'row {i}', ['a', 'b'][:i % 3], Shade.light if i % 2 else Shade.dark,
+                bytes([i % 256]), datetime(2000, 1, 1 + i % 28), [i, f'{i}', None][i % 3], (i, 'x'),
+                {'s': i * 1.5}) for i in range(count)]
+
+
+class TestCompiledPlans:
+    """The compiled plans must produce the same json of serialize and deserialize tracking the path"""
+
+    @pytest.mark.parametrize('value, cls', [
+        (_rows(50), List[Row]),
+        (Node(1, Node(2, Node(3))), Node),
+        ({'a': [1, 2], 'b': []}, Dict[str, List[int]]),
+        (1.5, float),
+        (True, int),
+        (Shade.dark, Shade),
+        ([1, 'a', None], List[Union[int, str, None]]),
+        (Result.success(john), Result[Person, str]),
+    ])
+    def test_same_json(self, value, cls):
+        tracked = json.dumps(serialization.serialize(value, cls, [f'{cls}']))
+
+        assert serialization.to_json(value, cls) == tracked
+        assert serialization.from_json(tracked, cls) == serialization.deserialize(json.loads(tracked), cls, [''])
+
+    def test_float_from_int(self):
+        assert serialization.from_json('3', float) == 3.0
+        assert type(serialization.from_json('3', float)) is float
+
+    def test_error_path(self):
+        rows = _rows(3)
+        rows[2].tags = ['a', 2]
+
+        with pytest.raises(serialization.SerializationError, match=r'\.2\.tags\.1: Expected object of type str'):
+            serialization.to_json(rows, List[Row])
+
+    def test_deserialize_error_path(self):
+        serialized = serialization.to_json(_rows(3), List[Row])
+        data = json.loads(serialized)
+        data[1]['id'] = 'x'
+
+        with pytest.raises(serialization.DeserializationError, match=r'\.1\.id: Cannot convert x to int'):
+            serialization.from_json(json.dumps(data), List[Row])
+
+    def test_subclass_uses_the_fallback(self):
+        @dataclass
+        class Manager(Person):
+            reports: int = 0
+
+        manager = Manager('Ann', 40, Address('Rome', 100), 3)
+
+        assert serialization.to_json(manager, Person) == json.dumps(
+            serialization.serialize(manager, Person, ['']))
@@ -13,6 +13,7 @@ from wwwpy.common.rpc2.default_stub import DefaultStub
 from wwwpy.common.rpc2.encoder_decoder import EncoderDecoder, JsonEncoderDecoder
 from wwwpy.common.rpc2.stub import generate_stub
 from wwwpy.exceptions import RemoteException
+from wwwpy.unasync import unasync
 
 """
 This is the integration test of the parts listed below.
@@ -183,7 +184,8 @@ class Fixture:
         if is_pyodide():
             self.paired_transport.client.send_sync_callback = lambda: self.skeleton.invoke_sync()
         else:
-            self.paired_transport.client.send_sync_callback = lambda: self.skeleton.invoke_tobe_fixed()
+            # the server runs the call on its own event loop, here it is simulated by a thread
+            self.paired_transport.client.send_sync_callback = lambda: unasync(self.skeleton.invoke_async)()
 
     def setup_async(self):
         fixture = self
@@ -191,10 +193,7 @@ class Fixture:
         fixture.setup_stub()
 
         async def async_callback():
-            if is_pyodide():
-                await fixture.skeleton.invoke_async()
-            else:
-                fixture.skeleton.invoke_tobe_fixed()
+            await fixture.skeleton.invoke_async()
 
         fixture.paired_transport.client.send_async_callback = async_callback
 
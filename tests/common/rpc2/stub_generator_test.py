@@ -348,6 +348,34 @@ class TestTypeHintsReturn:
         _verify_type_hints(module1.fun1, 'return', None)
 
 
+class TestSignatures:
+    def test_signatures_are_written_ahead_of_time(self, fixture):
+        gen = fixture.generate(source_sync)
+
+        assert "_stub.setup_signatures({'add': ((int, int), int), 'sub': ((int, int), int)})" in gen
+
+    def test_string_annotations_and_none(self, fixture):
+        gen = fixture.generate("def fun1(a: 'int') -> None: ...\ndef fun2(): ...")
+
+        assert "_stub.setup_signatures({'fun1': ((int,), type(None)), 'fun2': ((), type(None))})" in gen
+
+    def test_nested_forward_reference_is_left_to_the_type_hints(self, fixture):
+        gen = fixture.generate("def fun1(a: list['Car']) -> int: ...\ndef fun2(a: int) -> int: ...")
+
+        assert "_stub.setup_signatures({'fun2': ((int,), int)})" in gen
+
+    def test_default_stub_does_not_evaluate_the_type_hints(self, fixture, monkeypatch):
+        from wwwpy.common.rpc2 import default_stub
+        from wwwpy.common.rpc2.default_stub import DefaultStub
+        monkeypatch.setattr(default_stub, 'get_typed_function', lambda f: pytest.fail('not expected'))
+        gen = generate_stub(source_async, DefaultStub, 'None, None, __name__')
+        fixture.dyn_sys_path.write_module2('module1.py', gen)
+
+        import module1  # noqa
+
+        assert module1._stub.namespace.add is not None
+
+
 class TestDispatcherArgs:
     def test_arg_simple_string(self, fixture):
         # GIVEN
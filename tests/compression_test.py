@@ -0,0 +1,190 @@
+import asyncio
+import gzip
+import os
+import threading
+import urllib.request
+import uuid
+
+import pytest
+
+from tests import for_all_webservers
+from wwwpy import compression
+from wwwpy.compression import compress_response, negotiate, CompressedCache, compressing
+from wwwpy.http import HttpRequest, HttpResponse, HttpRoute
+from wwwpy.static import StaticRoute, static_response
+from wwwpy.webserver import Webserver
+
+_text = 'hello world, ' * 200
+
+
+def _request(accept_encoding='gzip') -> HttpRequest:
+    return HttpRequest('GET', b'', '', {'accept-encoding': accept_encoding})
+
+
+def test_negotiate():
+    assert negotiate('gzip, deflate') == 'gzip'
+    assert negotiate('gzip;q=0, deflate') == ''
+    assert negotiate('') == ''
+    assert negotiate(None) == ''
+    assert negotiate('*') == compression.available_encodings()[0]
+
+
+def test_negotiate_brotli():
+    pytest.importorskip('brotli')
+    assert negotiate('gzip, deflate, br') == 'br'
+    assert negotiate('gzip;q=1, br;q=0.5') == 'gzip'
+
+
+def test_compress():
+    response = compress_response(_request(), HttpResponse(_text, 'text/plain'), CompressedCache())
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(response.content) == _text.encode()
+
+
+def test_not_accepted__should_only_vary():
+    original = HttpResponse(_text, 'text/plain', headers={'Vary': 'Origin', 'Content-Length': '2600'})
+
+    response = compress_response(_request(''), original, CompressedCache())
+
+    assert response.content == _text
+    assert response.headers == {'Vary': 'Origin, Accept-Encoding', 'Content-Length': '2600'}
+
+
+@pytest.mark.parametrize('response', [
+    HttpResponse('small', 'text/plain'),
+    HttpResponse(_text, 'application/zip'),
+    HttpResponse(_text, 'text/plain', 404),
+    HttpResponse(_text, 'text/plain', headers={'Content-Encoding': 'gzip'}),
+    HttpResponse.stream(iter([_text.encode()]), 'text/plain'),
+])
+def test_not_compressed(response):
+    assert compress_response(_request(), response, CompressedCache()) is response
+
+
+def test_strong_etag__should_be_cached_and_weakened():
+    cache = CompressedCache()
+    response = HttpResponse(_text, 'application/json', headers={'ETag': '"abc"'})
+
+    first = compress_response(_request(), response, cache)
+    second = compress_response(_request(), response, cache)
+
+    assert first.content is second.content
+    assert cache.compress_count == 1
+    assert first.headers['ETag'] == 'W/"abc"'
+
+
+def test_cache_eviction():
+    target = CompressedCache(max_bytes=100)
+    for i in range(3):
+        target.get('/a', f'"{i}"', 'gzip', lambda: bytes(range(60)))
+
+    target.get('/a', '"0"', 'gzip', lambda: bytes(range(60)))
+
+    assert target.compress_count == 4
+
+
+def test_static_file(tmp_path):
+    (tmp_path / 'a.txt').write_text(_text)
+    route = StaticRoute('/static', tmp_path)
+    request = HttpRequest('GET', b'', '', {'accept-encoding': 'gzip'}, '', '/static/a.txt')
+    cache = CompressedCache()
+
+    response = compress_response(request, static_response(route, request), cache)
+
+    assert gzip.decompress(response.content) == _text.encode()
+    assert 'Content-Length' not in response.headers
+    conditional = request._replace(headers={**request.headers, 'if-none-match': response.headers['ETag']})
+    assert static_response(route, conditional).status == 304
+
+
+def test_static_files_with_the_same_etag__should_not_share_the_cache(tmp_path):
+    # e.g., the files extracted from an archive, with the same size and mtime
+    for name, char in (('a.txt', 'A'), ('b.txt', 'B')):
+        (tmp_path / name).write_text(char * 2000)
+        os.utime(tmp_path / name, ns=(10 ** 18, 10 ** 18))
+    route = StaticRoute('/static', tmp_path)
+    cache = CompressedCache()
+
+    def get(name):
+        request = HttpRequest('GET', b'', '', {'accept-encoding': 'gzip'}, '', f'/static/{name}')
+        return compress_response(request, static_response(route, request), cache)
+
+    a, b = get('a.txt'), get('b.txt')
+
+    assert a.headers['ETag'] == b.headers['ETag']
+    assert gzip.decompress(a.content) == b'A' * 2000
+    assert gzip.decompress(b.content) == b'B' * 2000
+
+
+def test_compressing__should_compress_off_the_event_loop(monkeypatch):
+    threads = []
+    compress = compression.compress
+
+    def recording(content, encoding):
+        threads.append(threading.get_ident())
+        return compress(content, encoding)
+
+    monkeypatch.setattr(compression, 'compress', recording)
+    responses = []
+    route = HttpRoute('/', lambda req, res: None)
+    response = HttpResponse(_text, 'text/plain', headers={'ETag': f'"{uuid.uuid4()}"'})
+
+    async def main():
+        await compressing(_request(), route, responses.append)(response)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+
+    assert gzip.decompress(responses[0].content) == _text.encode()
+    assert threads and threads[0] != loop_thread
+    # a cache hit is sent right away
+    assert compressing(_request(), route, responses.append)(response) is None
+    assert responses[1].content is responses[0].content
+    assert len(threads) == 1
+
+
+def test_opt_out():
+    route = HttpRoute('/', lambda req, res: None, compress=False)
+    resp = lambda response: None
+    assert compressing(_request(), route, resp) is resp
+
+
+@for_all_webservers()
+def test_webservers(webserver: Webserver):
+    webserver.set_routes(
+        HttpRoute('/text', lambda req, res: res(HttpResponse(_text, 'text/plain'))),
+        HttpRoute('/raw', lambda req, res: res(HttpResponse(_text, 'text/plain')), compress=False),
+    ).start_listen()
+    url = webserver.localhost_url()
+
+    request = urllib.request.Request(url + '/text', headers={'Accept-Encoding': 'gzip'})
+    with urllib.request.urlopen(request) as r:
+        assert r.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(r.read()) == _text.encode()
+    request = urllib.request.Request(url + '/raw', headers={'Accept-Encoding': 'gzip'})
+    with urllib.request.urlopen(request) as r:
+        assert r.headers['Content-Encoding'] is None
+        assert r.read() == _text.encode()
+
+
+@for_all_webservers()
+def test_webservers__callback_not_returning_the_response(webserver: Webserver, monkeypatch):
+    text = _text + str(uuid.uuid4())
+
+    def sync_callback(req, res):
+        res(HttpResponse(text, 'text/plain'))
+
+    async def async_callback(req, res):
+        res(HttpResponse(text, 'text/plain'))
+
+    webserver.set_routes(HttpRoute('/sync', sync_callback), HttpRoute('/async', async_callback)).start_listen()
+    url = webserver.localhost_url()
+
+    for path in ('/sync', '/async'):
+        monkeypatch.setattr(compression, 'compressed_cache', CompressedCache())
+        request = urllib.request.Request(url + path, headers={'Accept-Encoding': 'gzip'})
+        with urllib.request.urlopen(request) as r:
+            assert r.headers['Content-Encoding'] == 'gzip'
+            assert gzip.decompress(r.read()) == text.encode()
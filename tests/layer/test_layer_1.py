@@ -3,10 +3,13 @@ from __future__ import annotations
 import http.client
 import threading
 import urllib.parse
+import urllib.request
 from http import HTTPStatus
 from time import sleep
 from typing import Callable
 
+import pytest
+
 from tests import for_all_webservers
 from wwwpy.http import HttpRoute, HttpResponse, HttpRequest
 from wwwpy.server.tcp_port import find_port
@@ -31,6 +34,17 @@ class TestHttpRoute:
         assert sync_fetch_response(url) == response_a
         assert sync_fetch_response(url + '/b') == response_b
 
+    @pytest.mark.filterwarnings('error::pytest.PytestUnhandledThreadExceptionWarning')
+    @for_all_webservers()
+    def test_webservers_two_instances(self, webserver: Webserver):
+        other = type(webserver)()
+        webserver.set_routes(HttpRoute('/', lambda req, res: res(HttpResponse('a', 'text/plain')))).start_listen()
+        other.set_routes(HttpRoute('/', lambda req, res: res(HttpResponse('b', 'text/plain'))))
+        other.set_port(find_port()).start_listen()
+
+        assert sync_fetch_response(webserver.localhost_url()).content == 'a'
+        assert sync_fetch_response(other.localhost_url()).content == 'b'
+
     @for_all_webservers()
     def test_webservers_post(self, webserver: Webserver):
         # GIVEN
@@ -56,3 +70,126 @@ class TestHttpRoute:
         assert actual_response == response_a
         assert actual_request.method == 'POST'
         assert actual_request.content.decode('utf8') == 'post-body'
+
+    @for_all_webservers()
+    def test_webservers_path_params_and_methods(self, webserver: Webserver):
+        def hello(req: HttpRequest, res):
+            res(HttpResponse(f'{req.method} {req.params["name"]}', 'text/plain'))
+
+        webserver.set_routes(HttpRoute('/hello/{name}', hello, methods=('GET',))).start_listen()
+
+        url = webserver.localhost_url()
+
+        from urllib.error import HTTPError
+        assert sync_fetch_response(url + '/hello/world').content == 'GET world'
+        statuses = []
+        for request in [urllib.request.Request(url + '/hello/world', data=b'', method='POST'), url + '/hello']:
+            try:
+                urllib.request.urlopen(request)
+            except HTTPError as e:
+                statuses.append(e.code)
+        assert statuses == [405, 404]
+
+        with urllib.request.urlopen(urllib.request.Request(url + '/hello/world', method='HEAD')) as r:
+            assert r.status == 200
+            assert r.read() == b''
+
+    @for_all_webservers()
+    def test_webservers_put_and_delete(self, webserver: Webserver):
+        async def echo(req: HttpRequest, res):
+            body = b''.join([chunk async for chunk in req.content])
+            r = res(HttpResponse(f'{req.method} {body.decode()}', 'text/plain'))
+            if r:
+                await r
+
+        webserver.set_routes(
+            HttpRoute('/item', lambda req, res: res(HttpResponse(f'{req.method} {req.content.decode()}', 'text/plain')),
+                      methods=('PUT', 'DELETE')),
+            HttpRoute('/stream', echo, methods=('PUT', 'DELETE'), stream_body=True),
+        ).start_listen()
+
+        url = webserver.localhost_url()
+
+        from urllib.error import HTTPError
+        for path in ('/item', '/stream'):
+            with urllib.request.urlopen(urllib.request.Request(url + path, data=b'abc', method='PUT')) as r:
+                assert r.read() == b'PUT abc'
+            with urllib.request.urlopen(urllib.request.Request(url + path, method='DELETE')) as r:
+                assert r.read() == b'DELETE '
+            status = None
+            try:
+                urllib.request.urlopen(url + path)
+            except HTTPError as e:
+                status = e.code
+            assert status == 405
+
+    @for_all_webservers()
+    def test_webservers_streaming_response(self, webserver: Webserver):
+        def chunks():
+            for i in range(100):
+                yield bytes([i]) * 10_000
+
+        async def async_chunks():
+            for i in range(3):
+                yield f'chunk{i};'
+
+        webserver.set_routes(
+            HttpRoute('/sync', lambda req, res: res(HttpResponse.stream(chunks(), 'application/octet-stream'))),
+            HttpRoute('/async', lambda req, res: res(HttpResponse.stream(async_chunks(), 'text/plain'))),
+        ).start_listen()
+
+        url = webserver.localhost_url()
+
+        with urllib.request.urlopen(url + '/sync') as r:
+            assert r.read() == b''.join(chunks())
+        with urllib.request.urlopen(url + '/async') as r:
+            assert r.read() == b'chunk0;chunk1;chunk2;'
+
+    @for_all_webservers()
+    def test_webservers_streaming_request(self, webserver: Webserver):
+        received = []
+
+        async def handler(req: HttpRequest, res):
+            size = 0
+            async for chunk in req.content:
+                received.append(len(chunk))
+                size += len(chunk)
+            r = res(HttpResponse(str(size), 'text/plain'))
+            if r:
+                await r
+
+        webserver.set_routes(HttpRoute('/upload', handler, stream_body=True)).start_listen()
+        body = b'x' * 3_000_000
+
+        request = urllib.request.Request(webserver.localhost_url() + '/upload', data=body, method='POST')
+        with urllib.request.urlopen(request) as r:
+            assert r.read() == b'3000000'
+        assert sum(received) == 3_000_000
+
+    @for_all_webservers()
+    def test_webservers_max_body_size(self, webserver: Webserver):
+        from urllib.error import HTTPError
+        route = HttpRoute('/small', lambda req, res: res(HttpResponse('ok', 'text/plain')), max_body_size=10)
+        webserver.set_routes(route).start_listen()
+        url = webserver.localhost_url() + '/small'
+
+        with urllib.request.urlopen(urllib.request.Request(url, data=b'123', method='POST')) as r:
+            assert r.read() == b'ok'
+        status = None
+        try:
+            urllib.request.urlopen(urllib.request.Request(url, data=b'x' * 11, method='POST'))
+        except HTTPError as e:
+            status = e.code
+        assert status == 413
+
+    @for_all_webservers()
+    def test_webservers_malformed_content_length(self, webserver: Webserver):
+        import socket
+        route = HttpRoute('/small', lambda req, res: res(HttpResponse('ok', 'text/plain')), max_body_size=10)
+        webserver.set_routes(route).start_listen()
+
+        with socket.create_connection(('127.0.0.1', webserver.port), timeout=5) as sock:
+            sock.sendall(b'POST /small HTTP/1.1\r\nHost: localhost\r\nContent-Length: abc\r\n'
+                         b'Connection: close\r\n\r\n')
+            status_line = sock.makefile('rb').readline()
+        assert status_line.split()[1] == b'400'
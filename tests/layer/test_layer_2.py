@@ -1,13 +1,23 @@
+import importlib.util
+import logging
+import marshal
 import os
+import sys
+import time
 from io import BytesIO
 from itertools import chain
 from pathlib import Path
 from typing import NamedTuple, Iterator
 from zipfile import ZipFile
 
+from tests.common import restore_sys_path
+from wwwpy.common import reloader
 from wwwpy.common.iterlib import CallableToIterable
 from wwwpy.resources import from_directory, PathResource, Resource, default_resource_accept, build_archive, \
-    StringResource, stacktrace_pathfinder, _is_path_contained, library_resources, from_directory_lazy, ResourceIterable
+    StringResource, stacktrace_pathfinder, _is_path_contained, library_resources, from_directory_lazy, ResourceIterable, \
+    Bytecode
+
+logger = logging.getLogger(__name__)
 
 parent = Path(__file__).parent
 
@@ -118,6 +128,76 @@ class Test_build_archive:
         assert expected_files == actual_files
 
 
+class Test_build_archive_bytecode:
+    current = sys.version_info[:2]
+
+    def test_keep_sources__should_add_pycache(self):
+        archive_bytes = build_archive(iter([StringResource('pkg/mod1.py', 'a = 1')]), Bytecode(self.current))
+
+        with ZipFile(BytesIO(archive_bytes)) as zf:
+            names = set(zf.namelist())
+            pyc = zf.read(f'pkg/__pycache__/mod1.{sys.implementation.cache_tag}.pyc')
+
+        assert names == {'pkg/mod1.py', f'pkg/__pycache__/mod1.{sys.implementation.cache_tag}.pyc'}
+        assert pyc[:4] == importlib.util.MAGIC_NUMBER
+
+    def test_keep_sources__should_be_importable(self, tmp_path, restore_sys_path):
+        resources = [StringResource('bytecode_pkg1/__init__.py', ''),
+                     StringResource('bytecode_pkg1/mod1.py', 'a = 42')]
+        ZipFile(BytesIO(build_archive(iter(resources), Bytecode(self.current)))).extractall(tmp_path)
+        sys.path.insert(0, str(tmp_path))
+        try:
+            import bytecode_pkg1.mod1  # noqa
+            assert bytecode_pkg1.mod1.a == 42
+            assert Path(bytecode_pkg1.mod1.__cached__).exists()
+        finally:
+            reloader.unload_path(str(tmp_path))
+
+    def test_no_sources__should_be_importable(self, tmp_path, restore_sys_path):
+        resources = [StringResource('bytecode_pkg2/__init__.py', ''),
+                     StringResource('bytecode_pkg2/mod2.py', 'b = 43')]
+        archive_bytes = build_archive(iter(resources), Bytecode(self.current, keep_sources=False))
+        zip_file = ZipFile(BytesIO(archive_bytes))
+        assert set(zip_file.namelist()) == {'bytecode_pkg2/__init__.pyc', 'bytecode_pkg2/mod2.pyc'}
+        zip_file.extractall(tmp_path)
+        sys.path.insert(0, str(tmp_path))
+        try:
+            import bytecode_pkg2.mod2  # noqa
+            assert bytecode_pkg2.mod2.b == 43
+        finally:
+            reloader.unload_path(str(tmp_path))
+
+    def test_different_python_version__should_contain_only_sources(self):
+        other = (self.current[0], self.current[1] + 1)
+        archive_bytes = build_archive(iter([StringResource('mod1.py', 'a = 1')]), Bytecode(other))
+
+        assert ZipFile(BytesIO(archive_bytes)).namelist() == ['mod1.py']
+
+    def test_syntax_error__should_contain_only_the_source(self):
+        archive_bytes = build_archive(iter([StringResource('mod1.py', 'a = (')]), Bytecode(self.current))
+
+        assert ZipFile(BytesIO(archive_bytes)).namelist() == ['mod1.py']
+
+    def test_measure_load_time(self):
+        """Measures what the remote saves on import: compiling the library sources vs. loading the bytecode"""
+        sources = [(r.arcname, r.filepath.read_bytes()) for r in library_resources() if r.arcname.endswith('.py')]
+        pycs = []
+
+        start = time.perf_counter()
+        for arcname, source in sources:
+            pycs.append(marshal.dumps(compile(source, arcname, 'exec', dont_inherit=True)))
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for pyc in pycs:
+            marshal.loads(pyc)
+        load_time = time.perf_counter() - start
+
+        logger.info(f'{len(sources)} modules: compile={compile_time * 1000:.1f}ms load={load_time * 1000:.1f}ms '
+                    f'ratio={compile_time / load_time:.1f}x')
+        assert load_time < compile_time
+
+
 class Test_stacktrace_pathfinder:
 
     def test_external_filename(self):
@@ -1,7 +1,9 @@
+import pytest
 from playwright.sync_api import Page, expect
 
 from tests import for_all_webservers
 from wwwpy.bootstrap import get_javascript_for, wrap_in_tryexcept, bootstrap_routes, bootstrap_javascript_placeholder
+from wwwpy.bundle import BundleLayer
 from wwwpy.http import HttpRoute, HttpResponse
 from wwwpy.resources import StringResource
 from wwwpy.webserver import Webserver
@@ -54,3 +56,124 @@ def test_wrap_in_tryexcept():
     assert ['executed', 'type=ZeroDivisionError'] == tmp
 
 
+
+
+@for_all_webservers()
+def test_zip_route__if_none_match__should_return_not_modified(webserver: Webserver):
+    import urllib.request
+    from urllib.error import HTTPError
+    resources = [[StringResource('remote.py', 'a = 1')]]
+    bootstrap_route, zip_route = bootstrap_routes(resources, python='import remote')
+    webserver.set_routes(bootstrap_route, zip_route)
+    webserver.start_listen()
+    url = webserver.localhost_url() + zip_route.path
+
+    with urllib.request.urlopen(url) as r:
+        etag = r.headers['ETag']
+        assert r.status == 200
+        assert len(r.read()) > 0
+    assert etag
+
+    status = None
+    try:
+        urllib.request.urlopen(urllib.request.Request(url, headers={'If-None-Match': etag}))
+    except HTTPError as e:
+        status = e.code
+    assert status == 304
+
+
+@for_all_webservers()
+def test_layers__should_serve_content_hashed_immutable_urls(webserver: Webserver):
+    import re
+    import urllib.request
+    layers = [BundleLayer('vendor', [[StringResource('vendor.py', 'v = 1')]], version='1.2.3'),
+              BundleLayer('app', [[StringResource('remote.py', 'a = 1')]])]
+    routes = bootstrap_routes([], python='import remote', layers=layers)
+    assert len(routes) == 3
+    webserver.set_routes(*routes)
+    webserver.start_listen()
+    url = webserver.localhost_url()
+
+    with urllib.request.urlopen(url) as r:
+        html = r.read().decode()
+    vendor_url = re.search(r'/wwwpy/bundle/vendor\.zip\?v=1\.2\.3-\w+', html).group(0)
+    app_url = re.search(r'/wwwpy/bundle/app\.zip\?v=\w+', html).group(0)
+
+    with urllib.request.urlopen(url + vendor_url) as r:
+        assert 'immutable' in r.headers['Cache-Control']
+    with urllib.request.urlopen(url + app_url) as r:
+        assert 'immutable' in r.headers['Cache-Control']
+    with urllib.request.urlopen(url + '/wwwpy/bundle/app.zip?v=stale') as r:
+        assert r.headers['Cache-Control'] == 'no-cache'
+
+
+@for_all_webservers()
+def test_zip_route__cold_cache__should_stream_a_valid_archive(webserver: Webserver):
+    import urllib.request
+    from io import BytesIO
+    from zipfile import ZipFile
+    resources = [[StringResource(f'm{i}.py', f'a = {i}\n' * 1000) for i in range(50)]]
+    bootstrap_route, zip_route = bootstrap_routes(resources, python='import remote')
+    webserver.set_routes(bootstrap_route, zip_route)
+    webserver.start_listen()
+
+    with urllib.request.urlopen(webserver.localhost_url() + zip_route.path) as r:
+        assert r.headers['Cache-Control'] == 'no-cache'
+        content = r.read()
+    with ZipFile(BytesIO(content)) as zf:
+        assert zf.testzip() is None
+        assert len(zf.namelist()) == 50
+
+
+@for_all_webservers()
+def test_persistent__manifest_and_delta(webserver: Webserver):
+    import json
+    import urllib.error
+    import urllib.request
+    from io import BytesIO
+    from zipfile import ZipFile
+    layers = [BundleLayer('app', [[StringResource('remote.py', 'a = 1'), StringResource('other.py', 'b = 1')]])]
+    routes = bootstrap_routes([], python='import remote', layers=layers, persistent=True)
+    webserver.set_routes(*routes)
+    webserver.start_listen()
+    url = webserver.localhost_url()
+
+    with urllib.request.urlopen(url + '/wwwpy/bundle/app.json') as r:
+        manifest = json.loads(r.read())
+    assert manifest['key']
+    assert set(manifest['files']) == {'remote.py', 'other.py'}
+
+    delta = urllib.request.Request(url + '/wwwpy/bundle/app.zip', data=json.dumps(['other.py']).encode(),
+                                   method='POST')
+    with urllib.request.urlopen(delta) as r:
+        with ZipFile(BytesIO(r.read())) as zf:
+            assert zf.namelist() == ['other.py']
+            assert zf.read('other.py') == b'b = 1'
+
+    for body in (b'not json', b'{"a": 1}', b'[1, 2]'):
+        invalid = urllib.request.Request(url + '/wwwpy/bundle/app.zip', data=body, method='POST')
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(invalid)
+        assert e.value.code == 400
+
+
+def test_persistent__bootstrap_python_should_compile():
+    import ast
+    from wwwpy.bootstrap import _bootstrap_python_persistent
+    source = _bootstrap_python_persistent([('app', 'k1', '/app.zip?v=k1', '/app.json?v=k1')], 'import remote')
+    compile(source, 'bootstrap', 'exec', flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+
+
+def test_bootstrap_python_should_compile():
+    import ast
+    from wwwpy.bootstrap import _bootstrap_python
+    for zip_import in (False, True):
+        source = _bootstrap_python(['/app.zip?v=k1'], 'import remote', zip_import)
+        compile(source, 'bootstrap', 'exec', flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT)
+
+
+def test_javascript__should_prefetch_the_bundle_before_loading_pyodide():
+    javascript = get_javascript_for('import remote', prefetch=['/wwwpy/bundle/app.zip?v=k1'])
+
+    prefetch = javascript.index('["/wwwpy/bundle/app.zip?v=k1"]')
+    assert prefetch < javascript.index('loadPyodide(')
@@ -44,6 +44,34 @@ class TestServerRpc:
 
 class TestWebsocketRoute:
 
+    @for_all_webservers()
+    def test_python_client(self, webserver: Webserver):
+        import asyncio
+        from tornado.websocket import websocket_connect
+        changes = []
+        ws_pool = WebsocketPool('/ws')
+        ws_pool.on_after_change.append(lambda change: changes.append(change.change))
+        webserver.set_routes(ws_pool.http_route).start_listen()
+
+        async def client():
+            connection = await websocket_connect(f'ws://127.0.0.1:{webserver.port}/ws')
+            for _ in range(100):
+                if ws_pool.clients:
+                    break
+                await asyncio.sleep(0.02)
+            ws_pool.clients[0].send('from server')
+            message = await connection.read_message()
+            connection.close()
+            for _ in range(100):
+                if not ws_pool.clients:
+                    break
+                await asyncio.sleep(0.02)
+            return message
+
+        assert asyncio.run(client()) == 'from server'
+        assert changes == [Change.add, Change.remove]
+        assert ws_pool.clients == []
+
     @for_all_webservers()
     def test_server_to_remote_message(self, page: Page, webserver: Webserver):
         # language=python
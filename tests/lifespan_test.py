@@ -0,0 +1,112 @@
+import asyncio
+import socket
+import urllib.request
+
+import pytest
+
+from tests import for_all_webservers
+from wwwpy.http import HttpRoute, HttpResponse
+from wwwpy.lifespan import Lifespan
+from wwwpy.webserver import Webserver
+
+
+def test_startup__should_run_the_hooks_in_order():
+    calls = []
+    target = Lifespan()
+
+    async def second():
+        calls.append('second')
+        target.on_startup.append(lambda: calls.append('added'))
+
+    target.on_startup.append(lambda: calls.append('first'))
+    target.on_startup.append(second)
+
+    asyncio.run(target.startup())
+
+    assert calls == ['first', 'second', 'added']
+    assert target.started
+
+
+def test_shutdown__should_run_the_hooks_in_reverse_order_even_if_one_fails():
+    calls = []
+    target = Lifespan()
+
+    def failing():
+        raise Exception('expected')
+
+    target.on_shutdown.append(lambda: calls.append('first'))
+    target.on_shutdown.append(failing)
+    target.on_shutdown.append(lambda: calls.append('last'))
+
+    asyncio.run(target.shutdown())
+
+    assert calls == ['last', 'first']
+
+
+def test_shutdown__should_drain_the_requests_in_flight():
+    calls = []
+    target = Lifespan()
+    target.on_shutdown.append(lambda: calls.append('shutdown hook'))
+
+    async def request():
+        with target.request():
+            await asyncio.sleep(0.1)
+            calls.append('request')
+
+    async def main():
+        task = asyncio.create_task(request())
+        await asyncio.sleep(0)
+        assert target.in_flight == 1
+        await target.shutdown()
+        await task
+
+    asyncio.run(main())
+
+    assert calls == ['request', 'shutdown hook']
+
+
+def test_drain_timeout():
+    target = Lifespan(drain_timeout=0.05)
+
+    async def main():
+        with target.request():
+            return await target.drain()
+
+    assert asyncio.run(main()) is False
+
+
+@for_all_webservers()
+def test_webservers(webserver: Webserver):
+    lifespan = Lifespan()
+    warm = []
+    shutdown = []
+
+    loops = []
+
+    async def warm_up():
+        await asyncio.sleep(0.2)
+        warm.append(True)
+        loops.append(asyncio.get_running_loop())
+
+    async def stop():
+        shutdown.append(True)
+        loops.append(asyncio.get_running_loop())
+
+    async def callback(req, res):
+        loops.append(asyncio.get_running_loop())
+        res(HttpResponse(str(warm), 'text/plain'))
+
+    lifespan.on_startup.append(warm_up)
+    lifespan.on_shutdown.append(stop)
+    webserver.set_routes(HttpRoute('/warm', callback)).set_lifespan(lifespan).start_listen()
+
+    with urllib.request.urlopen(webserver.localhost_url() + '/warm') as r:
+        assert r.read() == b'[True]'
+
+    webserver.shutdown()
+    assert shutdown == [True]
+    # what the startup hooks bind to the event loop is still alive when the requests are served and on shutdown
+    assert loops[0] is loops[1]
+    assert loops[2] is loops[1]
+    with pytest.raises(OSError):
+        socket.create_connection(('127.0.0.1', webserver.port), timeout=1).close()
@@ -0,0 +1,122 @@
+import asyncio
+import urllib.request
+
+from tests import for_all_webservers
+from tests.common.rpc import support3
+from wwwpy import metrics
+from wwwpy.bundle import BundleCache
+from wwwpy.common.rpc2.encoder_decoder import JsonEncoderDecoder
+from wwwpy.http import HttpRequest, HttpResponse, HttpRoute
+from wwwpy.metrics import Registry, metrics_route
+from wwwpy.middleware import handle
+from wwwpy.resources import StringResource
+from wwwpy.rpc import RpcRoute
+from wwwpy.webserver import Webserver
+from wwwpy.websocket import WebsocketPool, WebsocketEndpointIO
+
+
+def test_counter():
+    registry = Registry()
+    counter = registry.counter('calls_total', 'The calls', ('name',))
+    counter.inc('a')
+    counter.inc('a', amount=2)
+    counter.inc('b "quoted"')
+
+    assert registry.render() == ('# HELP calls_total The calls\n'
+                                 '# TYPE calls_total counter\n'
+                                 'calls_total{name="a"} 3\n'
+                                 'calls_total{name="b \\"quoted\\""} 1\n')
+
+
+def test_gauge():
+    registry = Registry()
+    registry.gauge('clients', 'The clients').set(5)
+
+    assert registry.render().splitlines()[-1] == 'clients 5'
+
+
+def test_histogram():
+    registry = Registry()
+    histogram = registry.histogram('duration_seconds', 'The duration', ('route',), buckets=(0.1, 1))
+    histogram.observe(0.05, '/a')
+    histogram.observe(0.5, '/a')
+    histogram.observe(5, '/a')
+
+    assert registry.render().splitlines()[2:] == [
+        'duration_seconds_bucket{route="/a",le="0.1"} 1',
+        'duration_seconds_bucket{route="/a",le="1"} 2',
+        'duration_seconds_bucket{route="/a",le="+Inf"} 3',
+        'duration_seconds_sum{route="/a"} 5.55',
+        'duration_seconds_count{route="/a"} 3',
+    ]
+    assert histogram.count('/a') == 3
+
+
+def test_http_requests_are_measured_per_route():
+    route = HttpRoute('/metrics-test/{name}', lambda req, resp: resp(HttpResponse('', 'text/plain', 204)))
+    before = metrics.http_request_duration.count('/metrics-test/{name}', 'GET', '204')
+
+    handle(route, HttpRequest('GET', b'', '', {}, path='/metrics-test/a'), lambda response: None)
+    handle(route, HttpRequest('GET', b'', '', {}, path='/metrics-test/b'), lambda response: None)
+
+    assert metrics.http_request_duration.count('/metrics-test/{name}', 'GET', '204') == before + 2
+
+
+def test_rpc_calls_are_measured():
+    services = RpcRoute('/rpc-metrics')
+    services.allow(support3.__name__)
+    labels = (support3.__name__, 'support3_throws_error')
+    calls, errors = metrics.rpc_duration.count(*labels), metrics.rpc_errors.get(*labels)
+
+    for exception_message in ('', 'boom'):
+        encoder = JsonEncoderDecoder().encoder()
+        for value in (*labels, exception_message, 'ok'):
+            encoder.encode(value, str)
+        asyncio.run(services.route.callback(HttpRequest('POST', encoder.buffer.encode(), '', {}), lambda r: None))
+
+    assert metrics.rpc_duration.count(*labels) == calls + 2
+    assert metrics.rpc_errors.get(*labels) == errors + 1
+
+
+def test_websockets_are_measured():
+    pool = WebsocketPool('/ws-metrics')
+    endpoint = WebsocketEndpointIO(lambda message: None)
+    sent, received = metrics.websocket_bytes.get('sent'), metrics.websocket_bytes.get('received')
+
+    pool.http_route.on_connect(endpoint)
+    assert metrics.websocket_clients.get('/ws-metrics') == 1
+
+    endpoint.send('hello')
+    endpoint.on_message(b'1234')
+    endpoint.on_message('è')
+    assert metrics.websocket_bytes.get('sent') == sent + 5
+    assert metrics.websocket_bytes.get('received') == received + 4 + 2
+
+    endpoint.on_message(None)
+    assert metrics.websocket_clients.get('/ws-metrics') == 0
+
+
+def test_bundle_builds_are_measured():
+    cache = BundleCache([[StringResource('a.py', 'a = 1')]], name='metrics-test')
+    builds = metrics.bundle_build_duration.count('metrics-test')
+
+    bundle = cache.get()
+
+    assert metrics.bundle_build_duration.count('metrics-test') == builds + 1
+    assert metrics.bundle_size.get('metrics-test') == len(bundle.content)
+
+
+@for_all_webservers()
+def test_webservers_metrics_route(webserver: Webserver):
+    route = HttpRoute('/hello', lambda req, resp: resp(HttpResponse('hello', 'text/plain')))
+    webserver.set_routes(route, metrics_route()).start_listen()
+    url = webserver.localhost_url()
+
+    with urllib.request.urlopen(url + '/hello') as r:
+        assert r.read() == b'hello'
+    with urllib.request.urlopen(url + '/wwwpy/metrics') as r:
+        assert r.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        body = r.read().decode()
+
+    assert '# TYPE wwwpy_http_request_duration_seconds histogram' in body
+    assert 'wwwpy_http_request_duration_seconds_count{route="/hello",method="GET",status="200"}' in body
@@ -0,0 +1,196 @@
+import asyncio
+import time
+import urllib.request
+
+import pytest
+
+from tests import for_all_webservers
+from wwwpy.http import HttpRequest, HttpResponse, HttpRoute, RequestBodyTooLarge
+from wwwpy.middleware import handle, connect, chain, Timing, RequestSizeLimit, ResponseCache
+from wwwpy.webserver import Webserver
+from wwwpy.websocket import WebsocketRoute, WebsocketEndpointIO
+
+
+def _request(method='GET', content=b'', path='/', headers=None) -> HttpRequest:
+    return HttpRequest(method, content, '', headers or {}, '', path)
+
+
+def _serve(route: HttpRoute, request: HttpRequest, middlewares=()) -> HttpResponse:
+    responses = []
+    res = handle(route, request, responses.append, middlewares)
+    if res:
+        asyncio.run(res)
+    return responses[0]
+
+
+def _ok(request, resp):
+    return resp(HttpResponse('ok', 'text/plain'))
+
+
+def test_chain_order():
+    calls = []
+
+    def middleware(name):
+        def call(request, resp, call_next):
+            calls.append(name)
+            return call_next(request, resp)
+
+        return call
+
+    def handler(request, resp):
+        calls.append('handler')
+
+    chain([middleware('a'), middleware('b')], handler)(_request(), None)
+
+    assert calls == ['a', 'b', 'handler']
+
+
+def test_webserver_middlewares_run_before_the_route_ones():
+    calls = []
+
+    def middleware(name):
+        def call(request, resp, call_next):
+            calls.append(name)
+            return call_next(request, resp)
+
+        return call
+
+    route = HttpRoute('/', _ok, middlewares=(middleware('route'),))
+
+    assert _serve(route, _request(), [middleware('server')]).content == 'ok'
+    assert calls == ['server', 'route']
+
+
+def test_async_middleware_and_callback():
+    async def middleware(request, resp, call_next):
+        await asyncio.sleep(0)
+        res = call_next(request._replace(path='/changed'), resp)
+        if res:
+            await res
+
+    async def callback(request, resp):
+        resp(HttpResponse(request.path, 'text/plain'))
+
+    route = HttpRoute('/', callback, middlewares=(middleware,))
+
+    assert _serve(route, _request()).content == '/changed'
+
+
+def test_short_circuit():
+    def deny(request, resp, call_next):
+        return resp(HttpResponse('Forbidden', 'text/plain', 403))
+
+    route = HttpRoute('/', lambda req, resp: pytest.fail('not expected'), middlewares=(deny,))
+
+    assert _serve(route, _request()).status == 403
+
+
+def test_timing():
+    response = _serve(HttpRoute('/', _ok), _request(), [Timing()])
+
+    assert response.headers['Server-Timing'].startswith('app;dur=')
+
+
+def test_request_size_limit():
+    route = HttpRoute('/', _ok)
+    limit = RequestSizeLimit(10)
+
+    assert _serve(route, _request('POST', b'x' * 10), [limit]).status == 200
+    assert _serve(route, _request('POST', b'x' * 11), [limit]).status == 413
+    assert _serve(route, _request('POST', headers={'content-length': '11'}), [limit]).status == 413
+
+
+def test_request_size_limit_streamed():
+    async def chunks():
+        for _ in range(3):
+            yield b'x' * 5
+
+    async def callback(request, resp):
+        async for _ in request.content:
+            pass
+
+    with pytest.raises(RequestBodyTooLarge):
+        _serve(HttpRoute('/', callback), _request('POST', chunks()), [RequestSizeLimit(10)])
+
+
+def test_response_cache():
+    calls = []
+
+    def callback(request, resp):
+        calls.append(request.query)
+        return resp(HttpResponse(f'call {len(calls)}', 'text/plain'))
+
+    cache = ResponseCache(ttl=60)
+    route = HttpRoute('/', callback, middlewares=(cache,))
+
+    assert _serve(route, _request()).content == 'call 1'
+    assert _serve(route, _request()).content == 'call 1'
+    assert _serve(route, _request('POST')).content == 'call 2'
+    assert _serve(route, _request(headers={'cache-control': 'no-cache'})).content == 'call 3'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_response_cache_ttl():
+    cache = ResponseCache(ttl=0.05)
+    route = HttpRoute('/', lambda req, resp: resp(HttpResponse(str(time.monotonic()), 'text/plain')),
+                      middlewares=(cache,))
+
+    first = _serve(route, _request()).content
+    time.sleep(0.1)
+
+    assert _serve(route, _request()).content != first
+
+
+def test_response_cache_no_store():
+    cache = ResponseCache()
+    route = HttpRoute('/', lambda req, resp: resp(HttpResponse('x', 'text/plain', headers={'Cache-Control': 'no-store'})),
+                      middlewares=(cache,))
+
+    _serve(route, _request())
+    _serve(route, _request())
+
+    assert cache.hits == 0
+
+
+def test_websocket_connect():
+    connected = []
+    route = WebsocketRoute('/ws', connected.append)
+    endpoint = WebsocketEndpointIO(lambda m: None)
+
+    assert connect(route, _request(), endpoint)
+    assert connected == [endpoint]
+
+
+def test_websocket_rejected():
+    def deny(request, endpoint, call_next):
+        if request.headers.get('authorization') == 'secret':
+            call_next(request, endpoint)
+
+    connected = []
+    route = WebsocketRoute('/ws', connected.append, middlewares=(deny,))
+
+    assert not connect(route, _request(), WebsocketEndpointIO(lambda m: None))
+    assert connect(route, _request(headers={'authorization': 'secret'}), WebsocketEndpointIO(lambda m: None))
+    assert len(connected) == 1
+
+
+@for_all_webservers()
+def test_webservers_middlewares(webserver: Webserver):
+    calls = []
+    cache = ResponseCache()
+
+    def callback(request, resp):
+        calls.append(request.path)
+        return resp(HttpResponse(f'hello {request.params["name"]}', 'text/plain'))
+
+    webserver.add_middleware(Timing())
+    webserver.set_routes(HttpRoute('/hello/{name}', callback, middlewares=(cache,))).start_listen()
+    url = webserver.localhost_url() + '/hello/world'
+
+    for _ in range(2):
+        with urllib.request.urlopen(url) as r:
+            assert r.read() == b'hello world'
+            assert r.headers['Server-Timing'].startswith('app;dur=')
+
+    assert calls == ['/hello/world']
+    assert cache.hits == 1
@@ -0,0 +1,58 @@
+import gzip
+import urllib.request
+
+from tests import for_all_webservers
+from wwwpy.bootstrap import bootstrap_routes, pyodide_local_path
+from wwwpy.pyodide_assets import pyodide_route, preload_links
+from wwwpy.webserver import Webserver
+
+
+def _pyodide_dir(tmp_path):
+    (tmp_path / 'pyodide.js').write_text('var loadPyodide;' * 100)
+    (tmp_path / 'pyodide.asm.wasm').write_bytes(b'\0asm' * 1000)
+    (tmp_path / 'pyodide.asm.wasm.br').write_bytes(b'brotli')
+    (tmp_path / 'pkg-1.0+x-py3-none-any.whl').write_bytes(b'PK')
+    return tmp_path
+
+
+def test_route__should_mount_the_directory(tmp_path):
+    assert pyodide_route(_pyodide_dir(tmp_path), '/p').path == '/p/{path:path}'
+
+
+def test_preload_links():
+    links = preload_links('/p/')
+    assert '<link rel="preload" href="/p/pyodide.asm.wasm" as="fetch" crossorigin>' in links
+    assert '<link rel="preload" href="/p/pyodide.asm.js" as="script">' in links
+
+
+@for_all_webservers()
+def test_local_pyodide(webserver: Webserver, tmp_path):
+    routes = bootstrap_routes([], python='import remote', pyodide_dir=_pyodide_dir(tmp_path))
+    webserver.set_routes(*routes)
+    webserver.start_listen()
+    url = webserver.localhost_url()
+
+    with urllib.request.urlopen(url) as r:
+        html = r.read().decode()
+    assert 'cdn.jsdelivr.net' not in html
+    assert f'href="{pyodide_local_path}/pyodide.asm.wasm"' in html
+
+    def get(path, encoding):
+        return urllib.request.urlopen(urllib.request.Request(url + pyodide_local_path + path,
+                                                             headers={'Accept-Encoding': encoding}))
+
+    with get('/pyodide.asm.wasm', 'gzip, br') as r:
+        assert r.headers['Content-Encoding'] == 'br'
+        assert r.headers['Content-Type'] == 'application/wasm'
+        assert 'immutable' in r.headers['Cache-Control']
+        assert r.read() == b'brotli'
+        br_etag = r.headers['ETag']
+    with get('/pyodide.asm.wasm', 'identity') as r:
+        assert r.headers['Content-Encoding'] is None
+        assert r.headers['ETag'] != br_etag
+    with get('/pyodide.js', 'gzip') as r:
+        assert r.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(r.read()) == b'var loadPyodide;' * 100
+    with get('/pkg-1.0+x-py3-none-any.whl', 'gzip') as r:
+        assert r.headers['Content-Encoding'] is None
+        assert r.read() == b'PK'
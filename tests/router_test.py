@@ -0,0 +1,126 @@
+import pytest
+
+from wwwpy.http import HttpRoute
+from wwwpy.router import Router
+from wwwpy.static import StaticRoute
+from wwwpy.websocket import WebsocketRoute
+
+
+def _route(path, *methods) -> HttpRoute:
+    return HttpRoute(path, lambda req, resp: None, methods=methods)
+
+
+def test_literal():
+    route = _route('/a/b')
+    target = Router(route, _route('/a'), _route('/'))
+
+    assert target.match('/a/b').route is route
+    assert target.match('/a/b/') is None
+    assert target.match('/a/c') is None
+    assert target.match('/').route.path == '/'
+
+
+def test_literal__should_not_be_a_pattern():
+    route = _route('/pyodide/numpy-2.0+cpu.whl')
+    target = Router(route)
+
+    assert target.match('/pyodide/numpy-2.0+cpu.whl').route is route
+    assert target.match('/pyodide/numpy-2.00cpu.whl') is None
+
+
+def test_params():
+    route = _route('/api/{module}/{function}')
+    target = Router(route)
+
+    found = target.match('/api/math/sqrt')
+    assert found.route is route
+    assert found.params == {'module': 'math', 'function': 'sqrt'}
+    assert target.match('/api/math/') is None
+    assert target.match('/api/math') is None
+
+
+def test_literal_has_precedence_on_param():
+    literal = _route('/api/info')
+    param = _route('/api/{name}')
+    target = Router(param, literal)
+
+    assert target.match('/api/info').route is literal
+    assert target.match('/api/other').route is param
+
+
+def test_backtracking():
+    first = _route('/a/{x}/c')
+    second = _route('/a/b/d')
+    target = Router(first, second)
+
+    assert target.match('/a/b/c').params == {'x': 'b'}
+    assert target.match('/a/b/d').route is second
+
+
+def test_catch_all():
+    route = _route('/assets/{file:path}')
+    nested = _route('/assets/img/{file:path}')
+    target = Router(route, nested)
+
+    assert target.match('/assets/a/b.txt').params == {'file': 'a/b.txt'}
+    assert target.match('/assets/img/logo.png').route is nested
+    assert target.match('/assets') is None
+
+
+def test_static_route():
+    target = Router(StaticRoute('/static/', '.'))
+
+    assert target.match('/static/a/b.js').params == {'path': 'a/b.js'}
+    assert target.match('/staticx/a.js') is None
+
+
+def test_methods():
+    get = _route('/item', 'GET')
+    post = _route('/item', 'POST')
+    target = Router(get, post)
+
+    assert target.match('/item', 'GET').route is get
+    assert target.match('/item', 'POST').route is post
+    assert target.match('/item', 'HEAD').route is get
+    found = target.match('/item', 'PUT')
+    assert found.route is None
+    assert found.allowed == ('GET', 'POST')
+
+
+def test_any_method():
+    route = _route('/item')
+    post = _route('/item', 'POST')
+    target = Router(route, post)
+
+    assert target.match('/item', 'PUT').route is route
+    assert target.match('/item', 'POST').route is post
+
+
+def test_same_path__should_replace():
+    target = Router(_route('/a'))
+    route = _route('/a')
+    target.add(route)
+
+    assert target.match('/a').route is route
+
+
+def test_websocket():
+    ws = WebsocketRoute('/ws/{channel}', lambda endpoint: None)
+    http = _route('/ws/{channel}')
+    target = Router(ws, http)
+
+    assert target.match_websocket('/ws/news') == (ws, {'channel': 'news'}, ())
+    assert target.match('/ws/news').route is http
+    assert Router(ws).match('/ws/news') is None
+
+
+@pytest.mark.parametrize('path', ['/a/{1x}', '/a/{x:int}', '/{rest:path}/a'])
+def test_invalid(path):
+    with pytest.raises(ValueError):
+        Router(_route(path))
+
+
+def test_conflicting_param_names():
+    target = Router(_route('/a/{x}'))
+    with pytest.raises(ValueError):
+        target.add(_route('/a/{y}/b'))
@@ -0,0 +1,168 @@
+import asyncio
+
+from wwwpy.http import HttpRoute, HttpResponse
+from wwwpy.lifespan import Lifespan
+from wwwpy.server.asgi import AsgiApplication
+from wwwpy.static import StaticRoute
+
+
+def _get(app: AsgiApplication, path: str) -> list:
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'path': path, 'method': 'GET', 'headers': [], 'query_string': b''}
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def test_bytes_content():
+    app = AsgiApplication(HttpRoute('/', lambda req, res: res(HttpResponse(b'\x00\x01', 'application/octet-stream'))))
+
+    start, body = _get(app, '/')
+
+    assert start['status'] == 200
+    assert body['body'] == b'\x00\x01'
+
+
+def test_streaming_content__should_send_more_body_messages():
+    chunks = [b'a', b'b', b'c']
+    app = AsgiApplication(HttpRoute('/', lambda req, res: res(HttpResponse.stream(iter(chunks), 'text/plain'))))
+
+    start, *bodies = _get(app, '/')
+
+    assert [m['body'] for m in bodies] == [b'a', b'b', b'c', b'']
+    assert [m.get('more_body', False) for m in bodies] == [True, True, True, False]
+
+
+def _post(app: AsgiApplication, path: str, chunks: list, headers: list = ()) -> list:
+    messages = []
+    pending = [{'type': 'http.request', 'body': c, 'more_body': i < len(chunks) - 1} for i, c in enumerate(chunks)]
+
+    async def receive():
+        return pending.pop(0)
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'path': path, 'method': 'POST', 'headers': list(headers), 'query_string': b''}
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+def test_all_body__should_join_the_chunks():
+    app = AsgiApplication(HttpRoute('/', lambda req, res: res(HttpResponse(req.content, 'text/plain'))))
+
+    _, body = _post(app, '/', [b'a', b'b', b'c'])
+
+    assert body['body'] == b'abc'
+
+
+def test_stream_body():
+    async def handler(req, res):
+        chunks = [chunk async for chunk in req.content]
+        await res(HttpResponse(b'|'.join(chunks), 'text/plain'))
+
+    app = AsgiApplication(HttpRoute('/', handler, stream_body=True))
+
+    _, body = _post(app, '/', [b'a', b'b', b'c'])
+
+    assert body['body'] == b'a|b|c'
+
+
+def test_max_body_size__chunked_body_should_be_rejected():
+    app = AsgiApplication(HttpRoute('/', lambda req, res: res(HttpResponse('ok', 'text/plain')), max_body_size=2))
+
+    start, _ = _post(app, '/', [b'ab', b'c'])
+
+    assert start['status'] == 413
+
+
+def test_malformed_content_length__should_send_400():
+    app = AsgiApplication(HttpRoute('/', lambda req, res: res(HttpResponse('ok', 'text/plain')), max_body_size=2))
+
+    start, _ = _post(app, '/', [b'ab'], headers=[(b'content-length', b'abc')])
+
+    assert start['status'] == 400
+
+
+def test_static_route__should_use_zerocopysend_when_available(tmp_path):
+    (tmp_path / 'a.txt').write_bytes(b'0123456789')
+    app = AsgiApplication(StaticRoute('/static', tmp_path))
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        if message['type'] == 'http.response.zerocopysend':
+            message = {**message, 'file': message['file'].name}
+        messages.append(message)
+
+    scope = {'type': 'http', 'path': '/static/a.txt', 'method': 'GET', 'query_string': b'',
+             'headers': [(b'range', b'bytes=2-5')], 'extensions': {'http.response.zerocopysend': {}}}
+    asyncio.run(app(scope, receive, send))
+
+    start, body = messages
+    assert start['status'] == 206
+    assert body == {'type': 'http.response.zerocopysend', 'file': str(tmp_path / 'a.txt'), 'offset': 2, 'count': 4}
+
+
+def test_unknown_path__should_send_404():
+    app = AsgiApplication(HttpRoute('/', lambda req, res: res(HttpResponse('', 'text/plain'))))
+
+    start, *_ = _get(app, '/missing')
+
+    assert start['status'] == 404
+
+
+def test_path_params_and_methods():
+    def callback(req, res):
+        return res(HttpResponse(req.params['name'], 'text/plain'))
+
+    app = AsgiApplication(HttpRoute('/hello/{name}', callback, methods=('GET',)))
+
+    _, body = _get(app, '/hello/world')
+    start, _ = _post(app, '/hello/world', [b''])
+
+    assert body['body'] == b'world'
+    assert start['status'] == 405
+    assert start['headers'] == [[b'allow', b'GET']]
+
+
+def _lifespan(app: AsgiApplication, *types: str) -> list:
+    messages = []
+    pending = [{'type': t} for t in types]
+
+    async def receive():
+        return pending.pop(0)
+
+    async def send(message):
+        messages.append(message['type'])
+
+    asyncio.run(app({'type': 'lifespan'}, receive, send))
+    return messages
+
+
+def test_lifespan():
+    calls = []
+    lifespan = Lifespan()
+    lifespan.on_startup.append(lambda: calls.append('startup'))
+    lifespan.on_shutdown.append(lambda: calls.append('shutdown'))
+    app = AsgiApplication(lifespan=lifespan)
+
+    messages = _lifespan(app, 'lifespan.startup', 'lifespan.shutdown')
+
+    assert messages == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert calls == ['startup', 'shutdown']
+
+
+def test_lifespan_startup_failed():
+    lifespan = Lifespan()
+    lifespan.on_startup.append(lambda: 1 / 0)
+
+    assert _lifespan(AsgiApplication(lifespan=lifespan), 'lifespan.startup') == ['lifespan.startup.failed']
@@ -46,3 +46,33 @@ def test_help_option():
 def test_unknown_option():
     with pytest.raises(SystemExit):
         parse_arguments(['--unknown'])
+
+
+def test_serve():
+    args = parse_arguments(['serve', '--workers', '4'])
+    assert args == Arguments(directory=cwd_path, port=8000, dev=False, workers=4)
+
+
+def test_negative_workers():
+    with pytest.raises(SystemExit):
+        parse_arguments(['serve', '--workers', '-1'])
+
+
+def test_workers_in_dev_mode():
+    with pytest.raises(SystemExit):
+        parse_arguments(['dev', '--workers', '4'])
+
+
+def test_unknown_command():
+    with pytest.raises(SystemExit):
+        parse_arguments(['unknown'])
+
+
+def test_webserver():
+    args = parse_arguments(['dev', '--webserver', 'uvicorn'])
+    assert args == Arguments(directory=cwd_path, port=8000, dev=True, webserver='uvicorn')
+
+
+def test_workers_with_asgi_webserver():
+    with pytest.raises(SystemExit):
+        parse_arguments(['serve', '--workers', '2', '--webserver', 'uvicorn'])
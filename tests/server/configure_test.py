@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.common import dyn_sys_path, DynSysPath
+from wwwpy import bootstrap
+from wwwpy.common.settingslib import Settings
+from wwwpy.server.configure import setup
+from wwwpy.server.convention import default_config
+
+_new_component = 'wwwpy/common/designer/new_component.py'
+
+
+def _settings(tmp_path: Path, ini: str) -> Settings:
+    file = tmp_path / 'settings.ini'
+    file.write_text(ini)
+    settings = Settings()
+    settings.load(file)
+    return settings
+
+
+def _layer_files(directory: Path, settings: Settings, layer: int) -> set:
+    (directory / 'remote').mkdir(exist_ok=True)
+    (directory / 'remote/__init__.py').write_text('async def main(): pass')
+    project = setup(default_config(directory, dev_mode=False), settings)
+    return set(project.bundle_sources[layer].get().files)
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_bytecode_setting(dyn_sys_path: DynSysPath, monkeypatch, enabled):
+    monkeypatch.setattr(bootstrap, 'pyodide_python_version', sys.version_info[:2])
+    settings = _settings(dyn_sys_path.path, f'[general]\nbytecode = {enabled}\n')
+
+    files = _layer_files(dyn_sys_path.path, settings, -1)
+
+    pyc = f'remote/__pycache__/__init__.{sys.implementation.cache_tag}.pyc'
+    assert (pyc in files) == enabled
+
+
+def test_tree_shake__should_be_off_by_default(dyn_sys_path: DynSysPath):
+    files = _layer_files(dyn_sys_path.path, Settings(), 0)
+
+    assert _new_component in files
+
+
+def test_tree_shake__should_drop_the_unreachable_modules(dyn_sys_path: DynSysPath):
+    settings = _settings(dyn_sys_path.path, '[general]\ntree_shake = true\n')
+
+    files = _layer_files(dyn_sys_path.path, settings, 0)
+
+    assert 'wwwpy/remote/browser_main.py' in files
+    assert _new_component not in files
+
+
+def test_tree_shake__should_keep_the_whitelist(dyn_sys_path: DynSysPath):
+    settings = _settings(dyn_sys_path.path, '[general]\ntree_shake = true\n'
+                                            'tree_shake_whitelist = wwwpy.common.tree, wwwpy.common.designer.*\n')
+
+    files = _layer_files(dyn_sys_path.path, settings, 0)
+
+    assert _new_component in files
@@ -0,0 +1,10 @@
+import asyncio
+import threading
+
+
+async def support_loop_running() -> str:
+    return f'{id(asyncio.get_running_loop())}-{threading.get_ident()}'
+
+
+def support_loop_thread() -> int:
+    return threading.get_ident()
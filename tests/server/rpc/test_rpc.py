@@ -1,11 +1,21 @@
+import asyncio
 import importlib.util
+import threading
 from types import ModuleType
 
+import pytest
+
 import wwwpy
 from tests import for_all_webservers
 from tests.common.rpc import support3, support2
-from wwwpy.exceptions import RemoteException
-from wwwpy.rpc import Module, RpcRoute, SourceModule
+from tests.server.rpc import support_loop
+from wwwpy.common.rpc2.default_stub import DefaultStub
+from wwwpy.common.rpc2.encoder_decoder import JsonEncoderDecoder
+from wwwpy.common.rpc2.transport import Transport
+from wwwpy.common.rpc2.typed_function import get_typed_function
+from wwwpy.exceptions import RemoteException, RemoteBusy
+from wwwpy.http import HttpRequest
+from wwwpy.rpc import Module, RpcRoute, SourceModule, RpcExecutor, RpcBusy
 from wwwpy.server.tcp_port import find_port
 from wwwpy.unasync import unasync
 from wwwpy.webserver import Webserver
@@ -79,3 +89,107 @@ def _module_from_source(name: str, source: str) -> ModuleType:
     module = importlib.util.module_from_spec(spec)
     exec(source, module.__dict__)
     return module
+
+
+def _invoke(services: RpcRoute, func_name: str) -> tuple:
+    encoder = JsonEncoderDecoder().encoder()
+    encoder.encode(support_loop.__name__, str)
+    encoder.encode(func_name, str)
+    responses = []
+
+    async def main():
+        await services.route.callback(HttpRequest('POST', encoder.buffer.encode(), '', {}), responses.append)
+        return f'{id(asyncio.get_running_loop())}-{threading.get_ident()}'
+
+    loop_and_thread = asyncio.run(main())
+    decoder = JsonEncoderDecoder().decoder(responses[0].content)
+    assert decoder.decode(str) == 'ok'
+    return loop_and_thread, decoder
+
+
+def test_async_function_runs_on_the_webserver_loop():
+    services = RpcRoute('/rpc-loop')
+    services.allow(support_loop.__name__)
+
+    loop_and_thread, decoder = _invoke(services, 'support_loop_running')
+
+    assert decoder.decode(str) == loop_and_thread
+
+
+def test_sync_function_runs_in_the_executor():
+    services = RpcRoute('/rpc-loop')
+    services.allow(support_loop.__name__)
+
+    _, decoder = _invoke(services, 'support_loop_thread')
+
+    assert decoder.decode(int) != threading.get_ident()
+
+
+def test_executor_busy():
+    executor = RpcExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run('m', 'f', release.wait, []))
+        second = asyncio.ensure_future(executor.run('m', 'f', lambda: 'second', []))
+        await asyncio.sleep(0)
+        with pytest.raises(RpcBusy):
+            await executor.run('m', 'f', lambda: 'third', [])
+        release.set()
+        return await first, await second
+
+    assert asyncio.run(main()) == (True, 'second')
+    assert asyncio.run(executor.run('m', 'f', lambda: 'after', [])) == 'after'
+    executor.shutdown()
+
+
+def test_executor_module_limits():
+    executor = RpcExecutor(max_workers=4, max_queue=0, module_limits={'slow': 1})
+    release = threading.Event()
+
+    async def main():
+        slow = asyncio.ensure_future(executor.run('slow', 'f', release.wait, []))
+        await asyncio.sleep(0)
+        with pytest.raises(RpcBusy):
+            await executor.run('slow', 'f', lambda: 'second', [])
+        # the slow module uses its only thread, the other modules are not affected
+        assert await executor.run('other', 'f', lambda: 'other', []) == 'other'
+        release.set()
+        return await slow
+
+    assert asyncio.run(main())
+    executor.shutdown()
+
+
+def test_busy__the_client_should_receive_a_retryable_error():
+    executor = RpcExecutor(max_workers=1, max_queue=0)
+    services = RpcRoute('/rpc-busy', executor)
+    services.allow(support_loop.__name__)
+    responses = []
+
+    class RouteTransport(Transport):
+        async def send_async(self, payload):
+            await services.route.callback(HttpRequest('POST', payload.encode(), '', {}), responses.append)
+
+        async def recv_async(self):
+            return responses[-1].content
+
+    stub = DefaultStub(RouteTransport(), JsonEncoderDecoder(), support_loop.__name__)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run('other', 'f', release.wait, []))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(RemoteBusy):
+                await stub.invoke_async(get_typed_function(support_loop.support_loop_thread), [])
+        finally:
+            release.set()
+        await running
+        return await stub.invoke_async(get_typed_function(support_loop.support_loop_thread), [])
+
+    assert asyncio.run(main()) != threading.get_ident()
+    assert responses[0].status == 503
+    assert responses[0].headers['Retry-After'] == '1'
+    assert responses[1].status == 200
+    executor.shutdown()
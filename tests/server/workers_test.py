@@ -0,0 +1,77 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from tests.timeouts import timeout_multiplier
+from wwwpy.server.tcp_port import find_port
+
+pytestmark = pytest.mark.skipif(not Path('/proc/self/task').exists(), reason='the workers are found with /proc')
+
+
+def _children(pid: int) -> list[int]:
+    return [int(c) for c in Path(f'/proc/{pid}/task/{pid}/children').read_text().split()]
+
+
+def _wait(condition, timeout=20):
+    deadline = time.monotonic() + timeout * timeout_multiplier()
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError()
+
+
+def _get(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read()
+
+
+def test_workers__should_share_the_port_and_restart_the_crashed_ones(tmp_path):
+    (tmp_path / 'remote').mkdir()
+    (tmp_path / 'remote/__init__.py').write_text('async def main(): pass')
+    port = find_port()
+    url = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen([sys.executable, '-m', 'wwwpy.server', 'serve', '--workers', '2', '--port', str(port),
+                                '--directory', str(tmp_path)], start_new_session=True)
+    try:
+        _wait(lambda: len(_children(process.pid)) == 2 and b'wwwpy' in _get(url))
+        crashed = _children(process.pid)[0]
+
+        os.kill(crashed, signal.SIGKILL)
+
+        _wait(lambda: len(_children(process.pid)) == 2 and crashed not in _children(process.pid))
+        _wait(lambda: b'PK' in _get(url + '/wwwpy/bundle/app.zip'))
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def test_workers__sigterm_to_the_parent_should_terminate_the_workers(tmp_path):
+    (tmp_path / 'remote').mkdir()
+    (tmp_path / 'remote/__init__.py').write_text('async def main(): pass')
+    port = find_port()
+    process = subprocess.Popen([sys.executable, '-m', 'wwwpy.server', 'serve', '--workers', '2', '--port', str(port),
+                                '--directory', str(tmp_path)], start_new_session=True, stderr=subprocess.PIPE)
+    try:
+        _wait(lambda: len(_children(process.pid)) == 2 and b'wwwpy' in _get(f'http://127.0.0.1:{port}'))
+        workers = _children(process.pid)
+
+        process.send_signal(signal.SIGTERM)
+
+        assert process.wait(timeout=20 * timeout_multiplier()) == 0
+        for pid in workers:
+            assert not Path(f'/proc/{pid}').exists()
+        assert b'threads still running' not in process.stderr.read()
+    finally:
+        if process.poll() is None:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
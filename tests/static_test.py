@@ -0,0 +1,137 @@
+import asyncio
+import gzip
+import threading
+import urllib.request
+from urllib.error import HTTPError
+
+import pytest
+
+from tests import for_all_webservers
+from wwwpy import static
+from wwwpy.http import HttpRequest
+from wwwpy.static import StaticRoute, static_response, FileContent
+from wwwpy.webserver import Webserver
+
+
+def _request(path, **headers) -> HttpRequest:
+    return HttpRequest('GET', b'', '', {k.lower().replace('_', '-'): v for k, v in headers.items()}, '', path)
+
+
+@pytest.fixture
+def route(tmp_path):
+    (tmp_path / 'a.txt').write_bytes(b'0123456789')
+    (tmp_path / 'app.js').write_text('console.log(1)')
+    (tmp_path / 'app.js.gz').write_bytes(gzip.compress(b'console.log(1)'))
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub/b.txt').write_text('b')
+    (tmp_path.parent / 'secret.txt').write_text('secret')
+    return StaticRoute('/static', tmp_path)
+
+
+def _body(response) -> bytes:
+    return b''.join(response.content) if isinstance(response.content, FileContent) else response.content
+
+
+def test_file(route):
+    response = static_response(route, _request('/static/sub/b.txt'))
+    assert response.status == 200
+    assert response.content_type == 'text/plain'
+    assert _body(response) == b'b'
+    assert response.headers['ETag'].startswith('"')
+
+
+def test_not_found_and_traversal(route):
+    assert static_response(route, _request('/static/missing.txt')).status == 404
+    assert static_response(route, _request('/static/../secret.txt')).status == 404
+    assert static_response(route, _request('/static/sub')).status == 404
+    assert static_response(route, _request('/staticx/a.txt')).status == 404
+
+
+def test_etag_and_last_modified(route):
+    first = static_response(route, _request('/static/a.txt'))
+
+    assert static_response(route, _request('/static/a.txt', if_none_match=first.headers['ETag'])).status == 304
+    last_modified = first.headers['Last-Modified']
+    assert static_response(route, _request('/static/a.txt', if_modified_since=last_modified)).status == 304
+
+
+def test_range(route):
+    response = static_response(route, _request('/static/a.txt', range='bytes=2-4'))
+    assert response.status == 206
+    assert response.headers['Content-Range'] == 'bytes 2-4/10'
+    assert _body(response) == b'234'
+
+    assert _body(static_response(route, _request('/static/a.txt', range='bytes=-3'))) == b'789'
+    assert _body(static_response(route, _request('/static/a.txt', range='bytes=8-'))) == b'89'
+    assert static_response(route, _request('/static/a.txt', range='bytes=20-')).status == 416
+
+
+def test_range__if_range_mismatch__should_send_whole_file(route):
+    response = static_response(route, _request('/static/a.txt', range='bytes=2-4', if_range='"other"'))
+    assert response.status == 200
+    assert _body(response) == b'0123456789'
+
+
+def test_precompressed(route):
+    response = static_response(route, _request('/static/app.js', accept_encoding='gzip, deflate'))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.content_type == 'text/javascript'
+    assert gzip.decompress(_body(response)) == b'console.log(1)'
+
+    plain = static_response(route, _request('/static/app.js'))
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['ETag'] != response.headers['ETag']
+
+
+def test_file_content__should_read_in_chunks(tmp_path):
+    (tmp_path / 'big').write_bytes(bytes(range(256)) * 100)
+    chunks = list(FileContent(tmp_path / 'big', 10, 1000, chunk_size=300))
+    assert [len(c) for c in chunks] == [300, 300, 300, 100]
+    assert b''.join(chunks) == (bytes(range(256)) * 100)[10:1010]
+
+
+def test_file_content__truncated_file_should_raise(tmp_path):
+    (tmp_path / 'big').write_bytes(bytes(1000))
+    chunks = iter(FileContent(tmp_path / 'big', 0, 1000, chunk_size=300))
+    assert len(next(chunks)) == 300
+
+    (tmp_path / 'big').write_bytes(bytes(400))
+
+    with pytest.raises(OSError):
+        list(chunks)
+
+
+def test_callback__should_resolve_the_file_off_the_event_loop(route, monkeypatch):
+    threads = []
+
+    def response(*args):
+        threads.append(threading.get_ident())
+        return static_response(*args)
+
+    monkeypatch.setattr(static, 'static_response', response)
+    responses = []
+
+    async def main():
+        await route.callback(_request('/static/sub/b.txt'), responses.append)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(main())
+
+    assert _body(responses[0]) == b'b'
+    assert threads and threads[0] != loop_thread
+
+
+@for_all_webservers()
+def test_webservers(webserver: Webserver, route):
+    webserver.set_routes(route).start_listen()
+    url = webserver.localhost_url()
+
+    with urllib.request.urlopen(url + '/static/sub/b.txt') as r:
+        assert r.read() == b'b'
+    request = urllib.request.Request(url + '/static/a.txt', headers={'Range': 'bytes=1-2'})
+    with urllib.request.urlopen(request) as r:
+        assert r.status == 206
+        assert r.read() == b'12'
+    with pytest.raises(HTTPError) as e:
+        urllib.request.urlopen(url + '/static/missing.txt')
+    assert e.value.code == 404
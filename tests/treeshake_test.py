@@ -0,0 +1,92 @@
+from wwwpy.resources import StringResource, library_resources
+from wwwpy.treeshake import TreeShaker, imported_modules, module_name
+
+_library = [
+    StringResource('lib/__init__.py', ''),
+    StringResource('lib/a.py', 'from . import b\nfrom .sub.c import C'),
+    StringResource('lib/b.py', 'def f():\n    import lib.lazy'),
+    StringResource('lib/lazy.py', ''),
+    StringResource('lib/sub/__init__.py', ''),
+    StringResource('lib/sub/c.py', 'class C: pass'),
+    StringResource('lib/sub/icon.svg', '<svg/>'),
+    StringResource('lib/unused.py', 'import lib.unused_too'),
+    StringResource('lib/unused_too.py', ''),
+    StringResource('lib/unused_data/data.json', '{}'),
+    StringResource('lib/dynamic.py', ''),
+    StringResource('lib/plugins/__init__.py', ''),
+    StringResource('lib/plugins/p1.py', ''),
+]
+
+_app = [StringResource('remote/__init__.py', 'import lib.a')]
+
+
+def _arcnames(target) -> set[str]:
+    return {r.arcname for r in target}
+
+
+def test_should_keep_only_reachable():
+    target = TreeShaker(_library, entry_modules=['remote'], context=[_app])
+
+    assert _arcnames(target) == {
+        'lib/__init__.py', 'lib/a.py', 'lib/b.py', 'lib/lazy.py',
+        'lib/sub/__init__.py', 'lib/sub/c.py', 'lib/sub/icon.svg'
+    }
+
+
+def test_report():
+    target = TreeShaker(_library, entry_modules=['remote'], context=[_app])
+    list(target)
+
+    assert set(target.report.dropped) == {
+        'lib/unused.py', 'lib/unused_too.py', 'lib/unused_data/data.json', 'lib/dynamic.py',
+        'lib/plugins/__init__.py', 'lib/plugins/p1.py'
+    }
+    assert target.report.dropped_bytes == len('import lib.unused_too') + len('{}')
+    assert 'dropped 6 of 13 files' in target.report.summary()
+
+
+def test_whitelist():
+    target = TreeShaker(_library, entry_modules=['remote'], context=[_app], whitelist=['lib.dynamic', 'lib.plugins.*'])
+
+    assert {'lib/dynamic.py', 'lib/plugins/__init__.py', 'lib/plugins/p1.py'} <= _arcnames(target)
+
+
+def test_context_should_not_be_yielded():
+    target = TreeShaker(_library, entry_modules=['remote'], context=[_app])
+
+    assert 'remote/__init__.py' not in _arcnames(target)
+
+
+def test_no_entry_module__should_drop_everything():
+    target = TreeShaker(_library, entry_modules=['remote'])
+
+    assert _arcnames(target) == set()
+
+
+def test_imported_modules__relative():
+    actual = imported_modules('pkg.sub.mod', b'from .. import x\nfrom .sib import y', package=False)
+    assert {'pkg', 'pkg.x', 'pkg.sub.sib', 'pkg.sub.sib.y'} <= actual
+
+
+def test_imported_modules__package_relative():
+    actual = imported_modules('pkg', b'from .sub import y', package=True)
+    assert {'pkg', 'pkg.sub', 'pkg.sub.y'} == actual
+
+
+def test_imported_modules__import_module_literal():
+    actual = imported_modules('m', b'import importlib\nimportlib.import_module("a.b")', package=False)
+    assert {'a', 'a.b'} <= actual
+
+
+def test_module_name():
+    assert module_name('a/b/__init__.py') == 'a.b'
+    assert module_name('a/b/c.py') == 'a.b.c'
+
+
+def test_library__should_keep_browser_main():
+    target = TreeShaker(library_resources(), entry_modules=['wwwpy.remote.browser_main'])
+    arcnames = _arcnames(target)
+
+    assert 'wwwpy/remote/browser_main.py' in arcnames
+    assert 'wwwpy/__init__.py' in arcnames
+    assert target.report.dropped_bytes > 0